@@ -3,15 +3,15 @@ Export mart tables to CSV for client delivery.
 
 Each client gets a filtered CSV based on their subscribed categories/stores.
 Files are saved to exports/output/ with client name and date in the filename.
+Results are streamed from Snowflake batch by batch, so exports of any size run
+in constant memory.
 """
 
 import logging
 import os
 from datetime import datetime
 
-import pandas as pd
-
-from ingestion.snowflake_loader import execute_query
+from ingestion.snowflake_loader import iter_query_batches
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +23,25 @@ def ensure_output_dir():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
+def write_query_to_csv(query: str, filepath: str) -> int:
+    """
+    Stream a query result into a CSV file. Returns the number of rows written.
+
+    The header comes from the result's columns, so an empty result still
+    produces a CSV with a header row.
+    """
+    rows = 0
+    header_written = False
+    with open(filepath, "w", newline="") as f:
+        for batch in iter_query_batches(query):
+            if not header_written:
+                batch.head(0).to_csv(f, index=False)
+                header_written = True
+            batch.to_csv(f, index=False, header=False)
+            rows += len(batch)
+    return rows
+
+
 def export_category_performance(
     client_name: str,
     categories: list[str] | None = None,
@@ -61,14 +80,13 @@ def export_category_performance(
     query += " ORDER BY YEAR_MONTH, GRANULAR_CATEGORY, STORE_NAME, BRAND_NAME"
 
     logger.info("Exporting category performance for client '%s'...", client_name)
-    df = execute_query(query)
 
     timestamp = datetime.now().strftime("%Y%m%d")
     filename = f"{client_name}_category_performance_{timestamp}.csv"
     filepath = os.path.join(OUTPUT_DIR, filename)
 
-    df.to_csv(filepath, index=False)
-    logger.info("Exported %d rows to %s", len(df), filepath)
+    rows = write_query_to_csv(query, filepath)
+    logger.info("Exported %d rows to %s", rows, filepath)
     return filepath
 
 
@@ -77,13 +95,12 @@ def export_panel_summary() -> str:
     ensure_output_dir()
 
     query = "SELECT * FROM SCANDALICIOUS_DW.MARTS.MART_PANEL_SUMMARY ORDER BY YEAR_MONTH"
-    df = execute_query(query)
 
     timestamp = datetime.now().strftime("%Y%m%d")
     filepath = os.path.join(OUTPUT_DIR, f"panel_summary_{timestamp}.csv")
 
-    df.to_csv(filepath, index=False)
-    logger.info("Exported panel summary (%d months) to %s", len(df), filepath)
+    rows = write_query_to_csv(query, filepath)
+    logger.info("Exported panel summary (%d months) to %s", rows, filepath)
     return filepath
 
 
@@ -15,7 +15,30 @@ load_dotenv()
 # Railway PostgreSQL (transactional database)
 # ---------------------------------------------------------------------------
 
-RAILWAY_DB_URL = os.environ["RAILWAY_DATABASE_URL"]
+RAILWAY_DB_URL = os.environ.get("RAILWAY_DATABASE_URL", "")
+
+# Rows fetched per server-side cursor round trip and loaded per Snowflake batch
+RAILWAY_CHUNK_SIZE = int(os.environ.get("RAILWAY_CHUNK_SIZE", "50000"))
+
+# Tables extracted and loaded concurrently (each worker has its own connections)
+RAILWAY_EXTRACT_WORKERS = int(os.environ.get("RAILWAY_EXTRACT_WORKERS", "4"))
+
+# Change data capture: logical replication slot (wal2json) and micro-batch limits
+CDC_SLOT_NAME = os.environ.get("CDC_SLOT_NAME", "milo_raw_cdc")
+CDC_BATCH_SIZE = int(os.environ.get("CDC_BATCH_SIZE", "5000"))
+CDC_FLUSH_SECONDS = float(os.environ.get("CDC_FLUSH_SECONDS", "10"))
+
+
+# ---------------------------------------------------------------------------
+# Warehouse backend
+# ---------------------------------------------------------------------------
+
+# "snowflake" (production) or "duckdb" (local file, no Snowflake account needed)
+WAREHOUSE_BACKEND = os.environ.get("WAREHOUSE_BACKEND", "snowflake")
+
+# DuckDB file for the local backend; the file name doubles as the database
+# name, so it matches SNOWFLAKE_DATABASE in fully qualified queries
+DUCKDB_PATH = os.environ.get("DUCKDB_PATH", "data/scandalicious_dw.duckdb")
 
 
 # ---------------------------------------------------------------------------
@@ -23,9 +46,9 @@ RAILWAY_DB_URL = os.environ["RAILWAY_DATABASE_URL"]
 # ---------------------------------------------------------------------------
 
 SNOWFLAKE_CONFIG = {
-    "account": os.environ["SNOWFLAKE_ACCOUNT"],
-    "user": os.environ["SNOWFLAKE_USER"],
-    "password": os.environ["SNOWFLAKE_PASSWORD"],
+    "account": os.environ.get("SNOWFLAKE_ACCOUNT", ""),
+    "user": os.environ.get("SNOWFLAKE_USER", ""),
+    "password": os.environ.get("SNOWFLAKE_PASSWORD", ""),
     "warehouse": os.environ.get("SNOWFLAKE_WAREHOUSE", "COMPUTE_WH"),
     "database": os.environ.get("SNOWFLAKE_DATABASE", "SCANDALICIOUS_DW"),
     "role": os.environ.get("SNOWFLAKE_ROLE", "TRANSFORM"),
@@ -33,6 +56,42 @@ SNOWFLAKE_CONFIG = {
 
 SNOWFLAKE_RAW_SCHEMA = "RAW"
 
+# Process-wide connection pool: max open sessions, and how long a connection may
+# sit idle before it is health-checked on checkout
+SNOWFLAKE_POOL_SIZE = int(os.environ.get("SNOWFLAKE_POOL_SIZE", "4"))
+SNOWFLAKE_POOL_HEALTH_CHECK_SECONDS = int(
+    os.environ.get("SNOWFLAKE_POOL_HEALTH_CHECK_SECONDS", "60")
+)
+
+# Bulk load path: "write_pandas" (connector default) or "parquet_stage"
+# (compressed Parquet files -> PUT to an internal stage -> one COPY INTO)
+SNOWFLAKE_LOAD_METHOD = os.environ.get("SNOWFLAKE_LOAD_METHOD", "write_pandas")
+SNOWFLAKE_STAGE_NAME = "MILO_LOAD_STAGE"
+SNOWFLAKE_STAGE_COMPRESSION = os.environ.get("SNOWFLAKE_STAGE_COMPRESSION", "zstd")
+SNOWFLAKE_STAGE_FILE_MB = int(os.environ.get("SNOWFLAKE_STAGE_FILE_MB", "64"))
+SNOWFLAKE_STAGE_PARALLEL = int(os.environ.get("SNOWFLAKE_STAGE_PARALLEL", "8"))
+
+# Per-source high-water marks for incremental loads (lives in the RAW schema)
+INGESTION_STATE_TABLE = "INGESTION_STATE"
+
+# The Snowflake backend needs real credentials (and reads from Railway); only
+# the local duckdb backend may run with them unset. Fail here with a clear
+# message rather than later with an opaque connector error.
+if WAREHOUSE_BACKEND == "snowflake":
+    _missing = [
+        name
+        for name in (
+            "SNOWFLAKE_ACCOUNT", "SNOWFLAKE_USER", "SNOWFLAKE_PASSWORD", "RAILWAY_DATABASE_URL",
+        )
+        if not os.environ.get(name)
+    ]
+    if _missing:
+        raise RuntimeError(
+            f"Missing environment variables for WAREHOUSE_BACKEND=snowflake: "
+            f"{', '.join(_missing)}. Set them in .env, or use WAREHOUSE_BACKEND=duckdb "
+            f"for a local warehouse."
+        )
+
 
 # ---------------------------------------------------------------------------
 # Pinecone (vector DB for brand matching)
@@ -42,6 +101,80 @@ PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY", "")
 PINECONE_INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "brand-embeddings")
 PINECONE_ENVIRONMENT = os.environ.get("PINECONE_ENVIRONMENT", "gcp-starter")
 
+# Concurrent index queries in brand matching, and retries when throttled (429/5xx)
+PINECONE_QUERY_WORKERS = int(os.environ.get("PINECONE_QUERY_WORKERS", "8"))
+PINECONE_MAX_RETRIES = int(os.environ.get("PINECONE_MAX_RETRIES", "5"))
+PINECONE_BACKOFF_SECONDS = float(os.environ.get("PINECONE_BACKOFF_SECONDS", "1"))
+# Concurrent upsert batches when syncing brand embeddings
+PINECONE_UPSERT_WORKERS = int(os.environ.get("PINECONE_UPSERT_WORKERS", "4"))
+
+# Brand vector index: "pinecone", or "local" (in-process index in VECTOR_INDEX_DIR,
+# see master_data.vector_index)
+VECTOR_INDEX_BACKEND = os.environ.get("VECTOR_INDEX_BACKEND", "pinecone")
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "data/brand_index")
+# Stored precision: "float32", or "int8" (4x smaller, scores within ~1e-2)
+VECTOR_INDEX_DTYPE = os.environ.get("VECTOR_INDEX_DTYPE", "float32")
+# Build an HNSW graph (needs hnswlib) once the index holds this many vectors;
+# below that, exact search is fast enough. 0 disables HNSW.
+VECTOR_INDEX_HNSW_MIN_VECTORS = int(os.environ.get("VECTOR_INDEX_HNSW_MIN_VECTORS", "100000"))
+
+# Persistent (model, text) -> embedding cache shared by brand_embeddings and
+# brand_matcher (SQLite; empty string disables), and its LRU size bound
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# Embedding inference: "torch" (SentenceTransformer), or "onnx" (int8-quantized
+# export in ONNX_MODEL_DIR, see master_data.embedding_backend; no torch at runtime)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.environ.get(
+    "ONNX_MODEL_DIR", "data/onnx/paraphrase-multilingual-MiniLM-L12-v2-int8"
+)
+ONNX_BATCH_SIZE = int(os.environ.get("ONNX_BATCH_SIZE", "64"))
+# onnxruntime intra-op threads; 0 lets onnxruntime pick (one per physical core)
+ONNX_NUM_THREADS = int(os.environ.get("ONNX_NUM_THREADS", "0"))
+
+# Brand strings whose character-trigram similarity to a known brand or alias
+# reaches this are matched lexically, without embedding search
+LEXICAL_TRIGRAM_THRESHOLD = float(os.environ.get("LEXICAL_TRIGRAM_THRESHOLD", "0.7"))
+
+# Brand matching service (python -m master_data.brand_service): concurrent
+# requests are coalesced into batches of up to BRAND_SERVICE_MAX_BATCH brands,
+# waiting at most BRAND_SERVICE_MAX_WAIT_MS for a batch to fill; a request
+# waiting longer than BRAND_SERVICE_TIMEOUT_SECONDS for its matches gets a 504
+BRAND_SERVICE_HOST = os.environ.get("BRAND_SERVICE_HOST", "127.0.0.1")
+BRAND_SERVICE_PORT = int(os.environ.get("BRAND_SERVICE_PORT", "8085"))
+BRAND_SERVICE_MAX_BATCH = int(os.environ.get("BRAND_SERVICE_MAX_BATCH", "64"))
+BRAND_SERVICE_MAX_WAIT_MS = float(os.environ.get("BRAND_SERVICE_MAX_WAIT_MS", "10"))
+BRAND_SERVICE_TIMEOUT_SECONDS = float(os.environ.get("BRAND_SERVICE_TIMEOUT_SECONDS", "30"))
+
+
+# ---------------------------------------------------------------------------
+# Shared HTTP client (OFF, Overpass): connection pool, retries, host limits
+# ---------------------------------------------------------------------------
+
+HTTP_POOL_MAX_CONNECTIONS = int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", "20"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.environ.get("HTTP_POOL_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_SECONDS = float(os.environ.get("HTTP_KEEPALIVE_SECONDS", "30"))
+HTTP_TIMEOUT_SECONDS = float(os.environ.get("HTTP_TIMEOUT_SECONDS", "30"))
+# HTTP/2 needs the h2 package (pip install "httpx[http2]"); falls back to HTTP/1.1
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "").lower() in ("1", "true", "yes")
+# Default retry policy for 429/5xx and network errors
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_SECONDS = float(os.environ.get("HTTP_BACKOFF_SECONDS", "2"))
+# Max concurrent requests per host ("host=n,host=n"); unlisted hosts are only
+# bounded by the connection pool
+HTTP_HOST_LIMITS = os.environ.get("HTTP_HOST_LIMITS", "overpass-api.de=2")
+
+
+# ---------------------------------------------------------------------------
+# HTTP response cache (OFF, Overpass)
+# ---------------------------------------------------------------------------
+
+# Empty string disables the cache
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", ".cache/http")
+HTTP_CACHE_TTL_SECONDS = int(os.environ.get("HTTP_CACHE_TTL_SECONDS", str(24 * 3600)))
+HTTP_CACHE_MAX_MB = int(os.environ.get("HTTP_CACHE_MAX_MB", "512"))
+
 
 # ---------------------------------------------------------------------------
 # Open Food Facts
@@ -51,6 +184,12 @@ OFF_API_BASE = "https://world.openfoodfacts.org/api/v2"
 OFF_COUNTRY = "belgium"
 OFF_PAGE_SIZE = int(os.environ.get("OFF_PAGE_SIZE", "100"))
 OFF_MAX_PAGES = int(os.environ.get("OFF_MAX_PAGES", "50"))
+# Concurrent page requests, and OFF's published limit for search queries
+OFF_CONCURRENCY = int(os.environ.get("OFF_CONCURRENCY", "4"))
+OFF_RATE_LIMIT_PER_MINUTE = float(os.environ.get("OFF_RATE_LIMIT_PER_MINUTE", "10"))
+OFF_MAX_RETRIES = int(os.environ.get("OFF_MAX_RETRIES", "5"))
+# Products per DataFrame when streaming the bulk export (--dump)
+OFF_DUMP_CHUNK_SIZE = int(os.environ.get("OFF_DUMP_CHUNK_SIZE", "50000"))
 
 
 # ---------------------------------------------------------------------------
@@ -64,6 +203,22 @@ OSM_OVERPASS_URL = os.environ.get(
 # Belgian bounding box (south, west, north, east)
 OSM_BELGIUM_BBOX = "49.5,2.5,51.5,6.4"
 
+# The store query is split into shards: a grid of sub-bboxes ("rows x cols")
+# times groups of chains. Shards run in parallel (the public Overpass instance
+# allows a couple of concurrent slots per client) and are retried independently.
+OSM_SHARD_GRID = os.environ.get("OSM_SHARD_GRID", "2x2")
+OSM_CHAINS_PER_SHARD = int(os.environ.get("OSM_CHAINS_PER_SHARD", "8"))
+OSM_SHARD_WORKERS = int(os.environ.get("OSM_SHARD_WORKERS", "2"))
+OSM_SHARD_RETRIES = int(os.environ.get("OSM_SHARD_RETRIES", "3"))
+OSM_QUERY_TIMEOUT = int(os.environ.get("OSM_QUERY_TIMEOUT", "120"))
+
+# Local .osm.pbf extract (e.g. Geofabrik belgium-latest.osm.pbf); when set,
+# stores are read from it instead of querying Overpass
+OSM_PBF_PATH = os.environ.get("OSM_PBF_PATH", "")
+# osmium node location index for way centers ("flex_mem", or a file-backed
+# index like "sparse_file_array,/tmp/osm_nodes.bin" to bound memory)
+OSM_PBF_LOCATION_INDEX = os.environ.get("OSM_PBF_LOCATION_INDEX", "flex_mem")
+
 # Grocery store chains to query
 OSM_STORE_NAMES = [
     "Colruyt",
@@ -0,0 +1,413 @@
+"""
+Local DuckDB implementation of the warehouse functions in snowflake_loader.
+
+Selected with WAREHOUSE_BACKEND=duckdb: every load, merge, query and watermark
+call in snowflake_loader is then routed here, so ingestion scripts, master
+data jobs and exports run against a single local file without a Snowflake
+account. The file is named after the Snowflake database (DUCKDB_PATH), so fully
+qualified queries like SCANDALICIOUS_DW.MARTS.MART_PANEL_SUMMARY and the dbt
+`local` target resolve against the same tables.
+
+Usage:
+    # Expose Parquet extracts (one file or folder per table) as RAW views
+    python -m ingestion.duckdb_warehouse --parquet-dir data/raw
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from ingestion.config import (
+    DUCKDB_PATH,
+    INGESTION_STATE_TABLE,
+    SNOWFLAKE_RAW_SCHEMA,
+    SNOWFLAKE_STAGE_COMPRESSION,
+    SNOWFLAKE_STAGE_FILE_MB,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_ROWS = 100_000
+
+_database: duckdb.DuckDBPyConnection | None = None
+_database_lock = threading.Lock()
+
+
+def get_connection() -> duckdb.DuckDBPyConnection:
+    """
+    Return a new cursor on the process-wide DuckDB database.
+
+    DuckDB allows a single writer process per file, so the database is opened
+    once and each caller (thread) works on its own cursor.
+    """
+    global _database
+    with _database_lock:
+        if _database is None:
+            os.makedirs(os.path.dirname(DUCKDB_PATH) or ".", exist_ok=True)
+            logger.info("Opening DuckDB warehouse at %s", DUCKDB_PATH)
+            _database = duckdb.connect(DUCKDB_PATH)
+        return _database.cursor()
+
+
+def close_database():
+    """Close the process-wide database (e.g. before another process opens the file)."""
+    global _database
+    with _database_lock:
+        database, _database = _database, None
+    if database is not None:
+        database.close()
+
+
+@contextmanager
+def _cursor():
+    cursor = get_connection()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+
+
+@contextmanager
+def _transaction(cursor):
+    cursor.execute("BEGIN TRANSACTION")
+    try:
+        yield
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.execute("COMMIT")
+
+
+def _table_exists(cursor, schema: str, table_name: str) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM information_schema.tables WHERE table_schema ILIKE $schema "
+        "AND table_name ILIKE $table AND table_catalog = current_database()",
+        {"schema": schema, "table": table_name},
+    )
+    return cursor.fetchone() is not None
+
+
+def load_dataframe(
+    df: pd.DataFrame,
+    table_name: str,
+    schema: str = SNOWFLAKE_RAW_SCHEMA,
+    overwrite: bool = False,
+    method: str | None = None,
+    swap: bool = False,
+) -> int:
+    """
+    Load a DataFrame into a DuckDB table, creating it on first load.
+
+    ``method`` and ``swap`` are accepted for signature compatibility: an
+    overwrite is a single CREATE OR REPLACE, which is already atomic.
+
+    Returns:
+        Number of rows loaded.
+    """
+    if df.empty:
+        logger.warning("Empty DataFrame — skipping load for %s.%s", schema, table_name)
+        return 0
+
+    table_name = table_name.upper()
+    schema = schema.upper()
+    df.columns = [col.upper() for col in df.columns]
+
+    with _cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        cursor.register("df_to_load", df)
+        if overwrite or not _table_exists(cursor, schema, table_name):
+            cursor.execute(
+                f"CREATE OR REPLACE TABLE {schema}.{table_name} AS SELECT * FROM df_to_load"
+            )
+        else:
+            cursor.execute(f"INSERT INTO {schema}.{table_name} BY NAME SELECT * FROM df_to_load")
+        cursor.unregister("df_to_load")
+
+    logger.info("Loaded %d rows into %s.%s (duckdb)", len(df), schema, table_name)
+    return len(df)
+
+
+@contextmanager
+def swap_table(table_name: str, schema: str = SNOWFLAKE_RAW_SCHEMA):
+    """
+    Replace a table's contents atomically via a shadow table.
+
+    Same contract as snowflake_loader.swap_table; the swap is a DROP + RENAME
+    inside one transaction.
+    """
+    table_name = table_name.upper()
+    schema = schema.upper()
+    shadow_table = f"{table_name}__SHADOW"
+
+    with _cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        cursor.execute(f"DROP TABLE IF EXISTS {schema}.{shadow_table}")
+
+    try:
+        yield shadow_table
+
+        with _cursor() as cursor:
+            if not _table_exists(cursor, schema, shadow_table):
+                logger.warning(
+                    "Nothing was loaded into %s.%s — keeping %s.%s as is",
+                    schema, shadow_table, schema, table_name,
+                )
+                return
+            with _transaction(cursor):
+                cursor.execute(f"DROP TABLE IF EXISTS {schema}.{table_name}")
+                cursor.execute(f"ALTER TABLE {schema}.{shadow_table} RENAME TO {table_name}")
+            logger.info("Swapped new data into %s.%s (duckdb)", schema, table_name)
+    finally:
+        with _cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {schema}.{shadow_table}")
+
+
+def stage_and_copy(
+    chunks: Iterable[pd.DataFrame],
+    table_name: str,
+    schema: str = SNOWFLAKE_RAW_SCHEMA,
+    overwrite: bool = False,
+    file_size_mb: int = SNOWFLAKE_STAGE_FILE_MB,
+    parallel: int | None = None,
+    compression: str = SNOWFLAKE_STAGE_COMPRESSION,
+) -> int:
+    """
+    Bulk load a stream of DataFrames through local Parquet files.
+
+    Mirrors snowflake_loader.stage_and_copy: chunks are spooled to Parquet
+    (so memory stays bounded) and read back with a single read_parquet.
+
+    Returns:
+        Number of rows loaded.
+    """
+    from ingestion.snowflake_loader import write_parquet_files
+
+    table_name = table_name.upper()
+    schema = schema.upper()
+
+    with tempfile.TemporaryDirectory(prefix="milo_stage_") as tmp_dir:
+        files, num_rows = write_parquet_files(
+            chunks, tmp_dir, file_size_mb * 1024 * 1024, compression,
+        )
+        if not num_rows:
+            logger.warning("No rows to stage — skipping load for %s.%s", schema, table_name)
+            return 0
+
+        source = f"read_parquet({json.dumps(files)}, union_by_name = true)"
+        with _cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+            if overwrite or not _table_exists(cursor, schema, table_name):
+                cursor.execute(
+                    f"CREATE OR REPLACE TABLE {schema}.{table_name} AS SELECT * FROM {source}"
+                )
+            else:
+                cursor.execute(f"INSERT INTO {schema}.{table_name} BY NAME SELECT * FROM {source}")
+
+    logger.info(
+        "Loaded %d rows into %s.%s via Parquet files (duckdb)", num_rows, schema, table_name,
+    )
+    return num_rows
+
+
+def merge_dataframe(
+    df: pd.DataFrame,
+    table_name: str,
+    key_column: str = "id",
+    schema: str = SNOWFLAKE_RAW_SCHEMA,
+) -> int:
+    """
+    Upsert a DataFrame into an existing table on ``key_column``.
+
+    Implemented as DELETE of the matching keys + INSERT in one transaction.
+
+    Returns:
+        Number of rows merged.
+    """
+    if df.empty:
+        logger.info("No changed rows — skipping merge for %s.%s", schema, table_name)
+        return 0
+
+    table_name = table_name.upper()
+    schema = schema.upper()
+    key_column = key_column.upper()
+    df.columns = [col.upper() for col in df.columns]
+
+    with _cursor() as cursor:
+        cursor.register("changed_rows", df)
+        with _transaction(cursor):
+            cursor.execute(f"""
+                DELETE FROM {schema}.{table_name}
+                WHERE "{key_column}" IN (SELECT "{key_column}" FROM changed_rows)
+            """)
+            cursor.execute(f"INSERT INTO {schema}.{table_name} BY NAME SELECT * FROM changed_rows")
+        cursor.unregister("changed_rows")
+
+    logger.info("Merged %d rows into %s.%s (duckdb)", len(df), schema, table_name)
+    return len(df)
+
+
+def delete_rows(
+    table_name: str,
+    keys: list,
+    key_column: str = "id",
+    schema: str = SNOWFLAKE_RAW_SCHEMA,
+) -> int:
+    """
+    Delete rows whose ``key_column`` is in ``keys``.
+
+    Returns:
+        Number of rows deleted.
+    """
+    if not keys:
+        return 0
+
+    table_name = table_name.upper()
+    schema = schema.upper()
+    key_column = key_column.upper()
+
+    with _cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {schema}.{table_name} WHERE "{key_column}" IN (SELECT UNNEST($keys))',
+            {"keys": list(keys)},
+        )
+        deleted = cursor.fetchone()[0]
+    logger.info("Deleted %d rows from %s.%s (duckdb)", deleted, schema, table_name)
+    return deleted
+
+
+def get_watermark(source: str) -> str | None:
+    """Return the stored high-water mark for an incremental source, if any."""
+    with _cursor() as cursor:
+        _ensure_state_table(cursor)
+        cursor.execute(
+            f"SELECT HIGH_WATER_MARK FROM {_state_table()} WHERE SOURCE = $source",
+            {"source": source},
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def save_watermark(source: str, value: str) -> None:
+    """Store the high-water mark for an incremental source."""
+    with _cursor() as cursor:
+        _ensure_state_table(cursor)
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {_state_table()} VALUES ($source, $value, CURRENT_TIMESTAMP)",
+            {"source": source, "value": value},
+        )
+    logger.info("Saved watermark for %s: %s", source, value)
+
+
+def _state_table() -> str:
+    return f"{SNOWFLAKE_RAW_SCHEMA}.{INGESTION_STATE_TABLE}"
+
+
+def _ensure_state_table(cursor) -> None:
+    cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {SNOWFLAKE_RAW_SCHEMA}")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {_state_table()} (
+            SOURCE VARCHAR PRIMARY KEY,
+            HIGH_WATER_MARK VARCHAR,
+            UPDATED_AT TIMESTAMPTZ
+        )
+    """)
+
+
+def _convert_params(query: str) -> str:
+    """Rewrite pyformat placeholders (%(name)s) to DuckDB's named $name syntax."""
+    return re.sub(r"%\((\w+)\)s", r"$\1", query)
+
+
+def _upper_columns(table: pa.Table) -> pa.Table:
+    # Snowflake returns unquoted identifiers uppercased; callers rely on that
+    return table.rename_columns([name.upper() for name in table.column_names])
+
+
+def execute_query(query: str, params: dict | None = None) -> pd.DataFrame:
+    """Execute a query and return results as a DataFrame."""
+    with _cursor() as cursor:
+        cursor.execute(_convert_params(query), params)
+        if cursor.description is None:
+            return pd.DataFrame()
+        return _upper_columns(cursor.fetch_arrow_table()).to_pandas()
+
+
+def iter_query_batches(
+    query: str,
+    params: dict | None = None,
+    as_arrow: bool = False,
+) -> Iterator[pd.DataFrame | pa.Table]:
+    """
+    Execute a query and yield the result in batches of up to BATCH_ROWS rows.
+
+    An empty result yields one empty batch with the result's columns.
+    """
+    with _cursor() as cursor:
+        cursor.execute(_convert_params(query), params)
+        reader = cursor.fetch_record_batch(rows_per_batch=BATCH_ROWS)
+        empty = True
+        for batch in reader:
+            empty = False
+            table = _upper_columns(pa.Table.from_batches([batch]))
+            yield table if as_arrow else table.to_pandas()
+        if empty:
+            table = _upper_columns(reader.schema.empty_table())
+            yield table if as_arrow else table.to_pandas()
+
+
+def register_parquet(directory: str, schema: str = SNOWFLAKE_RAW_SCHEMA) -> list[str]:
+    """
+    Create a view per Parquet file or folder of Parquet files in ``directory``.
+
+    ``transactions.parquet`` and ``transactions/*.parquet`` both become
+    ``RAW.TRANSACTIONS``, so dbt sources can read extracts without loading them.
+
+    Returns:
+        Names of the views created.
+    """
+    schema = schema.upper()
+    views = []
+
+    with _cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        for entry in sorted(os.listdir(directory)):
+            path = os.path.abspath(os.path.join(directory, entry))
+            if entry.endswith(".parquet"):
+                name = entry.removesuffix(".parquet")
+            elif os.path.isdir(path):
+                name, path = entry, os.path.join(path, "*.parquet")
+            else:
+                continue
+
+            view = name.upper()
+            cursor.execute(
+                f"CREATE OR REPLACE VIEW {schema}.{view} AS "
+                f"SELECT * FROM read_parquet('{path}', union_by_name = true)"
+            )
+            views.append(view)
+            logger.info("Registered %s.%s -> %s", schema, view, path)
+
+    return views
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local DuckDB warehouse.")
+    parser.add_argument(
+        "--parquet-dir",
+        required=True,
+        help="Directory of Parquet files to expose as RAW views.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    register_parquet(args.parquet_dir)
@@ -0,0 +1,300 @@
+"""
+On-disk HTTP response cache for the ingestion API clients (OFF, Overpass).
+
+Plugs into httpx as a transport wrapper, so a client opts in with
+    httpx.Client(transport=cached_transport())
+
+Responses are keyed on method, URL (including query params) and request body:
+  - within HTTP_CACHE_TTL_SECONDS a stored response is served without a request
+  - after that it is revalidated with If-None-Match / If-Modified-Since when the
+    server sent an ETag / Last-Modified; a 304 refreshes the stored entry
+  - the cache directory is kept under HTTP_CACHE_MAX_MB by evicting the least
+    recently used entries
+
+Only 200 responses are stored. A request with ``Cache-Control: no-cache`` skips
+the fresh-entry shortcut but still updates the cache. Set HTTP_CACHE_DIR to an
+empty string to disable.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+import httpx
+
+from ingestion.config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB, HTTP_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Describe the wire encoding, not the decoded body we store
+_UNSTORED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+@dataclass
+class CacheEntry:
+    """A stored response."""
+
+    headers: list[tuple[str, str]]
+    content: bytes
+    stored_at: float
+
+    def header(self, name: str) -> str | None:
+        return next((v for k, v in self.headers if k.lower() == name), None)
+
+
+class HttpCache:
+    """
+    Size-bounded, TTL-based response store in a local directory.
+
+    Each entry is a ``<key>.body`` file plus a ``<key>.json`` metadata file whose
+    mtime records the last use, for LRU eviction.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl_seconds: float = HTTP_CACHE_TTL_SECONDS,
+        max_bytes: int = HTTP_CACHE_MAX_MB * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(request: httpx.Request) -> str:
+        """Cache key of a request: method, full URL and body."""
+        digest = hashlib.sha256()
+        digest.update(request.method.encode())
+        digest.update(b"\n" + str(request.url).encode() + b"\n")
+        digest.update(request.content)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Return the stored entry for ``key`` and mark it as recently used."""
+        meta_path = self._path(key, "json")
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(self._path(key, "body"), "rb") as f:
+                content = f.read()
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return CacheEntry([tuple(h) for h in meta["headers"]], content, meta["stored_at"])
+
+    def put(self, key: str, headers: list[tuple[str, str]], content: bytes) -> CacheEntry:
+        """Store a response body and its headers, then evict down to the size bound."""
+        entry = CacheEntry(
+            [(k, v) for k, v in headers if k.lower() not in _UNSTORED_HEADERS],
+            content,
+            time.time(),
+        )
+        # Body first, metadata last: an entry is only visible once both exist
+        self._write_atomic(self._path(key, "body"), content)
+        self._write_atomic(
+            self._path(key, "json"),
+            json.dumps({"headers": entry.headers, "stored_at": entry.stored_at}).encode(),
+        )
+        self._evict()
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.stored_at < self.ttl_seconds
+
+    def add_validators(self, request: httpx.Request, entry: CacheEntry | None):
+        """Turn a request for a stale entry into a conditional request."""
+        if entry is None:
+            return
+        if etag := entry.header("etag"):
+            request.headers["If-None-Match"] = etag
+        if last_modified := entry.header("last-modified"):
+            request.headers["If-Modified-Since"] = last_modified
+
+    def response(self, request: httpx.Request, entry: CacheEntry) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers=entry.headers,
+            content=entry.content,
+            request=request,
+            extensions={"from_cache": True},
+        )
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def log_stats(self, label: str = "HTTP cache"):
+        """Log hit/miss counts since the cache was created."""
+        stats = self.stats
+        served = stats["hit"] + stats["revalidated"]
+        total = served + stats["miss"]
+        logger.info(
+            "%s: %d hits, %d revalidated, %d misses (%.0f%% served from cache), %d evicted",
+            label, stats["hit"], stats["revalidated"], stats["miss"],
+            100 * served / total if total else 0, stats["evicted"],
+        )
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def _write_atomic(self, path: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                key = name.removesuffix(".json")
+                try:
+                    meta = os.stat(self._path(key, "json"))
+                    size = meta.st_size + os.path.getsize(self._path(key, "body"))
+                except OSError:
+                    continue
+                entries.append((meta.st_mtime, key, size))
+                total += size
+
+            for _, key, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for suffix in ("json", "body"):
+                    try:
+                        os.remove(self._path(key, suffix))
+                    except OSError:
+                        pass
+                total -= size
+                self.stats["evicted"] += 1
+
+
+def _no_cache(request: httpx.Request) -> bool:
+    """The caller asked for a response from the origin (Cache-Control: no-cache)."""
+    return "no-cache" in request.headers.get("cache-control", "")
+
+
+def _cacheable(response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    return "no-store" not in response.headers.get("cache-control", "")
+
+
+class CachingTransport(httpx.BaseTransport):
+    """httpx transport that serves and stores responses through an HttpCache."""
+
+    def __init__(self, cache: HttpCache, transport: httpx.BaseTransport | None = None):
+        self.cache = cache
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = self.cache.key(request)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry) and not _no_cache(request):
+            self.cache.record("hit")
+            return self.cache.response(request, entry)
+
+        self.cache.add_validators(request, entry)
+        response = self.transport.handle_request(request)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            self.cache.record("revalidated")
+            return self.cache.response(request, self.cache.put(key, entry.headers, entry.content))
+
+        self.cache.record("miss")
+        if not _cacheable(response):
+            return response
+        content = response.read()
+        response.close()
+        entry = self.cache.put(key, response.headers.multi_items(), content)
+        return self.cache.response(request, entry)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of CachingTransport."""
+
+    def __init__(self, cache: HttpCache, transport: httpx.AsyncBaseTransport | None = None):
+        self.cache = cache
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = self.cache.key(request)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry) and not _no_cache(request):
+            self.cache.record("hit")
+            return self.cache.response(request, entry)
+
+        self.cache.add_validators(request, entry)
+        response = await self.transport.handle_async_request(request)
+        if response.status_code == 304 and entry is not None:
+            await response.aclose()
+            self.cache.record("revalidated")
+            return self.cache.response(request, self.cache.put(key, entry.headers, entry.content))
+
+        self.cache.record("miss")
+        if not _cacheable(response):
+            return response
+        content = await response.aread()
+        await response.aclose()
+        entry = self.cache.put(key, response.headers.multi_items(), content)
+        return self.cache.response(request, entry)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_cache: HttpCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> HttpCache | None:
+    """Return the process-wide cache, or None when HTTP_CACHE_DIR is empty."""
+    global _cache
+    if not HTTP_CACHE_DIR:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(HTTP_CACHE_DIR)
+        return _cache
+
+
+def cached_transport(transport: httpx.BaseTransport | None = None) -> httpx.BaseTransport:
+    """Wrap a transport (default: plain HTTP) in the process-wide cache, if enabled."""
+    transport = transport or httpx.HTTPTransport()
+    cache = get_cache()
+    return CachingTransport(cache, transport) if cache else transport
+
+
+def async_cached_transport(
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncBaseTransport:
+    """Async counterpart of cached_transport."""
+    transport = transport or httpx.AsyncHTTPTransport()
+    cache = get_cache()
+    return AsyncCachingTransport(cache, transport) if cache else transport
+
+
+def log_cache_stats(label: str = "HTTP cache"):
+    """Log the process-wide cache's hit/miss counts (no-op if no cache was created)."""
+    # Read _cache directly: get_cache() would create the cache (and its directory)
+    cache = _cache
+    if cache is not None:
+        cache.log_stats(label)
@@ -0,0 +1,528 @@
+"""
+Shared HTTP client layer for the ingestion API sources (OFF, Overpass).
+
+Every client built here stacks the same httpx transports:
+
+    on-disk response cache (ingestion.http_cache)
+      -> optional token-bucket rate limit (per client, e.g. OFF search)
+        -> per-host concurrency limit + request metrics
+          -> pooled keep-alive connections (optionally HTTP/2)
+
+so a cache hit costs neither a rate-limit token nor a connection slot, and the
+metrics only count requests that reached the network. ``send``/``asend`` add a
+retry policy on top: 429/5xx responses, transport errors and responses rejected
+by a caller-supplied check are retried with jittered exponential backoff.
+``call_with_retries`` applies the same policy to SDK calls that raise on 429/5xx.
+
+Usage:
+    response = send(get_client(), "POST", url, data=..., policy=RetryPolicy(max_retries=3))
+    log_metrics()
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import httpx
+
+from ingestion.config import (
+    HTTP2_ENABLED,
+    HTTP_BACKOFF_SECONDS,
+    HTTP_HOST_LIMITS,
+    HTTP_KEEPALIVE_SECONDS,
+    HTTP_MAX_RETRIES,
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE,
+    HTTP_TIMEOUT_SECONDS,
+)
+from ingestion.http_cache import async_cached_transport, cached_transport, log_cache_stats
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+
+# ---------------------------------------------------------------------------
+# Retry policy
+# ---------------------------------------------------------------------------
+
+class RetryableResponseError(Exception):
+    """Raised by a response check when a successful response can't be used (e.g. partial)."""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often and how patiently to retry a request."""
+
+    max_retries: int = HTTP_MAX_RETRIES
+    backoff_seconds: float = HTTP_BACKOFF_SECONDS
+    retry_statuses: frozenset = field(default=frozenset({429, 500, 502, 503, 504}))
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """Exponential backoff with full jitter, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, self.backoff_seconds * 2 ** attempt)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+
+def call_with_retries(fn: Callable, policy: RetryPolicy, what: str = "Call"):
+    """
+    Call ``fn()``, retrying when it raises an exception whose ``status`` is retryable.
+
+    For SDK calls (e.g. Pinecone) that raise instead of returning a response:
+    429/5xx statuses are retried with the policy's backoff; any other
+    exception, or the last failed attempt, is raised.
+    """
+    for attempt in range(policy.max_retries + 1):
+        try:
+            return fn()
+        except Exception as exc:
+            status = getattr(exc, "status", None)
+            if status not in policy.retry_statuses or attempt == policy.max_retries:
+                raise
+            delay = policy.delay(attempt)
+            logger.warning(
+                "%s throttled (HTTP %s), retry %d in %.1fs", what, status, attempt + 1, delay,
+            )
+            time.sleep(delay)
+
+
+def _retry_request_kwargs(attempt: int, kwargs: dict) -> dict:
+    if not attempt:
+        return kwargs
+    # A retry must reach the origin, not be answered with a cached copy of the failure
+    headers = {**(kwargs.get("headers") or {}), "Cache-Control": "no-cache"}
+    return {**kwargs, "headers": headers}
+
+
+def _should_retry(
+    response: httpx.Response, policy: RetryPolicy, check: Callable | None,
+) -> str | None:
+    """Why ``response`` should be retried, or None if it is final."""
+    if response.status_code in policy.retry_statuses:
+        return f"HTTP {response.status_code}"
+    if check is not None and response.is_success:
+        try:
+            check(response)
+        except RetryableResponseError as exc:
+            return str(exc)
+    return None
+
+
+def send(
+    client: httpx.Client,
+    method: str,
+    url: str,
+    policy: RetryPolicy = RetryPolicy(),
+    check: Callable[[httpx.Response], None] | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Send a request, retrying per ``policy``.
+
+    Args:
+        check: Optional callable that raises RetryableResponseError for a
+            successful response whose content is unusable.
+        **kwargs: Passed to ``client.request`` (params, data, timeout, ...).
+
+    Returns:
+        The final response. When retries run out on a retryable status,
+        HTTPStatusError is raised; on a failed check, RetryableResponseError.
+    """
+    for attempt in range(policy.max_retries + 1):
+        retry_after = None
+        try:
+            response = client.request(method, url, **_retry_request_kwargs(attempt, kwargs))
+        except httpx.TransportError as exc:
+            if attempt == policy.max_retries:
+                raise
+            reason = type(exc).__name__
+        else:
+            reason = _should_retry(response, policy, check)
+            if reason is None:
+                return response
+            if attempt == policy.max_retries:
+                response.raise_for_status()
+                raise RetryableResponseError(reason)
+            retry_after = response.headers.get("Retry-After")
+
+        delay = policy.delay(attempt, retry_after)
+        _metrics.record_retry(httpx.URL(url).host)
+        logger.warning(
+            "%s %s failed (%s), retry %d in %.1fs", method, url, reason, attempt + 1, delay,
+        )
+        time.sleep(delay)
+
+
+async def asend(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    policy: RetryPolicy = RetryPolicy(),
+    check: Callable[[httpx.Response], None] | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """Async counterpart of ``send``."""
+    for attempt in range(policy.max_retries + 1):
+        retry_after = None
+        try:
+            response = await client.request(method, url, **_retry_request_kwargs(attempt, kwargs))
+        except httpx.TransportError as exc:
+            if attempt == policy.max_retries:
+                raise
+            reason = type(exc).__name__
+        else:
+            reason = _should_retry(response, policy, check)
+            if reason is None:
+                return response
+            if attempt == policy.max_retries:
+                response.raise_for_status()
+                raise RetryableResponseError(reason)
+            retry_after = response.headers.get("Retry-After")
+
+        delay = policy.delay(attempt, retry_after)
+        _metrics.record_retry(httpx.URL(url).host)
+        logger.warning(
+            "%s %s failed (%s), retry %d in %.1fs", method, url, reason, attempt + 1, delay,
+        )
+        await asyncio.sleep(delay)
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+class RequestMetrics:
+    """Thread-safe per-host request counters and latency histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.retries: Counter = Counter()
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+        self.bytes_received: Counter = Counter()
+        self.bytes_sent: Counter = Counter()
+        self.latency_total: Counter = Counter()
+        self.latency_buckets: dict[str, list[int]] = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+
+    def record(self, host: str, status: int | None, seconds: float, sent: int, received: int):
+        """Record one request; ``status`` is None when it failed without a response."""
+        with self._lock:
+            self.requests[host] += 1
+            if status is None:
+                self.errors[host] += 1
+            else:
+                self.statuses[host][status] += 1
+            self.bytes_sent[host] += sent
+            self.bytes_received[host] += received
+            self.latency_total[host] += seconds
+            bucket = next(i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound)
+            self.latency_buckets[host][bucket] += 1
+
+    def record_retry(self, host: str):
+        with self._lock:
+            self.retries[host] += 1
+
+    def log_summary(self):
+        """Log one line per host: requests, statuses, bytes, latency histogram."""
+        with self._lock:
+            for host in sorted(self.requests):
+                count = self.requests[host]
+                statuses = ", ".join(f"{s}x{n}" for s, n in sorted(self.statuses[host].items()))
+                histogram = " ".join(
+                    f"<={bound:g}s:{n}" if bound != float("inf") else f">60s:{n}"
+                    for bound, n in zip(LATENCY_BUCKETS, self.latency_buckets[host])
+                    if n
+                )
+                logger.info(
+                    "HTTP %s: %d requests (%s), %d errors, %d retries, %.1f MB in, "
+                    "%.2fs mean latency [%s]",
+                    host, count, statuses or "no responses", self.errors[host], self.retries[host],
+                    self.bytes_received[host] / 1e6, self.latency_total[host] / count, histogram,
+                )
+
+
+_metrics = RequestMetrics()
+
+
+def get_metrics() -> RequestMetrics:
+    """Return the process-wide request metrics."""
+    return _metrics
+
+
+def log_metrics():
+    """Log request metrics and HTTP cache statistics."""
+    _metrics.log_summary()
+    log_cache_stats()
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+def parse_host_limits(spec: str) -> dict[str, int]:
+    """Parse "host=n,host=n" into {host: n}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        host, _, limit = item.partition("=")
+        limits[host.strip()] = int(limit)
+    return limits
+
+
+class _ObservedStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Response body wrapper that counts bytes and reports once the body is closed."""
+
+    def __init__(self, stream, on_close: Callable[[int], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._bytes = 0
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._bytes += len(chunk)
+            yield chunk
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._bytes += len(chunk)
+            yield chunk
+
+    def _report(self):
+        if not self._closed:
+            self._closed = True
+            self._on_close(self._bytes)
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._report()
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._report()
+
+
+def _observed(response: httpx.Response, on_close: Callable[[int], None]) -> httpx.Response:
+    return httpx.Response(
+        response.status_code,
+        headers=response.headers,
+        stream=_ObservedStream(response.stream, on_close),
+        extensions=response.extensions,
+    )
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """Applies per-host concurrency limits and records metrics for each request."""
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        host_limits: dict[str, int] | None = None,
+        metrics: RequestMetrics | None = None,
+    ):
+        self.transport = transport
+        self.metrics = metrics or _metrics
+        self._slots = {
+            host: threading.BoundedSemaphore(n) for host, n in (host_limits or {}).items()
+        }
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        slot = self._slots.get(host)
+        if slot is not None:
+            slot.acquire()
+        start = time.perf_counter()
+        sent = len(request.content)
+
+        def done(status, received):
+            self.metrics.record(host, status, time.perf_counter() - start, sent, received)
+            if slot is not None:
+                slot.release()
+
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            done(None, 0)
+            raise
+        # The slot is held, and latency measured, until the body has been read
+        return _observed(response, lambda received: done(response.status_code, received))
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncInstrumentedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of InstrumentedTransport."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        host_limits: dict[str, int] | None = None,
+        metrics: RequestMetrics | None = None,
+    ):
+        self.transport = transport
+        self.metrics = metrics or _metrics
+        self._slots = {host: asyncio.Semaphore(n) for host, n in (host_limits or {}).items()}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        slot = self._slots.get(host)
+        if slot is not None:
+            await slot.acquire()
+        start = time.perf_counter()
+        sent = len(request.content)
+
+        def done(status, received):
+            self.metrics.record(host, status, time.perf_counter() - start, sent, received)
+            if slot is not None:
+                slot.release()
+
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            done(None, 0)
+            raise
+        return _observed(response, lambda received: done(response.status_code, received))
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket: ``rate`` requests per second, bursts of up to ``capacity``.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a request may be sent."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Takes a token from ``limiter`` before every request that reaches the network."""
+
+    def __init__(self, limiter: TokenBucket, transport: httpx.AsyncBaseTransport):
+        self.limiter = limiter
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.limiter.acquire()
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Clients
+# ---------------------------------------------------------------------------
+
+def _http2_enabled() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but the h2 package is missing; using HTTP/1.1")
+        return False
+    return True
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+    )
+
+
+def build_client(transport: httpx.BaseTransport | None = None) -> httpx.Client:
+    """
+    Build a sync client on the shared transport stack.
+
+    Args:
+        transport: Innermost transport (default: pooled HTTP connections).
+    """
+    transport = transport or httpx.HTTPTransport(http2=_http2_enabled(), limits=_pool_limits())
+    return httpx.Client(
+        timeout=HTTP_TIMEOUT_SECONDS,
+        transport=cached_transport(
+            InstrumentedTransport(transport, parse_host_limits(HTTP_HOST_LIMITS))
+        ),
+    )
+
+
+def build_async_client(
+    transport: httpx.AsyncBaseTransport | None = None,
+    limiter: TokenBucket | None = None,
+) -> httpx.AsyncClient:
+    """
+    Build an async client on the shared transport stack.
+
+    Async clients are tied to one event loop, so callers create one per run
+    (connections are pooled for its lifetime) and close it when done.
+
+    Args:
+        transport: Innermost transport (default: pooled HTTP connections).
+        limiter: Optional rate limit for requests that reach the network.
+    """
+    transport = transport or httpx.AsyncHTTPTransport(http2=_http2_enabled(), limits=_pool_limits())
+    transport = AsyncInstrumentedTransport(transport, parse_host_limits(HTTP_HOST_LIMITS))
+    if limiter is not None:
+        transport = RateLimitedTransport(limiter, transport)
+    return httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT_SECONDS, transport=async_cached_transport(transport),
+    )
+
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """
+    Return the process-wide sync client (thread-safe), creating it on first use.
+
+    Keep-alive connections are reused across calls and threads.
+    """
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = build_client()
+        return _client
+
+
+def close_client():
+    """Close the process-wide sync client."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
@@ -2,17 +2,62 @@
 Seed product/brand catalog from the Open Food Facts API.
 
 Downloads Belgian products with brand information and loads into Snowflake RAW
-for later use in brand master data enrichment.
+for later use in brand master data enrichment. Search pages are fetched
+concurrently under a token-bucket rate limit (OFF allows 10 search requests per
+minute), with jittered retries on 429 and 5xx responses (ingestion.http_client).
+
+The search API stops at a few thousand products; for full coverage, stream the
+official bulk export instead (it is filtered to Belgium while decompressing):
+    python -m ingestion.open_food_facts --dump openfoodfacts-products.jsonl.gz
+
+Weekly runs use --incremental: only products whose last_modified_t is newer
+than the last load are fetched (newest first) and MERGEd on barcode. If more
+products changed than OFF_MAX_PAGES pages hold, a catalog last loaded from the
+(equally capped) API is reloaded in full. A catalog loaded from a dump is never
+replaced by a capped API load: the fetched changes are merged, the sync state
+is kept, and the run fails so that a fresh --dump load gets scheduled.
 """
 
+import argparse
+import asyncio
+import csv
+import gzip
 import logging
+import os
+import sys
 import time
+from collections.abc import Callable, Iterator
 
 import httpx
 import pandas as pd
 
-from ingestion.config import OFF_API_BASE, OFF_COUNTRY, OFF_MAX_PAGES, OFF_PAGE_SIZE
-from ingestion.snowflake_loader import load_dataframe
+from ingestion.columnar import first_item, first_token, loads, records_to_columns
+from ingestion.config import (
+    OFF_API_BASE,
+    OFF_CONCURRENCY,
+    OFF_COUNTRY,
+    OFF_DUMP_CHUNK_SIZE,
+    OFF_MAX_PAGES,
+    OFF_MAX_RETRIES,
+    OFF_PAGE_SIZE,
+    OFF_RATE_LIMIT_PER_MINUTE,
+    SNOWFLAKE_LOAD_METHOD,
+)
+from ingestion.http_client import (
+    RetryPolicy,
+    TokenBucket,
+    asend,
+    build_async_client,
+    log_metrics,
+)
+from ingestion.snowflake_loader import (
+    get_watermark,
+    load_dataframe,
+    merge_dataframe,
+    save_watermark,
+    stage_and_copy,
+    swap_table,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,100 +74,435 @@ OFF_FIELDS = [
     "nova_group",
     "ecoscore_grade",
     "image_url",
+    "last_modified_t",
 ]
 
+# Source field -> RAW.OFF_PRODUCTS column
+RAW_COLUMNS = {
+    "code": "barcode",
+    "product_name": "product_name",
+    "brands": "brands_raw",
+    "primary_brand": "primary_brand",
+    "primary_category": "off_category",
+    "stores": "stores",
+    "quantity": "quantity",
+    "nutriscore_grade": "nutriscore",
+    "nova_group": "nova_group",
+    "ecoscore_grade": "ecoscore",
+    "last_modified_t": "last_modified_t",
+}
 
-def fetch_belgian_products(max_pages: int = OFF_MAX_PAGES) -> pd.DataFrame:
+# Key of the incremental sync state in RAW.INGESTION_STATE (max last_modified_t loaded)
+SYNC_SOURCE = "off.products"
+
+# Key recording how RAW.OFF_PRODUCTS was last fully loaded: "dump" or "api" (page-capped)
+LOAD_METHOD_SOURCE = "off.products.load_method"
+
+
+class IncompleteSyncError(Exception):
+    """Raised when the page cap is hit before reaching already synced products."""
+
+    def __init__(self, message: str, products: pd.DataFrame):
+        super().__init__(message)
+        self.products = products  # the newest changes, which were fetched
+
+
+async def fetch_page(
+    client: httpx.AsyncClient,
+    page: int,
+    max_retries: int = OFF_MAX_RETRIES,
+    backoff_seconds: float = 2.0,
+    extra_params: dict | None = None,
+) -> list[dict]:
     """
-    Fetch Belgian products from Open Food Facts API.
+    Fetch one page of the OFF search API, retrying 429/5xx and network errors.
 
-    Returns a DataFrame with one row per product.
+    Returns the page's products (empty past the last page).
     """
-    all_products = []
+    params = {
+        "countries_tags_contains": f"en:{OFF_COUNTRY}",
+        "fields": ",".join(OFF_FIELDS),
+        "page_size": OFF_PAGE_SIZE,
+        "page": page,
+        "json": 1,
+        **(extra_params or {}),
+    }
 
-    with httpx.Client(timeout=30) as client:
-        for page in range(1, max_pages + 1):
-            url = f"{OFF_API_BASE}/search"
-            params = {
-                "countries_tags_contains": f"en:{OFF_COUNTRY}",
-                "fields": ",".join(OFF_FIELDS),
-                "page_size": OFF_PAGE_SIZE,
-                "page": page,
-                "json": 1,
-            }
+    policy = RetryPolicy(max_retries=max_retries, backoff_seconds=backoff_seconds)
+    resp = await asend(client, "GET", f"{OFF_API_BASE}/search", policy=policy, params=params)
+    resp.raise_for_status()
+    return loads(resp.content).get("products", [])
 
-            logger.info("Fetching OFF page %d/%d...", page, max_pages)
-            resp = client.get(url, params=params)
-            resp.raise_for_status()
-            data = resp.json()
 
-            products = data.get("products", [])
+async def fetch_products_async(
+    max_pages: int = OFF_MAX_PAGES,
+    concurrency: int = OFF_CONCURRENCY,
+    rate_per_minute: float = OFF_RATE_LIMIT_PER_MINUTE,
+    transport: httpx.AsyncBaseTransport | None = None,
+    backoff_seconds: float = 2.0,
+    extra_params: dict | None = None,
+    is_last_page: Callable[[list[dict]], bool] | None = None,
+) -> list[dict]:
+    """
+    Fetch OFF search pages concurrently under a shared rate limit.
+
+    Up to ``concurrency`` pages are in flight at once. Once a page comes back
+    empty no later pages are requested, and any already fetched past it are
+    discarded, so the result is exactly what paging one by one would return.
+    Pages served from the HTTP cache don't count against the rate limit.
+
+    Args:
+        transport: Underlying httpx transport (default: the shared connection pool).
+        extra_params: Additional search parameters (e.g. sort_by).
+        is_last_page: Optional predicate on a page's products; when it holds,
+            that page is kept but no later pages are.
+
+    Returns:
+        Products in page order.
+    """
+    # No burst allowance: OFF's limit is per minute, so even the first minute
+    # must stay within rate_per_minute requests
+    limiter = TokenBucket(rate_per_minute / 60, capacity=1)
+    client = build_async_client(transport, limiter=limiter)
+    pages: dict[int, list[dict]] = {}
+    next_page = 1
+    last_page = max_pages  # lowered when a page comes back empty
+
+    async def worker():
+        nonlocal next_page, last_page
+        while next_page <= last_page:
+            page = next_page
+            next_page += 1
+
+            logger.info("Fetching OFF page %d/%d...", page, max_pages)
+            products = await fetch_page(
+                client, page, backoff_seconds=backoff_seconds, extra_params=extra_params,
+            )
             if not products:
-                logger.info("No more products at page %d, stopping.", page)
-                break
+                if page <= last_page:
+                    logger.info("No more products at page %d, stopping.", page)
+                last_page = min(last_page, page - 1)
+                continue
 
-            all_products.extend(products)
-            logger.info("Fetched %d products (total: %d)", len(products), len(all_products))
+            pages[page] = products
+            if is_last_page is not None and is_last_page(products):
+                if page < last_page:
+                    logger.info("Reached already synced products at page %d, stopping.", page)
+                last_page = min(last_page, page)
+            logger.info("Fetched %d products from page %d", len(products), page)
 
-            # Rate limiting: be polite to the API
-            time.sleep(1)
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        await client.aclose()
+        log_metrics()
+
+    return [product for page in range(1, last_page + 1) for product in pages.get(page, [])]
+
+
+def fetch_belgian_products(max_pages: int = OFF_MAX_PAGES) -> pd.DataFrame:
+    """
+    Fetch Belgian products from Open Food Facts API.
+
+    Returns a DataFrame with one row per product.
+    """
+    all_products = asyncio.run(fetch_products_async(max_pages))
 
     if not all_products:
         logger.warning("No products fetched from OFF API.")
         return pd.DataFrame()
 
-    df = pd.DataFrame(all_products)
+    df = add_derived_columns(pd.DataFrame(records_to_columns(all_products)))
+    logger.info("Total products fetched: %d", len(df))
+    return df
+
+
+def fetch_changed_products(since: int, max_pages: int = OFF_MAX_PAGES) -> pd.DataFrame:
+    """
+    Fetch Belgian products modified after ``since`` (epoch seconds).
+
+    Pages are requested newest-first (sort_by=last_modified_t) and paging stops
+    at the first page that reaches products at or before ``since``.
+
+    Returns a DataFrame with one row per changed product (latest version).
+
+    Raises:
+        IncompleteSyncError: All ``max_pages`` pages were full and the oldest
+            product fetched is still newer than ``since``, so older changes
+            were not fetched. The error carries the changes that were.
+    """
+    def reached_synced(products: list[dict]) -> bool:
+        return (products[-1].get("last_modified_t") or 0) <= since
+
+    products = asyncio.run(fetch_products_async(
+        max_pages,
+        extra_params={"sort_by": "last_modified_t"},
+        is_last_page=reached_synced,
+    ))
+    changed = [p for p in products if (p.get("last_modified_t") or 0) > since]
+    if changed:
+        # A product edited mid-sync can appear on two pages; the first one is newest
+        df = add_derived_columns(pd.DataFrame(records_to_columns(changed)))
+        df = df.drop_duplicates("code", keep="first")
+    else:
+        df = pd.DataFrame()
 
+    if len(products) >= max_pages * OFF_PAGE_SIZE and not reached_synced(products):
+        raise IncompleteSyncError(
+            f"{len(products)} OFF products changed since {since} without reaching it "
+            f"within {max_pages} pages",
+            df,
+        )
+
+    logger.info("Fetched %d OFF products modified since %d", len(df), since)
+    return df
+
+
+def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Add primary_brand and primary_category to a frame of OFF products."""
     # Clean up: extract primary brand
     if "brands" in df.columns:
-        df["primary_brand"] = (
-            df["brands"]
-            .fillna("")
-            .str.split(",")
-            .str[0]
-            .str.strip()
-        )
+        df["primary_brand"] = first_token(df["brands"], ",")
 
     # Flatten categories_tags to first category
     if "categories_tags" in df.columns:
-        df["primary_category"] = (
-            df["categories_tags"]
-            .apply(lambda x: x[0].replace("en:", "") if isinstance(x, list) and x else "")
-        )
+        df["primary_category"] = first_item(df["categories_tags"], strip="en:")
 
-    logger.info("Total products fetched: %d", len(df))
     return df
 
 
-def run(overwrite: bool = True):
-    """Fetch Belgian products from OFF and load into Snowflake RAW."""
-    df = fetch_belgian_products()
+def to_raw_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Select and rename the columns stored in RAW.OFF_PRODUCTS."""
+    # Only include columns that exist
+    available = {k: v for k, v in RAW_COLUMNS.items() if k in df.columns}
+    return df[list(available.keys())].rename(columns=available)
+
+
+def _open_dump(path: str):
+    """Open a (optionally gzipped) dump file as text, decompressing on the fly."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="")
+    return open(path, encoding="utf-8", errors="replace", newline="")
+
+
+def iter_dump_products(path: str) -> Iterator[dict]:
+    """
+    Stream Belgian products out of an OFF bulk export, one dict per product.
+
+    Supports the JSONL export (openfoodfacts-products.jsonl.gz) and the
+    tab-separated CSV export (en.openfoodfacts.org.products.csv.gz). Only
+    OFF_FIELDS are kept; tag fields are lists in both cases.
+    """
+    country_tag = f"en:{OFF_COUNTRY}"
+
+    with _open_dump(path) as f:
+        if ".json" in os.path.basename(path):
+            for line in f:
+                # Cheap substring test first: most of the world catalog isn't Belgian
+                if country_tag not in line:
+                    continue
+                product = loads(line)
+                if country_tag in (product.get("countries_tags") or []):
+                    yield {field: product.get(field) for field in OFF_FIELDS}
+        else:
+            csv.field_size_limit(sys.maxsize)
+            reader = csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+            header = next(reader)
+            positions = {field: header.index(field) for field in OFF_FIELDS if field in header}
+            countries = positions["countries_tags"]
+
+            for values in reader:
+                if len(values) <= countries or country_tag not in values[countries].split(","):
+                    continue
+                product = {}
+                for field in OFF_FIELDS:
+                    value = values[positions[field]] if field in positions else ""
+                    if field.endswith("_tags"):
+                        product[field] = value.split(",") if value else []
+                    else:
+                        product[field] = value or None
+                yield product
+
+
+def iter_dump_chunks(path: str, chunk_size: int = OFF_DUMP_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yield RAW.OFF_PRODUCTS-shaped DataFrames of up to ``chunk_size`` products.
+
+    Every chunk has the same columns and dtypes, so chunks can be appended to
+    one table regardless of which fields happen to be empty in a chunk.
+    """
+    batch = []
+    for product in iter_dump_products(path):
+        batch.append(product)
+        if len(batch) >= chunk_size:
+            yield _dump_frame(batch)
+            batch = []
+    if batch:
+        yield _dump_frame(batch)
+
+
+def _dump_frame(products: list[dict]) -> pd.DataFrame:
+    df = pd.DataFrame(records_to_columns(products, OFF_FIELDS))
+    df = to_raw_columns(add_derived_columns(df))
+    for col in df.columns:
+        if col in ("nova_group", "last_modified_t"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        else:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def load_dump(path: str, chunk_size: int = OFF_DUMP_CHUNK_SIZE) -> int:
+    """
+    Replace RAW.OFF_PRODUCTS with the Belgian products of a bulk export.
+
+    The file is decompressed and parsed incrementally and loaded chunk by
+    chunk into a shadow table that is swapped in at the end.
+
+    Returns:
+        Number of products loaded.
+    """
+    total_rows = 0
+    start = time.perf_counter()
+    last_modified = []
+
+    def tracked(chunks):
+        for chunk in chunks:
+            last_modified.append(chunk["last_modified_t"].max())
+            yield chunk
+
+    with swap_table("off_products") as shadow_table:
+        chunks = tracked(iter_dump_chunks(path, chunk_size))
+        if SNOWFLAKE_LOAD_METHOD == "parquet_stage":
+            total_rows = stage_and_copy(chunks, table_name=shadow_table)
+        else:
+            for chunk in chunks:
+                total_rows += load_dataframe(chunk, table_name=shadow_table)
+                logger.info("Loaded %d Belgian products so far", total_rows)
+
+    logger.info(
+        "Loaded %d OFF products from %s into RAW.OFF_PRODUCTS in %.0fs",
+        total_rows, path, time.perf_counter() - start,
+    )
+    _save_sync_state(pd.Series(last_modified, dtype="Int64"), load_method="dump")
+    return total_rows
+
+
+def sync_changed_products(since: int, max_pages: int = OFF_MAX_PAGES) -> int:
+    """
+    MERGE products modified after ``since`` into RAW.OFF_PRODUCTS on barcode.
+
+    Returns:
+        Number of products merged.
+
+    Raises:
+        IncompleteSyncError: Too many changes for ``max_pages``; nothing is
+            merged and the sync state is left unchanged.
+    """
+    df = fetch_changed_products(since, max_pages)
     if df.empty:
-        logger.warning("No OFF data to load.")
+        logger.info("No OFF products changed since %d.", since)
+        return 0
+
+    df_clean = to_raw_columns(df)
+    rows = merge_dataframe(df_clean, table_name="off_products", key_column="barcode")
+    _save_sync_state(df_clean["last_modified_t"])
+    return rows
+
+
+def _save_sync_state(last_modified: pd.Series, load_method: str | None = None):
+    """
+    Record the newest last_modified_t loaded as the next sync's starting point.
+
+    Args:
+        load_method: For full loads, "dump" or "api" (see LOAD_METHOD_SOURCE).
+    """
+    newest = pd.to_numeric(last_modified, errors="coerce").max()
+    if pd.notna(newest):
+        save_watermark(SYNC_SOURCE, str(int(newest)))
+    if load_method is not None:
+        save_watermark(LOAD_METHOD_SOURCE, load_method)
+
+
+def _merge_partial_sync(exc: IncompleteSyncError):
+    """Merge the changes an incomplete sync did fetch, leaving the sync state as is."""
+    rows = 0
+    if not exc.products.empty:
+        rows = merge_dataframe(
+            to_raw_columns(exc.products), table_name="off_products", key_column="barcode",
+        )
+    logger.error(
+        "%s — merged the %d newest changes; older ones stay missing until the next "
+        "--dump load.", exc, rows,
+    )
+
+
+def run(overwrite: bool = True, dump_path: str | None = None, incremental: bool = False):
+    """
+    Fetch Belgian products from OFF and load into Snowflake RAW.
+
+    Args:
+        overwrite: Replace the table (API mode); a dump load always replaces it.
+        dump_path: Load from a local bulk export instead of the search API.
+        incremental: Only MERGE products modified since the last successful
+            load. Falls back to a full load when there is no sync state yet.
+
+    Raises:
+        IncompleteSyncError: An incremental sync hit the page cap and the
+            catalog was not loaded from the API, so it can't be reloaded in full.
+    """
+    if dump_path:
+        load_dump(dump_path)
         return
 
-    # Select and rename columns for Snowflake
-    columns_map = {
-        "code": "barcode",
-        "product_name": "product_name",
-        "brands": "brands_raw",
-        "primary_brand": "primary_brand",
-        "primary_category": "off_category",
-        "stores": "stores",
-        "quantity": "quantity",
-        "nutriscore_grade": "nutriscore",
-        "nova_group": "nova_group",
-        "ecoscore_grade": "ecoscore",
-    }
+    if incremental:
+        since = get_watermark(SYNC_SOURCE)
+        if since is None:
+            logger.info("No OFF sync state yet — running a full load.")
+        else:
+            try:
+                rows = sync_changed_products(int(since))
+            except IncompleteSyncError as exc:
+                if get_watermark(LOAD_METHOD_SOURCE) != "api":
+                    # A capped API load would replace most of a dump-loaded catalog
+                    _merge_partial_sync(exc)
+                    raise
+                logger.warning("%s — running a full load instead.", exc)
+            else:
+                logger.info("Merged %d changed OFF products into RAW.OFF_PRODUCTS", rows)
+                return
 
-    # Only include columns that exist
-    available = {k: v for k, v in columns_map.items() if k in df.columns}
-    df_clean = df[list(available.keys())].rename(columns=available)
+    df = fetch_belgian_products()
+    if df.empty:
+        logger.warning("No OFF data to load.")
+        return
 
-    rows = load_dataframe(df_clean, table_name="off_products", overwrite=overwrite)
+    df_clean = to_raw_columns(df)
+    rows = load_dataframe(df_clean, table_name="off_products", overwrite=overwrite, swap=True)
     logger.info("Loaded %d OFF products into RAW.OFF_PRODUCTS", rows)
+    if "last_modified_t" in df_clean.columns:
+        _save_sync_state(df_clean["last_modified_t"], load_method="api")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load Belgian Open Food Facts products into RAW.")
+    parser.add_argument(
+        "--dump",
+        metavar="PATH",
+        help="Local OFF export (.jsonl.gz or .csv.gz) to stream instead of paging the API.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only merge products modified since the last successful load.",
+    )
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO)
-    run()
+    run(dump_path=args.dump, incremental=args.incremental)
@@ -3,21 +3,54 @@ Query Belgian grocery store locations from OpenStreetMap via the Overpass API.
 
 Extracts store name, branch, lat/lng, city, province, postcode for all major
 Belgian grocery chains. Results are loaded into Snowflake RAW.
+The query is split into shards (a grid of sub-bboxes x groups of chains) that
+run in parallel and are retried independently, so one slow or rate-limited
+shard doesn't lose the whole refresh. Requests go through the shared HTTP client
+(ingestion.http_client), which caps concurrent Overpass requests per host and
+caches responses on disk. With --pbf / OSM_PBF_PATH the stores are
+read from a local .osm.pbf extract instead (ingestion.osm_pbf).
 """
 
+import argparse
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import httpx
 import pandas as pd
+import pyarrow as pa
 
-from ingestion.config import OSM_BELGIUM_BBOX, OSM_OVERPASS_URL, OSM_STORE_NAMES
+from ingestion.columnar import loads
+from ingestion.config import (
+    OSM_BELGIUM_BBOX,
+    OSM_CHAINS_PER_SHARD,
+    OSM_OVERPASS_URL,
+    OSM_PBF_PATH,
+    OSM_QUERY_TIMEOUT,
+    OSM_SHARD_GRID,
+    OSM_SHARD_RETRIES,
+    OSM_SHARD_WORKERS,
+    OSM_STORE_NAMES,
+)
+from ingestion.http_client import (
+    RetryableResponseError,
+    RetryPolicy,
+    get_client,
+    log_metrics,
+    send,
+)
 from ingestion.snowflake_loader import load_dataframe
 
 logger = logging.getLogger(__name__)
 
 
-def build_overpass_query(store_names: list[str], bbox: str) -> str:
+class OverpassError(Exception):
+    """An Overpass query failed or returned an incomplete result."""
+
+
+def build_overpass_query(
+    store_names: list[str], bbox: str, timeout: int = OSM_QUERY_TIMEOUT
+) -> str:
     """
     Build an Overpass QL query to find grocery stores in Belgium.
 
@@ -30,80 +63,217 @@ def build_overpass_query(store_names: list[str], bbox: str) -> str:
     )
 
     return f"""
-[out:json][timeout:120];
+[out:json][timeout:{timeout}];
 (
 {name_filters});
 out center tags;
 """
 
 
-def fetch_stores() -> pd.DataFrame:
+def split_bbox(bbox: str, rows: int, cols: int) -> list[str]:
+    """Split a "south,west,north,east" bbox into a rows x cols grid of bboxes."""
+    south, west, north, east = (float(v) for v in bbox.split(","))
+    lat_step = (north - south) / rows
+    lng_step = (east - west) / cols
+    return [
+        ",".join(
+            f"{v:g}" for v in (
+                south + r * lat_step,
+                west + c * lng_step,
+                south + (r + 1) * lat_step,
+                west + (c + 1) * lng_step,
+            )
+        )
+        for r in range(rows)
+        for c in range(cols)
+    ]
+
+
+def build_shards(
+    store_names: list[str] = OSM_STORE_NAMES,
+    bbox: str = OSM_BELGIUM_BBOX,
+    grid: str = OSM_SHARD_GRID,
+    chains_per_shard: int = OSM_CHAINS_PER_SHARD,
+) -> list[tuple[str, str]]:
+    """
+    Split the store query into (label, Overpass query) shards.
+
+    Each shard covers one cell of a ``grid`` ("rows x cols") over ``bbox`` for
+    up to ``chains_per_shard`` chains.
+    """
+    rows, cols = (int(n) for n in grid.lower().split("x"))
+    chain_groups = [
+        store_names[i:i + chains_per_shard] for i in range(0, len(store_names), chains_per_shard)
+    ]
+    return [
+        (
+            f"cell {cell + 1}/{rows * cols} {chains[0]}..{chains[-1]}",
+            build_overpass_query(chains, cell_bbox),
+        )
+        for cell, cell_bbox in enumerate(split_bbox(bbox, rows, cols))
+        for chains in chain_groups
+    ]
+
+
+def _check_complete(resp: httpx.Response):
+    """Reject a 200 response whose remark says the query ran out of time or memory."""
+    # Substring test first, so complete responses aren't decoded twice
+    if b'"remark"' not in resp.content:
+        return
+    remark = loads(resp.content).get("remark", "")
+    if "runtime error" in remark or "timed out" in remark:
+        raise RetryableResponseError(remark.strip())
+
+
+def fetch_shard(
+    client: httpx.Client,
+    label: str,
+    query: str,
+    max_retries: int = OSM_SHARD_RETRIES,
+    backoff_seconds: float = 5.0,
+) -> list[dict]:
+    """
+    Run one Overpass shard query, retrying rate limits, server errors and timeouts.
+
+    Overpass reports a query that ran out of time as a 200 response with a
+    "runtime error" remark and partial elements, so that counts as a failure too.
+
+    Returns:
+        The shard's elements.
+    """
+    policy = RetryPolicy(max_retries=max_retries, backoff_seconds=backoff_seconds)
+    start = time.perf_counter()
+    try:
+        resp = send(
+            client, "POST", OSM_OVERPASS_URL, policy=policy, check=_check_complete,
+            data={"data": query}, timeout=OSM_QUERY_TIMEOUT + 60,
+        )
+        resp.raise_for_status()
+    except (RetryableResponseError, httpx.HTTPError) as exc:
+        raise OverpassError(f"Shard {label} failed: {exc}") from exc
+
+    elements = loads(resp.content).get("elements", [])
+    logger.info(
+        "Overpass shard %s: %d elements in %.1fs",
+        label, len(elements), time.perf_counter() - start,
+    )
+    return elements
+
+
+def fetch_elements(shards: list[tuple[str, str]], workers: int = OSM_SHARD_WORKERS) -> list[dict]:
+    """
+    Run shard queries in parallel and merge their elements.
+
+    Elements returned by several shards (e.g. ways crossing a cell border) are
+    kept once per (type, id). Raises OverpassError if any shard fails for good,
+    so a partial result never replaces the stored stores.
+    """
+    start = time.perf_counter()
+    elements: dict[tuple[str, int], dict] = {}
+
+    client = get_client()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fetch_shard, client, label, query) for label, query in shards]
+        try:
+            for future in as_completed(futures):
+                for el in future.result():
+                    elements[(el["type"], el["id"])] = el
+        except Exception:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    log_metrics()
+    logger.info(
+        "Received %d unique elements from %d Overpass shards in %.1fs",
+        len(elements), len(shards), time.perf_counter() - start,
+    )
+    return [elements[key] for key in sorted(elements)]
+
+
+def parse_elements(elements: list[dict]) -> pd.DataFrame:
+    """
+    Turn Overpass elements into one store record per element.
+
+    Columns are built straight from the element stream into an Arrow table
+    rather than through one dict per element.
+    """
+    tags = [el.get("tags", {}) for el in elements]
+    # Nodes have lat/lon directly, ways have center
+    points = [el if el["type"] == "node" else el.get("center", {}) for el in elements]
+
+    def tag_column(key: str) -> pa.Array:
+        return pa.array([t.get(key, "") for t in tags], pa.string())
+
+    table = pa.table({
+        "osm_id": pa.array([el.get("id") for el in elements], pa.int64()),
+        "osm_type": pa.array([el.get("type") for el in elements], pa.string()),
+        "store_name": tag_column("name"),
+        "branch": tag_column("branch"),
+        "brand": tag_column("brand"),
+        "lat": pa.array([p.get("lat") for p in points], pa.float64()),
+        "lng": pa.array([p.get("lon") for p in points], pa.float64()),
+        "street": tag_column("addr:street"),
+        "housenumber": tag_column("addr:housenumber"),
+        "postcode": tag_column("addr:postcode"),
+        "city": tag_column("addr:city"),
+        "province": tag_column("addr:province"),
+        "phone": tag_column("phone"),
+        "opening_hours": tag_column("opening_hours"),
+    })
+    return table.to_pandas()
+
+
+def fetch_stores(pbf_path: str | None = OSM_PBF_PATH) -> pd.DataFrame:
     """
     Query Overpass API for Belgian grocery stores.
 
+    Args:
+        pbf_path: Read stores from this local .osm.pbf extract instead
+            (see ingestion.osm_pbf).
+
     Returns DataFrame with columns:
         osm_id, store_name, branch, lat, lng, city, postcode, street, housenumber
     """
-    query = build_overpass_query(OSM_STORE_NAMES, OSM_BELGIUM_BBOX)
-    logger.info("Querying Overpass API for %d store chains...", len(OSM_STORE_NAMES))
+    if pbf_path:
+        from ingestion.osm_pbf import fetch_stores_from_pbf
 
-    with httpx.Client(timeout=180) as client:
-        resp = client.post(OSM_OVERPASS_URL, data={"data": query})
-        resp.raise_for_status()
-        data = resp.json()
+        return fetch_stores_from_pbf(pbf_path)
 
-    elements = data.get("elements", [])
-    logger.info("Received %d elements from Overpass", len(elements))
+    shards = build_shards()
+    logger.info(
+        "Querying Overpass API for %d store chains in %d shards...",
+        len(OSM_STORE_NAMES), len(shards),
+    )
+    elements = fetch_elements(shards)
 
     if not elements:
         return pd.DataFrame()
 
-    records = []
-    for el in elements:
-        tags = el.get("tags", {})
-
-        # Get coordinates (nodes have lat/lon directly, ways have center)
-        if el["type"] == "node":
-            lat = el.get("lat")
-            lng = el.get("lon")
-        else:
-            center = el.get("center", {})
-            lat = center.get("lat")
-            lng = center.get("lon")
-
-        records.append({
-            "osm_id": el.get("id"),
-            "osm_type": el.get("type"),
-            "store_name": tags.get("name", ""),
-            "branch": tags.get("branch", ""),
-            "brand": tags.get("brand", ""),
-            "lat": lat,
-            "lng": lng,
-            "street": tags.get("addr:street", ""),
-            "housenumber": tags.get("addr:housenumber", ""),
-            "postcode": tags.get("addr:postcode", ""),
-            "city": tags.get("addr:city", ""),
-            "province": tags.get("addr:province", ""),
-            "phone": tags.get("phone", ""),
-            "opening_hours": tags.get("opening_hours", ""),
-        })
-
-    df = pd.DataFrame(records)
+    df = parse_elements(elements)
     logger.info("Parsed %d store locations", len(df))
     return df
 
 
-def run(overwrite: bool = True):
+def run(overwrite: bool = True, pbf_path: str | None = OSM_PBF_PATH):
     """Fetch Belgian store locations from OSM and load into Snowflake RAW."""
-    df = fetch_stores()
+    df = fetch_stores(pbf_path)
     if df.empty:
         logger.warning("No OSM store data to load.")
         return
 
-    rows = load_dataframe(df, table_name="osm_stores", overwrite=overwrite)
+    rows = load_dataframe(df, table_name="osm_stores", overwrite=overwrite, swap=True)
     logger.info("Loaded %d store locations into RAW.OSM_STORES", rows)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load Belgian store locations into RAW.")
+    parser.add_argument(
+        "--pbf",
+        metavar="PATH",
+        default=OSM_PBF_PATH,
+        help="Local .osm.pbf extract to read instead of querying Overpass.",
+    )
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO)
-    run()
+    run(pbf_path=args.pbf)
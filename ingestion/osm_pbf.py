@@ -0,0 +1,108 @@
+"""
+Offline store extraction from a local OpenStreetMap .osm.pbf extract.
+
+Alternative to the Overpass backend in ingestion.openstreetmap: reads a
+Geofabrik-style belgium-latest.osm.pbf in a single streaming pass and returns
+the same store DataFrame as openstreetmap.fetch_stores(), without network access.
+
+  - nodes and ways tagged shop~supermarket|convenience whose name is one of
+    OSM_STORE_NAMES are kept, within OSM_BELGIUM_BBOX
+  - ways are located at the center of their bounding box, like Overpass
+    ``out center``
+  - node coordinates needed for way centers are cached by osmium's location
+    index (OSM_PBF_LOCATION_INDEX); use a file-backed index such as
+    "sparse_file_array,/tmp/osm_nodes.bin" to keep memory flat on large extracts
+
+Requires the optional dependency group: pip install -e ".[osm]"
+
+Usage:
+    python -m ingestion.openstreetmap --pbf belgium-latest.osm.pbf
+"""
+
+import logging
+import re
+import time
+from collections.abc import Iterator
+
+import osmium
+import osmium.filter
+import pandas as pd
+
+from ingestion.config import OSM_BELGIUM_BBOX, OSM_PBF_LOCATION_INDEX, OSM_STORE_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Same tag match as the Overpass query's ["shop"~"supermarket|convenience"]
+SHOP_PATTERN = re.compile("supermarket|convenience")
+
+
+def _way_center(way) -> tuple[float, float] | None:
+    """Center of a way's bounding box, skipping nodes missing from the extract."""
+    lats, lons = [], []
+    for node in way.nodes:
+        if node.location.valid():
+            lats.append(node.location.lat)
+            lons.append(node.location.lon)
+    if not lats:
+        return None
+    return (min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2
+
+
+def iter_store_elements(
+    path: str,
+    store_names: list[str] = OSM_STORE_NAMES,
+    bbox: str = OSM_BELGIUM_BBOX,
+    location_index: str = OSM_PBF_LOCATION_INDEX,
+) -> Iterator[dict]:
+    """
+    Stream matching stores out of a .osm.pbf file as Overpass-style elements.
+
+    Yields dicts shaped like Overpass JSON elements (type, id, lat/lon or
+    center, tags), nodes first, each in id order, as they appear in the file.
+    """
+    names = set(store_names)
+    south, west, north, east = (float(v) for v in bbox.split(","))
+
+    processor = (
+        osmium.FileProcessor(path, osmium.osm.NODE | osmium.osm.WAY)
+        .with_locations(location_index)
+        # Evaluated in C++: only objects with a shop tag reach Python
+        .with_filter(osmium.filter.KeyFilter("shop"))
+    )
+
+    for obj in processor:
+        if obj.tags.get("name") not in names or not SHOP_PATTERN.search(obj.tags.get("shop")):
+            continue
+
+        if obj.is_node():
+            lat, lon = obj.location.lat, obj.location.lon
+            element = {"type": "node", "id": obj.id, "lat": lat, "lon": lon}
+        else:
+            center = _way_center(obj)
+            if center is None:
+                continue
+            lat, lon = center
+            element = {"type": "way", "id": obj.id, "center": {"lat": lat, "lon": lon}}
+
+        if south <= lat <= north and west <= lon <= east:
+            element["tags"] = dict(obj.tags)
+            yield element
+
+
+def fetch_stores_from_pbf(path: str) -> pd.DataFrame:
+    """
+    Extract Belgian grocery stores from a local .osm.pbf file.
+
+    Returns the same columns as openstreetmap.fetch_stores().
+    """
+    from ingestion.openstreetmap import parse_elements
+
+    start = time.perf_counter()
+    logger.info("Reading stores for %d chains from %s...", len(OSM_STORE_NAMES), path)
+
+    elements = list(iter_store_elements(path))
+    logger.info("Found %d stores in %s in %.1fs", len(elements), path, time.perf_counter() - start)
+
+    if not elements:
+        return pd.DataFrame()
+    return parse_elements(elements)
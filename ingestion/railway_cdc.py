@@ -0,0 +1,325 @@
+"""
+Change data capture from the Railway PostgreSQL database into Snowflake RAW.
+
+Reads row-level changes for the tables in railway_extract.TABLES from a
+logical replication slot (wal2json, format version 2) and applies them to RAW
+in micro-batches:
+  - inserts and updates are MERGEd on id
+  - deletes remove the row from RAW
+  - receipts whose status leaves COMPLETED are deleted, mirroring the
+    WHERE status = 'COMPLETED' filter of the batch extract
+
+After each batch the last applied LSN is checkpointed in RAW.INGESTION_STATE
+and confirmed to Postgres, so the slot can release WAL. Messages that need no
+applying (transaction boundaries, other tables) are confirmed too whenever
+nothing is pending, so quiet tracked tables don't pin WAL. Applying a batch is
+idempotent, so changes replayed after a crash are harmless.
+
+Requires wal_level = logical and the wal2json plugin on the source database,
+and REPLICA IDENTITY FULL on the tracked tables:
+
+    ALTER TABLE transactions REPLICA IDENTITY FULL;  -- and receipts, users, user_profiles
+
+wal2json leaves unchanged TOASTed values (long text) out of an UPDATE's new
+row; with REPLICA IDENTITY FULL they are taken from the old row instead of
+being merged into RAW as NULL.
+
+Usage:
+    python -m ingestion.railway_cdc
+    python -m ingestion.railway_cdc --max-seconds 300
+"""
+
+import argparse
+import json
+import logging
+import re
+import select
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import LogicalReplicationConnection
+
+from ingestion.config import CDC_BATCH_SIZE, CDC_FLUSH_SECONDS, CDC_SLOT_NAME, RAILWAY_DB_URL
+from ingestion.railway_extract import MERGE_KEY, TABLES
+from ingestion.snowflake_loader import (
+    delete_rows,
+    get_watermark,
+    merge_dataframe,
+    save_watermark,
+)
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SOURCE = "railway.cdc"
+
+# Rows that fail the batch extract's filter are removed from RAW
+ROW_FILTERS = {
+    "receipts": lambda row: row.get("status") == "COMPLETED",
+}
+
+
+def table_columns(table_config: dict) -> list[str]:
+    """Return the column list of a TABLES query (the SELECT ... FROM projection)."""
+    match = re.search(r"SELECT\s+(.*?)\s+FROM\s", table_config["query"], re.S | re.I)
+    return [col.strip() for col in match.group(1).split(",")]
+
+
+TABLE_COLUMNS = {t["name"]: table_columns(t) for t in TABLES}
+
+
+@dataclass
+class Change:
+    """One decoded wal2json change."""
+
+    action: str  # I, U, D
+    table: str
+    key: object
+    row: dict | None = None  # new row values (None for deletes)
+    types: dict = field(default_factory=dict)  # column name -> Postgres type name
+
+
+def parse_change(payload: str) -> Change | None:
+    """
+    Decode a wal2json format-version 2 message.
+
+    Returns None for transaction boundaries and tables we don't extract. An
+    update's columns missing from the new row (unchanged TOASTed values) are
+    filled in from the old row, which holds every column under REPLICA
+    IDENTITY FULL.
+    """
+    message = json.loads(payload)
+    action = message.get("action")
+    table = message.get("table")
+
+    if action == "T" and table in TABLE_COLUMNS:
+        logger.warning("TRUNCATE on %s — run railway_extract --full-refresh to resync", table)
+        return None
+    if action not in ("I", "U", "D") or table not in TABLE_COLUMNS:
+        return None
+
+    if action == "D":
+        identity = {c["name"]: c["value"] for c in message.get("identity", [])}
+        return Change(action, table, identity[MERGE_KEY])
+
+    columns = message["columns"]
+    if action == "U":
+        present = {c["name"] for c in columns}
+        columns = columns + [c for c in message.get("identity", []) if c["name"] not in present]
+        missing = set(TABLE_COLUMNS[table]) - {c["name"] for c in columns}
+        if missing:
+            raise ValueError(
+                f"UPDATE on {table} lacks {sorted(missing)} (unchanged TOAST values?) — "
+                f"set REPLICA IDENTITY FULL on {table}"
+            )
+
+    row = {c["name"]: c["value"] for c in columns}
+    types = {c["name"]: c["type"] for c in columns}
+    return Change(action, table, row[MERGE_KEY], row, types)
+
+
+class ChangeBatch:
+    """
+    Accumulates changes, keeping only the latest change per (table, key).
+
+    An insert followed by a delete in the same batch therefore nets out to a
+    delete, and repeated updates to a single merge.
+    """
+
+    def __init__(self):
+        self.upserts: dict[str, dict] = {}
+        self.deletes: dict[str, set] = {}
+        self.types: dict[str, dict] = {}
+        self.size = 0
+        self.started_at: float | None = None
+        self.last_lsn: int | None = None
+
+    def add(self, change: Change, lsn: int):
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        self.size += 1
+        self.last_lsn = lsn
+
+        upserts = self.upserts.setdefault(change.table, {})
+        deletes = self.deletes.setdefault(change.table, set())
+        keep = ROW_FILTERS.get(change.table, lambda row: True)
+
+        if change.action == "D" or not keep(change.row):
+            upserts.pop(change.key, None)
+            deletes.add(change.key)
+        else:
+            deletes.discard(change.key)
+            upserts[change.key] = change.row
+            self.types.setdefault(change.table, {}).update(change.types)
+
+    def is_due(self, batch_size: int, flush_seconds: float) -> bool:
+        if not self.size:
+            return False
+        return self.size >= batch_size or time.monotonic() - self.started_at >= flush_seconds
+
+    def upsert_frame(self, table: str) -> pd.DataFrame:
+        """Changed rows of a table projected to the extract's columns, with typed values."""
+        rows = list(self.upserts.get(table, {}).values())
+        if not rows:
+            return pd.DataFrame()
+
+        columns = TABLE_COLUMNS[table]
+        df = pd.DataFrame(rows).reindex(columns=columns)
+        for col, pg_type in self.types.get(table, {}).items():
+            if col not in df.columns:
+                continue
+            if pg_type.startswith("timestamp"):
+                df[col] = pd.to_datetime(
+                    df[col], utc="with time zone" in pg_type, format="ISO8601"
+                )
+            elif pg_type == "date":
+                df[col] = pd.to_datetime(df[col]).dt.date
+            elif pg_type == "numeric":
+                df[col] = pd.to_numeric(df[col])
+        return df
+
+
+def apply_batch(batch: ChangeBatch) -> dict[str, tuple[int, int]]:
+    """
+    Apply a batch to RAW and checkpoint its LSN.
+
+    Returns:
+        {table: (rows merged, rows deleted)}
+    """
+    applied = {}
+    for table in TABLE_COLUMNS:
+        merged = merge_dataframe(batch.upsert_frame(table), table_name=table, key_column=MERGE_KEY)
+        deleted = delete_rows(table, sorted(batch.deletes.get(table, ())), key_column=MERGE_KEY)
+        if merged or deleted:
+            applied[table] = (merged, deleted)
+
+    save_watermark(CHECKPOINT_SOURCE, str(batch.last_lsn))
+    logger.info(
+        "Applied %d changes up to LSN %s: %s",
+        batch.size, lsn_to_str(batch.last_lsn),
+        ", ".join(f"{t} +{m}/-{d}" for t, (m, d) in applied.items()) or "no net changes",
+    )
+    return applied
+
+
+def lsn_to_str(lsn: int) -> str:
+    """Format an LSN integer the way Postgres displays it (e.g. 16/B374D848)."""
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+def ensure_slot(cursor, slot_name: str = CDC_SLOT_NAME):
+    """Create the wal2json replication slot if it doesn't exist yet."""
+    try:
+        cursor.create_replication_slot(slot_name, output_plugin="wal2json")
+        logger.info("Created replication slot %s", slot_name)
+    except psycopg2.errors.DuplicateObject:
+        logger.info("Using existing replication slot %s", slot_name)
+
+
+def consume(
+    cursor,
+    max_seconds: float | None = None,
+    batch_size: int = CDC_BATCH_SIZE,
+    flush_seconds: float = CDC_FLUSH_SECONDS,
+) -> int:
+    """
+    Read changes from a started replication cursor and apply them in micro-batches.
+
+    Runs until ``max_seconds`` have passed (forever if None), then flushes what
+    is pending. Returns the number of changes read.
+    """
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    batch = ChangeBatch()
+    total = 0
+    last_seen = None  # LSN of the last message read, applied or not
+
+    while deadline is None or time.monotonic() < deadline:
+        message = cursor.read_message()
+        if message is None:
+            if batch.is_due(batch_size, flush_seconds):
+                total += _flush(cursor, batch, last_seen)
+                batch = ChangeBatch()
+            else:
+                _confirm_idle(cursor, batch, last_seen)
+                select.select([cursor], [], [], 1.0)
+            continue
+
+        last_seen = message.data_start
+        change = parse_change(message.payload)
+        if change is not None:
+            batch.add(change, message.data_start)
+
+        if batch.is_due(batch_size, flush_seconds):
+            total += _flush(cursor, batch, last_seen)
+            batch = ChangeBatch()
+
+    if batch.size:
+        total += _flush(cursor, batch, last_seen)
+    else:
+        _confirm_idle(cursor, batch, last_seen)
+    return total
+
+
+def _flush(cursor, batch: ChangeBatch, last_seen: int) -> int:
+    apply_batch(batch)
+    # Everything read so far is now applied or needed no applying
+    cursor.send_feedback(flush_lsn=last_seen)
+    return batch.size
+
+
+def _confirm_idle(cursor, batch: ChangeBatch, last_seen: int | None):
+    """Keepalive; with nothing pending, also confirm messages that needed no applying."""
+    if batch.size or last_seen is None:
+        cursor.send_feedback()
+    else:
+        cursor.send_feedback(flush_lsn=last_seen)
+
+
+def run(max_seconds: float | None = None):
+    """
+    Stream changes from Railway into Snowflake RAW.
+
+    Args:
+        max_seconds: Stop after this long (default: run until interrupted).
+    """
+    conn = psycopg2.connect(RAILWAY_DB_URL, connection_factory=LogicalReplicationConnection)
+    try:
+        cursor = conn.cursor()
+        ensure_slot(cursor)
+
+        checkpoint = get_watermark(CHECKPOINT_SOURCE)
+        start_lsn = int(checkpoint) if checkpoint else 0
+        logger.info(
+            "Starting replication from %s",
+            lsn_to_str(start_lsn) if start_lsn else "the slot's confirmed position",
+        )
+
+        cursor.start_replication(
+            slot_name=CDC_SLOT_NAME,
+            decode=True,
+            start_lsn=start_lsn,
+            options={
+                "format-version": "2",
+                "add-tables": ",".join(f"*.{name}" for name in TABLE_COLUMNS),
+            },
+        )
+        total = consume(cursor, max_seconds=max_seconds)
+        logger.info("CDC stopped after %d changes.", total)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream Railway PG changes into Snowflake RAW.")
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="Stop after this many seconds (default: run until interrupted).",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run(max_seconds=args.max_seconds)
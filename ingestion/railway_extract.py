@@ -7,22 +7,87 @@ Extracts 4 tables:
   - users
   - user_profiles
 
-Each table is extracted in full (small dataset) and loaded into Snowflake RAW schema.
+By default each table is extracted incrementally: only rows whose updated_at
+is past the table's stored high-water mark are pulled and MERGEd into Snowflake
+RAW on id. Tables without a watermark (first run) or a --full-refresh run are
+extracted in full into a shadow table that is then swapped in atomically.
+
+Rows are streamed through a server-side cursor and loaded chunk by chunk, so
+memory stays flat regardless of table size. Tables are independent, so they are
+extracted and loaded in parallel, each on its own Postgres and Snowflake
+connection.
+
+Each table picks an extraction backend with "extract_method" in TABLES:
+  - "read_sql" (default): pandas.read_sql over SQLAlchemy
+  - "copy": Postgres COPY (SELECT ...) TO STDOUT as CSV, parsed straight into
+    Arrow columns with types taken from the query's result description
+
+Usage:
+    python -m ingestion.railway_extract
+    python -m ingestion.railway_extract --full-refresh
+    python -m ingestion.railway_extract --workers 1
 """
 
+import argparse
 import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
 
 import pandas as pd
-from sqlalchemy import create_engine
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from sqlalchemy import create_engine, text
 
-from ingestion.config import RAILWAY_DB_URL
-from ingestion.snowflake_loader import load_dataframe
+from ingestion.config import (
+    RAILWAY_CHUNK_SIZE,
+    RAILWAY_DB_URL,
+    RAILWAY_EXTRACT_WORKERS,
+    SNOWFLAKE_LOAD_METHOD,
+)
+from ingestion.snowflake_loader import (
+    get_watermark,
+    load_dataframe,
+    merge_dataframe,
+    save_watermark,
+    stage_and_copy,
+    swap_table,
+)
 
 logger = logging.getLogger(__name__)
 
+# Every Railway table carries these columns
+MERGE_KEY = "id"
+WATERMARK_COLUMN = "updated_at"
+
+# Bytes of COPY output parsed per Arrow record batch
+COPY_BLOCK_SIZE = 1 << 20
+
+# numeric is read as text and converted to Decimal, as psycopg2 returns it to read_sql
+PG_NUMERIC_OID = 1700
+
+# Arrow types for Postgres type OIDs in COPY extraction; anything else is read as text
+PG_ARROW_TYPES = {
+    16: pa.bool_(),                        # boolean
+    20: pa.int64(),                        # bigint
+    21: pa.int64(),                        # smallint
+    23: pa.int64(),                        # integer
+    700: pa.float64(),                     # real
+    701: pa.float64(),                     # double precision
+    1082: pa.date32(),                     # date
+    1083: pa.time64("us"),                 # time
+    1114: pa.timestamp("us"),              # timestamp
+    1184: pa.timestamp("us", tz="UTC"),    # timestamptz
+}
+
 TABLES = [
     {
         "name": "transactions",
+        # Widest table: skip per-row Python objects and parse COPY output directly
+        "extract_method": "copy",
         "query": """
             SELECT
                 id,
@@ -101,40 +166,322 @@ TABLES = [
 ]
 
 
-def extract_table(engine, table_config: dict) -> pd.DataFrame:
-    """Extract a single table from Railway PG."""
+def incremental_query(query: str, placeholder: str = ":since") -> str:
+    """
+    Wrap a table query so it only returns rows changed at or after the placeholder.
+
+    The boundary is inclusive: a row committed later with the same timestamp as
+    the saved watermark must still be picked up. Re-reading boundary rows is
+    harmless because incremental loads MERGE on the table key.
+    """
+    return f"""
+        SELECT *
+        FROM ({query}) AS src
+        WHERE COALESCE(src.{WATERMARK_COLUMN}, src.created_at) >= {placeholder}
+    """
+
+
+def high_water_mark(df: pd.DataFrame) -> str | None:
+    """
+    Return the latest change timestamp in an extracted batch (ISO format).
+
+    None for an empty batch, or one whose rows have neither timestamp, so a
+    NaT never becomes the saved watermark.
+    """
+    if df.empty:
+        return None
+    changed_at = df[WATERMARK_COLUMN].fillna(df["created_at"]).max()
+    if pd.isna(changed_at):
+        return None
+    return pd.Timestamp(changed_at).isoformat()
+
+
+def build_query(table_config: dict, since: str | None = None) -> tuple:
+    """Return the (query, params) to extract a table, optionally since a watermark."""
+    if since is None:
+        return table_config["query"], None
+    return text(incremental_query(table_config["query"])), {"since": since}
+
+
+def extract_table(engine, table_config: dict, since: str | None = None) -> pd.DataFrame:
+    """
+    Extract a single table from Railway PG into one DataFrame.
+
+    Args:
+        engine: SQLAlchemy engine for Railway.
+        table_config: Entry from TABLES.
+        since: Watermark; if given, only rows changed after it are extracted.
+    """
     name = table_config["name"]
-    query = table_config["query"]
+    query, params = build_query(table_config, since)
+
+    if since is None:
+        logger.info("Extracting %s from Railway...", name)
+    else:
+        logger.info("Extracting %s rows changed since %s...", name, since)
+
+    if params is None:
+        df = pd.read_sql(query, engine)
+    else:
+        df = pd.read_sql(query, engine, params=params)
 
-    logger.info("Extracting %s from Railway...", name)
-    df = pd.read_sql(query, engine)
     logger.info("Extracted %d rows from %s", len(df), name)
     return df
 
 
-def run(overwrite: bool = True):
+def iter_table_chunks(
+    engine,
+    table_config: dict,
+    since: str | None = None,
+    chunk_size: int = RAILWAY_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a table from Railway PG in chunks of at most ``chunk_size`` rows.
+
+    Uses a server-side cursor (``stream_results``) so only one chunk is held
+    in memory at a time. Tables configured with ``"extract_method": "copy"``
+    go through iter_table_chunks_copy instead.
+    """
+    if table_config.get("extract_method", "read_sql") == "copy":
+        yield from iter_table_chunks_copy(engine, table_config, since, chunk_size)
+        return
+
+    query, params = build_query(table_config, since)
+
+    with engine.connect().execution_options(
+        stream_results=True, max_row_buffer=chunk_size
+    ) as conn:
+        yield from pd.read_sql(query, conn, params=params, chunksize=chunk_size)
+
+
+def iter_table_chunks_copy(
+    engine,
+    table_config: dict,
+    since: str | None = None,
+    chunk_size: int = RAILWAY_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a table via ``COPY (SELECT ...) TO STDOUT`` and parse it with Arrow.
+
+    A background thread writes the COPY output into a pipe while pyarrow's
+    streaming CSV reader turns it into typed columns, so values never become
+    per-row Python objects and memory stays bounded to about one chunk.
+    Quoted values may contain newlines (free-text fields), and numeric columns
+    come back as Decimal, as they do from read_sql.
+    """
+    raw_conn = engine.raw_connection()
+    try:
+        cursor = raw_conn.cursor()
+        if since is None:
+            sql = table_config["query"]
+        else:
+            sql = cursor.mogrify(
+                incremental_query(table_config["query"], "%(since)s"), {"since": since}
+            ).decode()
+
+        column_types = copy_column_types(cursor, sql)
+        numeric_columns = [
+            col.name for col in cursor.description if col.type_code == PG_NUMERIC_OID
+        ]
+        read_fd, write_fd = os.pipe()
+        errors: list[BaseException] = []
+
+        def produce():
+            try:
+                with os.fdopen(write_fd, "wb") as sink:
+                    cursor.copy_expert(
+                        f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", sink,
+                    )
+            except BaseException as exc:  # re-raised in the consuming thread
+                errors.append(exc)
+
+        producer = threading.Thread(
+            target=produce, name=f"copy-{table_config['name']}", daemon=True,
+        )
+        producer.start()
+
+        try:
+            with os.fdopen(read_fd, "rb") as source:
+                reader = pa_csv.open_csv(
+                    source,
+                    read_options=pa_csv.ReadOptions(block_size=COPY_BLOCK_SIZE),
+                    # Postgres quotes values containing newlines; they may span blocks
+                    parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types=column_types,
+                        true_values=["t"],
+                        false_values=["f"],
+                        null_values=[""],
+                        strings_can_be_null=True,
+                        quoted_strings_can_be_null=False,  # "" is an empty string, not NULL
+                    ),
+                )
+                pending, pending_rows = [], 0
+                for batch in reader:
+                    pending.append(batch)
+                    pending_rows += batch.num_rows
+                    if pending_rows >= chunk_size:
+                        yield _copy_chunk_to_pandas(pending, numeric_columns)
+                        pending, pending_rows = [], 0
+                if pending_rows:
+                    yield _copy_chunk_to_pandas(pending, numeric_columns)
+        except Exception as exc:
+            # A failed COPY usually surfaces here first, as an empty or truncated CSV
+            producer.join()
+            if errors:
+                raise errors[0] from exc
+            raise
+        finally:
+            producer.join()
+
+        if errors:
+            raise errors[0]
+    finally:
+        raw_conn.close()
+
+
+def _copy_chunk_to_pandas(
+    batches: list[pa.RecordBatch], numeric_columns: list[str],
+) -> pd.DataFrame:
+    df = pa.Table.from_batches(batches).to_pandas()
+    for column in numeric_columns:
+        df[column] = df[column].map(Decimal, na_action="ignore")
+    return df
+
+
+def copy_column_types(cursor, sql: str) -> dict[str, pa.DataType]:
+    """Map each result column of ``sql`` to an Arrow type via its Postgres type OID."""
+    cursor.execute(f"SELECT * FROM ({sql}) AS q LIMIT 0")
+    return {
+        col.name: PG_ARROW_TYPES.get(col.type_code, pa.string())
+        for col in cursor.description
+    }
+
+
+def extract_and_load(engine, table_config: dict, full_refresh: bool = False) -> int:
+    """
+    Stream one table from Railway into Snowflake RAW and advance its watermark.
+
+    Returns:
+        Number of rows loaded or merged.
+    """
+    name = table_config["name"]
+    source = f"railway.{name}"
+
+    watermark = None if full_refresh else get_watermark(source)
+    if watermark is None:
+        logger.info("Extracting %s from Railway (full)...", name)
+    else:
+        logger.info("Extracting %s rows changed since %s...", name, watermark)
+
+    progress = {"watermark": None}
+    chunks = _track_chunks(name, iter_table_chunks(engine, table_config, since=watermark), progress)
+
+    if watermark is not None:
+        total_rows = sum(
+            merge_dataframe(chunk, table_name=name, key_column=MERGE_KEY) for chunk in chunks
+        )
+        logger.info("Merged %d changed rows into RAW.%s", total_rows, name.upper())
+    else:
+        # Load the full copy into a shadow table and swap it in at the end, so
+        # readers of RAW never see a truncated or half-loaded table
+        with swap_table(name) as shadow_table:
+            if SNOWFLAKE_LOAD_METHOD == "parquet_stage":
+                # All chunks go into one staged upload and a single COPY INTO
+                total_rows = stage_and_copy(chunks, table_name=shadow_table)
+            else:
+                total_rows = sum(
+                    load_dataframe(chunk, table_name=shadow_table) for chunk in chunks
+                )
+        logger.info("Loaded %d rows into RAW.%s", total_rows, name.upper())
+
+    if progress["watermark"] is not None:
+        save_watermark(source, progress["watermark"])
+
+    return total_rows
+
+
+def _track_chunks(
+    name: str, chunks: Iterator[pd.DataFrame], progress: dict
+) -> Iterator[pd.DataFrame]:
+    """Pass chunks through, logging rows/sec and tracking the batch high-water mark."""
+    chunk_start = time.perf_counter()
+    for i, chunk in enumerate(chunks):
+        chunk_rows = len(chunk)
+        chunk_watermark = high_water_mark(chunk)
+        if chunk_watermark is not None:
+            progress["watermark"] = max(
+                filter(None, [progress["watermark"], chunk_watermark]), key=pd.Timestamp
+            )
+
+        yield chunk
+
+        # Covers fetching this chunk from Postgres and handing it to the loader
+        elapsed = time.perf_counter() - chunk_start
+        logger.info(
+            "%s chunk %d: %d rows in %.1fs (%.0f rows/s)",
+            name, i + 1, chunk_rows, elapsed, chunk_rows / max(elapsed, 1e-6),
+        )
+        chunk_start = time.perf_counter()
+
+
+def run(full_refresh: bool = False, workers: int = RAILWAY_EXTRACT_WORKERS):
     """
     Extract all tables from Railway and load into Snowflake RAW.
 
     Args:
-        overwrite: If True, replace existing data (full refresh).
+        full_refresh: If True, ignore stored watermarks and reload every table
+            in full. Otherwise only changed rows are extracted and merged.
+        workers: Number of tables processed concurrently (1 = sequential).
     """
-    engine = create_engine(RAILWAY_DB_URL)
+    engine = create_engine(RAILWAY_DB_URL, pool_size=max(workers, 1))
+    timings = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="railway") as pool:
+            futures = {
+                pool.submit(_timed_extract_and_load, engine, table_config, full_refresh):
+                    table_config["name"]
+                for table_config in TABLES
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    timings[name] = future.result()
+                except Exception:
+                    logger.exception("Failed to extract/load %s", name)
+                    # Don't start tables that are still queued; running ones finish
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+    finally:
+        engine.dispose()
 
+    logger.info("Railway extraction complete:")
     for table_config in TABLES:
-        name = table_config["name"]
-        try:
-            df = extract_table(engine, table_config)
-            rows = load_dataframe(df, table_name=name, overwrite=overwrite)
-            logger.info("Loaded %d rows into RAW.%s", rows, name.upper())
-        except Exception:
-            logger.exception("Failed to extract/load %s", name)
-            raise
+        rows, seconds = timings[table_config["name"]]
+        logger.info("  %-14s %10d rows  %7.1fs", table_config["name"], rows, seconds)
 
-    engine.dispose()
-    logger.info("Railway extraction complete.")
+
+def _timed_extract_and_load(engine, table_config: dict, full_refresh: bool) -> tuple[int, float]:
+    start = time.perf_counter()
+    rows = extract_and_load(engine, table_config, full_refresh=full_refresh)
+    return rows, time.perf_counter() - start
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract Railway PG tables into Snowflake RAW.")
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Reload every table in full instead of merging changed rows.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=RAILWAY_EXTRACT_WORKERS,
+        help="Number of tables to extract and load concurrently.",
+    )
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO)
-    run()
+    run(full_refresh=args.full_refresh, workers=args.workers)
@@ -1,30 +1,199 @@
 """
 Generic Snowflake loader: write Pandas DataFrames to Snowflake RAW schema.
 
-Uses COPY INTO via write_pandas for efficient bulk loading.
+Uses COPY INTO via write_pandas for efficient bulk loading, or, with
+method="parquet_stage", writes locally compressed Parquet files, PUTs them to
+an internal stage in parallel and runs a single COPY INTO. Connections are
+drawn from a process-wide pool, so a job that loads or queries several times
+pays the authentication handshake once.
+
+With WAREHOUSE_BACKEND=duckdb the public load/query functions below are served
+by ingestion.duckdb_warehouse instead, against a local DuckDB file.
 """
 
+import atexit
+import functools
+import json
 import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from snowflake.connector import connect
+from snowflake.connector.errors import NotSupportedError
 from snowflake.connector.pandas_tools import write_pandas
 
-from ingestion.config import SNOWFLAKE_CONFIG, SNOWFLAKE_RAW_SCHEMA
+from ingestion.config import (
+    INGESTION_STATE_TABLE,
+    SNOWFLAKE_CONFIG,
+    SNOWFLAKE_LOAD_METHOD,
+    SNOWFLAKE_POOL_HEALTH_CHECK_SECONDS,
+    SNOWFLAKE_POOL_SIZE,
+    SNOWFLAKE_RAW_SCHEMA,
+    SNOWFLAKE_STAGE_COMPRESSION,
+    SNOWFLAKE_STAGE_FILE_MB,
+    SNOWFLAKE_STAGE_NAME,
+    SNOWFLAKE_STAGE_PARALLEL,
+    WAREHOUSE_BACKEND,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _pluggable(func):
+    """Serve ``func`` from the DuckDB backend when WAREHOUSE_BACKEND is "duckdb"."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if WAREHOUSE_BACKEND == "duckdb":
+            from ingestion import duckdb_warehouse
+            return getattr(duckdb_warehouse, func.__name__)(*args, **kwargs)
+        if WAREHOUSE_BACKEND != "snowflake":
+            raise ValueError(f"Unknown warehouse backend: {WAREHOUSE_BACKEND}")
+        return func(*args, **kwargs)
+    return wrapper
+
+
 def get_connection():
-    """Create a Snowflake connection using config."""
-    return connect(**SNOWFLAKE_CONFIG)
+    """Create a new Snowflake connection using config."""
+    # Keep-alive heartbeats stop idle pooled sessions from expiring during long jobs
+    return connect(**SNOWFLAKE_CONFIG, client_session_keep_alive=True)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of reusable Snowflake connections.
+
+    At most ``max_size`` connections are checked out at once; further callers
+    block until one is returned. Connections idle for longer than
+    ``health_check_interval`` seconds are pinged before reuse and replaced if
+    their session has gone away.
+    """
+
+    def __init__(
+        self,
+        max_size: int = SNOWFLAKE_POOL_SIZE,
+        health_check_interval: float = SNOWFLAKE_POOL_HEALTH_CHECK_SECONDS,
+    ):
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self._idle: list[tuple[object, float]] = []  # (connection, last returned)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a ``with`` block."""
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except Exception:
+            # Session state is unknown after a failure; don't hand it to the next caller
+            if conn is not None:
+                _close_quietly(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            self._slots.release()
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, returned_at = self._idle.pop()
+
+            if time.monotonic() - returned_at < self.health_check_interval:
+                return conn
+            if _is_healthy(conn):
+                return conn
+
+            logger.info("Discarding stale Snowflake connection")
+            _close_quietly(conn)
+
+        logger.info("Opening new Snowflake connection")
+        return get_connection()
+
+
+def _is_healthy(conn) -> bool:
+    try:
+        if conn.is_closed():
+            return False
+        conn.cursor().execute("SELECT 1")
+        return True
+    except Exception:
+        return False
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        logger.debug("Ignoring error while closing Snowflake connection", exc_info=True)
+
 
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
 
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def pooled_connection():
+    """
+    Borrow a connection from the process-wide pool.
+
+    Usage:
+        with pooled_connection() as conn:
+            conn.cursor().execute("SELECT 1")
+    """
+    return get_pool().connection()
+
+
+def close_pool():
+    """Close all pooled connections (registered to run at interpreter exit)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+atexit.register(close_pool)
+
+
+@_pluggable
 def load_dataframe(
     df: pd.DataFrame,
     table_name: str,
     schema: str = SNOWFLAKE_RAW_SCHEMA,
     overwrite: bool = False,
+    method: str = SNOWFLAKE_LOAD_METHOD,
+    swap: bool = False,
 ) -> int:
     """
     Load a DataFrame into a Snowflake table.
@@ -34,6 +203,9 @@ def load_dataframe(
         table_name: Target table name (will be uppercased).
         schema: Target schema (default: RAW).
         overwrite: If True, truncate before loading. If False, append.
+        method: "write_pandas" or "parquet_stage" (see stage_and_copy).
+        swap: With overwrite, load into a shadow table and swap it in
+            atomically instead of truncating the live table (see swap_table).
 
     Returns:
         Number of rows loaded.
@@ -42,14 +214,22 @@ def load_dataframe(
         logger.warning("Empty DataFrame — skipping load for %s.%s", schema, table_name)
         return 0
 
+    if overwrite and swap:
+        with swap_table(table_name, schema=schema) as shadow_table:
+            return load_dataframe(df, shadow_table, schema=schema, method=method)
+
+    if method == "parquet_stage":
+        return stage_and_copy([df], table_name, schema=schema, overwrite=overwrite)
+    if method != "write_pandas":
+        raise ValueError(f"Unknown load method: {method}")
+
     table_name = table_name.upper()
     schema = schema.upper()
 
     # Uppercase column names for Snowflake compatibility
     df.columns = [col.upper() for col in df.columns]
 
-    conn = get_connection()
-    try:
+    with pooled_connection() as conn:
         conn.cursor().execute(f"USE SCHEMA {SNOWFLAKE_CONFIG['database']}.{schema}")
 
         if overwrite:
@@ -75,18 +255,416 @@ def load_dataframe(
             logger.error("Failed to load data into %s.%s", schema, table_name)
 
         return num_rows
+
+
+@_pluggable
+@contextmanager
+def swap_table(table_name: str, schema: str = SNOWFLAKE_RAW_SCHEMA):
+    """
+    Replace a table's contents atomically via a shadow table.
+
+    Yields the name of an empty shadow table to load into. When the block
+    exits cleanly the shadow is swapped with the live table in one
+    ``ALTER TABLE ... SWAP WITH`` and the old data dropped, so readers see
+    either the previous or the new contents, never a partial load. If the block
+    raises, or loads nothing, the live table is left untouched.
+
+    Usage:
+        with swap_table("transactions") as shadow:
+            load_dataframe(df, shadow)
+    """
+    table_name = table_name.upper()
+    schema = schema.upper()
+    location = f"{SNOWFLAKE_CONFIG['database']}.{schema}"
+    shadow_table = f"{table_name}__SHADOW"
+
+    # Connections are borrowed per step so the caller's loads can use the pool too
+    with pooled_connection() as conn:
+        conn.cursor().execute(f"DROP TABLE IF EXISTS {location}.{shadow_table}")
+
+    try:
+        yield shadow_table
+
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SHOW TABLES LIKE '{shadow_table}' IN SCHEMA {location}")
+            if not cursor.fetchall():
+                logger.warning(
+                    "Nothing was loaded into %s.%s — keeping %s.%s as is",
+                    schema, shadow_table, schema, table_name,
+                )
+                return
+
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {location}.{table_name} LIKE {location}.{shadow_table}"
+            )
+            cursor.execute(
+                f"ALTER TABLE {location}.{shadow_table} SWAP WITH {location}.{table_name}"
+            )
+            logger.info("Swapped new data into %s.%s", schema, table_name)
     finally:
-        conn.close()
+        # After a swap this holds the previous contents; after a failure, the partial load
+        with pooled_connection() as conn:
+            conn.cursor().execute(f"DROP TABLE IF EXISTS {location}.{shadow_table}")
+
+
+@_pluggable
+def stage_and_copy(
+    chunks: Iterable[pd.DataFrame],
+    table_name: str,
+    schema: str = SNOWFLAKE_RAW_SCHEMA,
+    overwrite: bool = False,
+    file_size_mb: int = SNOWFLAKE_STAGE_FILE_MB,
+    parallel: int = SNOWFLAKE_STAGE_PARALLEL,
+    compression: str = SNOWFLAKE_STAGE_COMPRESSION,
+) -> int:
+    """
+    Bulk load a stream of DataFrames through compressed Parquet files.
+
+    Chunks are written to local Parquet files of roughly ``file_size_mb`` each,
+    uploaded to an internal stage with one parallel PUT, and loaded with a
+    single COPY INTO. The table is created from the staged files' schema if it
+    does not exist yet.
+
+    Args:
+        chunks: DataFrames to load (e.g. a generator of extraction chunks).
+        table_name: Target table name (will be uppercased).
+        schema: Target schema (default: RAW).
+        overwrite: If True, truncate before loading. If False, append.
+        file_size_mb: Target size of each staged file.
+        parallel: Number of concurrent upload threads for the PUT.
+        compression: Parquet codec (zstd, snappy, gzip, ...).
+
+    Returns:
+        Number of rows loaded.
+    """
+    table_name = table_name.upper()
+    schema = schema.upper()
+    stage_path = f"@{SNOWFLAKE_STAGE_NAME}/{table_name}/{uuid.uuid4().hex}"
+    file_format = f"{SNOWFLAKE_STAGE_NAME}_PARQUET"
+
+    with tempfile.TemporaryDirectory(prefix="milo_stage_") as tmp_dir:
+        files, num_rows = write_parquet_files(
+            chunks, tmp_dir, file_size_mb * 1024 * 1024, compression,
+        )
+        if not num_rows:
+            logger.warning("No rows to stage — skipping load for %s.%s", schema, table_name)
+            return 0
+
+        staged_bytes = sum(os.path.getsize(f) for f in files)
+        logger.info(
+            "Staging %d rows for %s.%s in %d %s Parquet files (%.1f MB)",
+            num_rows, schema, table_name, len(files), compression, staged_bytes / 1e6,
+        )
+
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"USE SCHEMA {SNOWFLAKE_CONFIG['database']}.{schema}")
+            cursor.execute(
+                f"CREATE FILE FORMAT IF NOT EXISTS {file_format} "
+                "TYPE = PARQUET USE_LOGICAL_TYPE = TRUE BINARY_AS_TEXT = FALSE"
+            )
+            cursor.execute(f"CREATE STAGE IF NOT EXISTS {SNOWFLAKE_STAGE_NAME}")
+
+            local_pattern = os.path.join(tmp_dir, "*.parquet").replace("\\", "/")
+            cursor.execute(
+                f"PUT 'file://{local_pattern}' '{stage_path}' "
+                f"PARALLEL = {parallel} AUTO_COMPRESS = FALSE"
+            )
+
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table_name} USING TEMPLATE (
+                    SELECT ARRAY_AGG(OBJECT_CONSTRUCT(*)) WITHIN GROUP (ORDER BY ORDER_ID)
+                    FROM TABLE(INFER_SCHEMA(
+                        LOCATION => '{stage_path}', FILE_FORMAT => '{file_format}'
+                    ))
+                )
+            """)
+
+            if overwrite:
+                logger.info("Truncating %s.%s before load", schema, table_name)
+                cursor.execute(f"TRUNCATE TABLE IF EXISTS {table_name}")
+
+            cursor.execute(f"""
+                COPY INTO {table_name}
+                FROM '{stage_path}'
+                FILE_FORMAT = (FORMAT_NAME = '{file_format}')
+                MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+                PURGE = TRUE
+            """)
+            loaded = sum(int(row[3]) for row in cursor.fetchall())
+
+    logger.info("Loaded %d rows into %s.%s via Parquet stage", loaded, schema, table_name)
+    return loaded
+
+
+def write_parquet_files(
+    chunks: Iterable[pd.DataFrame],
+    directory: str,
+    target_bytes: int,
+    compression: str = SNOWFLAKE_STAGE_COMPRESSION,
+) -> tuple[list[str], int]:
+    """
+    Write DataFrame chunks to Parquet files of roughly ``target_bytes`` each.
+
+    Column names are uppercased. A new file is started when the current one
+    reaches the target size or a chunk's schema no longer fits the open file.
 
+    Returns:
+        (file paths, total rows written)
+    """
+    files: list[str] = []
+    num_rows = 0
+    writer = None
+
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            chunk.columns = [col.upper() for col in chunk.columns]
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+
+            if writer is not None and not table.schema.equals(writer.schema):
+                try:
+                    table = table.cast(writer.schema)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    writer.close()
+                    writer = None
+
+            if writer is None:
+                path = os.path.join(directory, f"part_{len(files):05d}.parquet")
+                files.append(path)
+                writer = pq.ParquetWriter(
+                    path,
+                    table.schema,
+                    compression=compression,
+                    coerce_timestamps="us",
+                    allow_truncated_timestamps=True,
+                )
 
+            writer.write_table(table)
+            num_rows += table.num_rows
+
+            if os.path.getsize(files[-1]) >= target_bytes:
+                writer.close()
+                writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return files, num_rows
+
+
+@_pluggable
+def merge_dataframe(
+    df: pd.DataFrame,
+    table_name: str,
+    key_column: str = "id",
+    schema: str = SNOWFLAKE_RAW_SCHEMA,
+) -> int:
+    """
+    Upsert a DataFrame into an existing Snowflake table with MERGE.
+
+    Rows are written to a temporary staging table shaped like the target, then
+    merged on ``key_column``: existing rows are updated, new rows inserted.
+
+    Args:
+        df: DataFrame with the changed rows.
+        table_name: Target table name (will be uppercased). Must already exist.
+        key_column: Column that uniquely identifies a row.
+        schema: Target schema (default: RAW).
+
+    Returns:
+        Number of rows merged.
+    """
+    if df.empty:
+        logger.info("No changed rows — skipping merge for %s.%s", schema, table_name)
+        return 0
+
+    table_name = table_name.upper()
+    schema = schema.upper()
+    key_column = key_column.upper()
+    staging_table = f"{table_name}_MERGE_STAGE"
+
+    df.columns = [col.upper() for col in df.columns]
+    columns = list(df.columns)
+
+    update_set = ", ".join(f't."{c}" = s."{c}"' for c in columns if c != key_column)
+    insert_columns = ", ".join(f'"{c}"' for c in columns)
+    insert_values = ", ".join(f's."{c}"' for c in columns)
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"USE SCHEMA {SNOWFLAKE_CONFIG['database']}.{schema}")
+        cursor.execute(f"CREATE OR REPLACE TEMPORARY TABLE {staging_table} LIKE {table_name}")
+
+        success, _, num_rows, _ = write_pandas(
+            conn,
+            df,
+            staging_table,
+            schema=schema,
+            database=SNOWFLAKE_CONFIG["database"],
+            auto_create_table=False,
+            overwrite=False,
+        )
+        if not success:
+            logger.error("Failed to stage changed rows for %s.%s", schema, table_name)
+            return 0
+
+        cursor.execute(f"""
+            MERGE INTO {table_name} t
+            USING {staging_table} s
+                ON t."{key_column}" = s."{key_column}"
+            WHEN MATCHED THEN UPDATE SET {update_set}
+            WHEN NOT MATCHED THEN INSERT ({insert_columns}) VALUES ({insert_values})
+        """)
+        inserted, updated = cursor.fetchone()[:2]
+        # Pooled sessions outlive this call, so don't leave the stage table behind
+        cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+        logger.info(
+            "Merged %d rows into %s.%s (%d inserted, %d updated)",
+            num_rows, schema, table_name, inserted, updated,
+        )
+        return num_rows
+
+
+@_pluggable
+def delete_rows(
+    table_name: str,
+    keys: list,
+    key_column: str = "id",
+    schema: str = SNOWFLAKE_RAW_SCHEMA,
+) -> int:
+    """
+    Delete rows whose ``key_column`` is in ``keys``.
+
+    Returns:
+        Number of rows deleted.
+    """
+    if not keys:
+        return 0
+
+    table_name = table_name.upper()
+    schema = schema.upper()
+    key_column = key_column.upper()
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            DELETE FROM {SNOWFLAKE_CONFIG['database']}.{schema}.{table_name}
+            WHERE "{key_column}" IN (
+                SELECT VALUE FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%(keys)s)))
+            )
+            """,
+            {"keys": json.dumps(keys)},
+        )
+        deleted = cursor.fetchone()[0]
+        logger.info("Deleted %d rows from %s.%s", deleted, schema, table_name)
+        return deleted
+
+
+@_pluggable
+def get_watermark(source: str) -> str | None:
+    """
+    Return the stored high-water mark for an incremental source, if any.
+
+    Watermarks are kept as strings in RAW.INGESTION_STATE so that timestamps,
+    epoch seconds and LSNs can all share one table.
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        _ensure_state_table(cursor)
+        cursor.execute(
+            f"SELECT HIGH_WATER_MARK FROM {_state_table()} WHERE SOURCE = %(source)s",
+            {"source": source},
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+@_pluggable
+def save_watermark(source: str, value: str) -> None:
+    """Store the high-water mark for an incremental source."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        _ensure_state_table(cursor)
+        cursor.execute(
+            f"""
+            MERGE INTO {_state_table()} t
+            USING (SELECT %(source)s AS SOURCE, %(value)s AS HIGH_WATER_MARK) s
+                ON t.SOURCE = s.SOURCE
+            WHEN MATCHED THEN UPDATE SET
+                HIGH_WATER_MARK = s.HIGH_WATER_MARK,
+                UPDATED_AT = CURRENT_TIMESTAMP()
+            WHEN NOT MATCHED THEN INSERT (SOURCE, HIGH_WATER_MARK, UPDATED_AT)
+                VALUES (s.SOURCE, s.HIGH_WATER_MARK, CURRENT_TIMESTAMP())
+            """,
+            {"source": source, "value": value},
+        )
+        logger.info("Saved watermark for %s: %s", source, value)
+
+
+def _state_table() -> str:
+    return f"{SNOWFLAKE_CONFIG['database']}.{SNOWFLAKE_RAW_SCHEMA}.{INGESTION_STATE_TABLE}"
+
+
+def _ensure_state_table(cursor) -> None:
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {_state_table()} (
+            SOURCE VARCHAR NOT NULL,
+            HIGH_WATER_MARK VARCHAR,
+            UPDATED_AT TIMESTAMP_LTZ
+        )
+    """)
+
+
+@_pluggable
 def execute_query(query: str, params: dict | None = None) -> pd.DataFrame:
     """Execute a query and return results as a DataFrame."""
-    conn = get_connection()
-    try:
+    with pooled_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(query, params)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        return pd.DataFrame(rows, columns=columns)
-    finally:
-        conn.close()
+        try:
+            # Arrow result path: columnar all the way, no per-row Python tuples
+            return cursor.fetch_pandas_all()
+        except NotSupportedError:
+            # Statements without an Arrow result set (DDL, SHOW, ...)
+            columns = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+@_pluggable
+def iter_query_batches(
+    query: str,
+    params: dict | None = None,
+    as_arrow: bool = False,
+) -> Iterator[pd.DataFrame | pa.Table]:
+    """
+    Execute a query and yield the result in batches as Snowflake returns them.
+
+    Only one batch is held in memory at a time, so large result sets can be
+    streamed to disk or processed incrementally. The pooled connection stays
+    checked out until the generator is exhausted or closed. An empty result
+    yields one empty batch with the result's columns (from the cursor
+    description), so callers still see the schema.
+
+    Args:
+        query: SQL query to run.
+        params: Optional bind parameters.
+        as_arrow: Yield pyarrow Tables instead of pandas DataFrames.
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        batches = cursor.fetch_arrow_batches() if as_arrow else cursor.fetch_pandas_batches()
+        empty = True
+        for batch in batches:
+            empty = False
+            yield batch
+        if empty:
+            columns = [col[0] for col in cursor.description or []]
+            if as_arrow:
+                yield pa.table({name: pa.nulls(0) for name in columns})
+            else:
+                yield pd.DataFrame(columns=columns)
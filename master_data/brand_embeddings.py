@@ -2,26 +2,48 @@
 Generate multilingual brand name embeddings and upsert to Pinecone.
 
 Uses the paraphrase-multilingual-MiniLM-L12-v2 model to handle Dutch, French,
-and English brand names. Each brand in the canonical brand lookup gets an
-embedding vector in the Pinecone index.
+and English brand names (through torch, or its int8 ONNX export with
+EMBEDDING_BACKEND=onnx; see master_data.embedding_backend). Each brand in the
+canonical brand lookup gets an embedding vector in the Pinecone index, or in
+the in-process index (master_data.vector_index) with VECTOR_INDEX_BACKEND=local.
+
+Runs are incremental. Vector ids are derived from the brand name, and each
+vector's metadata carries a hash of what produced it (model and backend,
+brand name, metadata), so a sync only embeds and upserts new or changed brands
+and deletes vectors of brands no longer in the lookup. The model is only loaded
+when there is something to embed.
 
 Usage:
     python -m master_data.brand_embeddings
 """
 
+import hashlib
+import json
 import logging
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
 
-from ingestion.config import PINECONE_API_KEY, PINECONE_INDEX_NAME
+from ingestion.config import (
+    PINECONE_API_KEY,
+    PINECONE_BACKOFF_SECONDS,
+    PINECONE_INDEX_NAME,
+    PINECONE_MAX_RETRIES,
+    PINECONE_UPSERT_WORKERS,
+    VECTOR_INDEX_BACKEND,
+)
+from ingestion.http_client import RetryPolicy, call_with_retries
+from master_data.embedding_backend import cache_name, load_model
+from master_data.embedding_cache import encode_cached
+from master_data.vector_index import LocalVectorIndex
 
 logger = logging.getLogger(__name__)
 
-MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
 EMBEDDING_DIM = 384
 BATCH_SIZE = 100
+ID_PREFIX = "brand_"
 
 
 def get_or_create_index(pc: Pinecone) -> object:
@@ -42,45 +64,152 @@ def get_or_create_index(pc: Pinecone) -> object:
     return pc.Index(PINECONE_INDEX_NAME)
 
 
-def generate_embeddings(brand_names: list[str], model: SentenceTransformer) -> list:
-    """Generate embeddings for a list of brand names."""
+def generate_embeddings(brand_names: list[str], model) -> list:
+    """Generate embeddings for a list of brand names (cached ones are not re-encoded)."""
     logger.info("Generating embeddings for %d brands...", len(brand_names))
-    embeddings = model.encode(brand_names, show_progress_bar=True, normalize_embeddings=True)
+    embeddings = encode_cached(model, brand_names, cache_name(), show_progress_bar=True)
     return embeddings.tolist()
 
 
+def brand_id(brand_name: str) -> str:
+    """Stable vector id for a brand, independent of its row in the lookup CSV."""
+    return ID_PREFIX + hashlib.sha1(brand_name.encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(brand_name: str, metadata: dict) -> str:
+    """Hash of everything that goes into a brand's vector and its metadata."""
+    payload = json.dumps(
+        {"model": cache_name(), "text": brand_name, "metadata": metadata},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def fetch_hashes(index) -> dict[str, str | None]:
+    """
+    Content hashes of all brand vectors currently in the index.
+
+    Returns:
+        {vector id: content_hash}; None for vectors written before hashes existed.
+    """
+    ids = [vector_id for page in index.list(prefix=ID_PREFIX) for vector_id in page]
+    hashes = {}
+    for batch_start in range(0, len(ids), BATCH_SIZE):
+        response = index.fetch(ids=ids[batch_start:batch_start + BATCH_SIZE])
+        for vector_id, vector in response.vectors.items():
+            hashes[vector_id] = (vector.metadata or {}).get("content_hash")
+    return hashes
+
+
+def _upsert_batch(
+    index,
+    batch: list[dict],
+    max_retries: int = PINECONE_MAX_RETRIES,
+    backoff_seconds: float = PINECONE_BACKOFF_SECONDS,
+):
+    """Upsert one batch, retrying when throttled (429/5xx) like brand_matcher.query_index."""
+    return call_with_retries(
+        lambda: index.upsert(vectors=batch),
+        RetryPolicy(max_retries=max_retries, backoff_seconds=backoff_seconds),
+        "Index upsert",
+    )
+
+
 def upsert_to_pinecone(
     index,
     brand_names: list[str],
     embeddings: list,
     metadata: list[dict] | None = None,
+    workers: int = PINECONE_UPSERT_WORKERS,
 ):
-    """Upsert brand embeddings to Pinecone in batches."""
+    """
+    Upsert brand embeddings under stable ids, in concurrent batches.
+
+    Each vector's metadata gets brand_name and content_hash added (the
+    caller's dicts are not modified).
+    """
     vectors = []
     for i, (name, emb) in enumerate(zip(brand_names, embeddings)):
-        meta = metadata[i] if metadata else {}
+        meta = dict(metadata[i]) if metadata else {}
+        meta["content_hash"] = content_hash(name, meta)
         meta["brand_name"] = name
         vectors.append({
-            "id": f"brand_{i}",
+            "id": brand_id(name),
             "values": emb,
             "metadata": meta,
         })
 
-    # Upsert in batches
-    for batch_start in range(0, len(vectors), BATCH_SIZE):
-        batch = vectors[batch_start : batch_start + BATCH_SIZE]
-        index.upsert(vectors=batch)
-        logger.info(
-            "Upserted batch %d-%d (%d vectors)",
-            batch_start, batch_start + len(batch), len(batch),
-        )
+    # The local index swaps in a new matrix per upsert, so it takes one call
+    if isinstance(index, LocalVectorIndex):
+        if vectors:
+            index.upsert(vectors=vectors)
+        logger.info("Total vectors upserted: %d", len(vectors))
+        return
+
+    batches = [
+        vectors[batch_start : batch_start + BATCH_SIZE]
+        for batch_start in range(0, len(vectors), BATCH_SIZE)
+    ]
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="brand-upsert") as pool:
+        # list() re-raises the first failed batch
+        list(pool.map(lambda batch: _upsert_batch(index, batch), batches))
+
+    logger.info("Total vectors upserted: %d (%d batches)", len(vectors), len(batches))
 
-    logger.info("Total vectors upserted: %d", len(vectors))
+
+def sync_brand_vectors(
+    index,
+    brand_names: list[str],
+    metadata: list[dict],
+    load_model: Callable = load_model,
+) -> dict[str, int]:
+    """
+    Bring the index in line with the brand lookup, touching only what changed.
+
+    Brands whose content hash matches the stored one are skipped; new and
+    changed brands are embedded and upserted; vectors of brands no longer in
+    the lookup (including old positional ``brand_<n>`` ids) are deleted.
+
+    Args:
+        load_model: Returns the embedding model; only called when brands changed.
+
+    Returns:
+        Counts: {"unchanged", "upserted", "deleted"}.
+    """
+    stored = fetch_hashes(index)
+
+    wanted = {}
+    for name, meta in zip(brand_names, metadata):
+        wanted[brand_id(name)] = (name, meta)  # a repeated brand: the last row wins
+
+    changed = [
+        (name, meta) for vector_id, (name, meta) in wanted.items()
+        if stored.get(vector_id) != content_hash(name, meta)
+    ]
+    stale = [vector_id for vector_id in stored if vector_id not in wanted]
+
+    if changed:
+        names = [name for name, _ in changed]
+        embeddings = generate_embeddings(names, load_model())
+        upsert_to_pinecone(index, names, embeddings, [meta for _, meta in changed])
+    for batch_start in range(0, len(stale), BATCH_SIZE):
+        index.delete(ids=stale[batch_start:batch_start + BATCH_SIZE])
+
+    counts = {
+        "unchanged": len(wanted) - len(changed),
+        "upserted": len(changed),
+        "deleted": len(stale),
+    }
+    logger.info(
+        "Brand index sync: %d unchanged, %d upserted, %d deleted",
+        counts["unchanged"], counts["upserted"], counts["deleted"],
+    )
+    return counts
 
 
 def run(brand_lookup_csv: str = "transform/seeds/seed_brand_lookup.csv"):
     """
-    Load brand lookup CSV, generate embeddings, and upsert to Pinecone.
+    Load brand lookup CSV and sync its embeddings to Pinecone (or the local index).
 
     Args:
         brand_lookup_csv: Path to the seed brand lookup CSV.
@@ -99,14 +228,14 @@ def run(brand_lookup_csv: str = "transform/seeds/seed_brand_lookup.csv"):
             "manufacturer": str(row.get("manufacturer", "")),
         })
 
-    # Generate embeddings
-    model = SentenceTransformer(MODEL_NAME)
-    embeddings = generate_embeddings(brand_names, model)
-
-    # Upsert to Pinecone
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = get_or_create_index(pc)
-    upsert_to_pinecone(index, brand_names, embeddings, metadata)
+    # Sync to Pinecone, or the local index (VECTOR_INDEX_BACKEND=local)
+    if VECTOR_INDEX_BACKEND == "local":
+        index = LocalVectorIndex()
+    else:
+        index = get_or_create_index(Pinecone(api_key=PINECONE_API_KEY))
+    sync_brand_vectors(index, brand_names, metadata)
+    if isinstance(index, LocalVectorIndex):
+        index.save()
 
     logger.info("Brand embeddings pipeline complete.")
 
@@ -1,28 +1,46 @@
 """
-Match normalized_brand values from transactions to canonical brands via Pinecone.
+Match normalized_brand values from transactions to canonical brands via Pinecone
+(or the in-process index in master_data.vector_index, VECTOR_INDEX_BACKEND=local).
 
 For each new/unmatched brand extracted by Gemini, we:
-1. Generate an embedding for the brand name
-2. Query Pinecone for the nearest canonical brand
-3. If similarity >= CONFIDENCE_THRESHOLD, accept the match
-4. If below threshold, flag for manual review
+1. Try the lexical tiers (master_data.lexical_matcher): an exact key/alias
+   lookup is accepted without embeddings; a trigram hit is only a candidate
+2. Generate an embedding for the brand name (or reuse a cached one), with
+   torch or the int8 ONNX model per EMBEDDING_BACKEND
+3. Query Pinecone for the nearest canonical brand (concurrently, retrying
+   throttled queries)
+4. If similarity >= CONFIDENCE_THRESHOLD, accept the match
+5. If below threshold, flag for manual review
+
+For on-the-fly matching with the model and index kept warm, see
+master_data.brand_service.
 
 Usage:
     python -m master_data.brand_matcher
 """
 
 import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
-from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
 
-from ingestion.config import PINECONE_API_KEY, PINECONE_INDEX_NAME
+from ingestion.config import (
+    PINECONE_BACKOFF_SECONDS,
+    PINECONE_MAX_RETRIES,
+    PINECONE_QUERY_WORKERS,
+)
+from ingestion.http_client import RetryPolicy, call_with_retries
 from ingestion.snowflake_loader import execute_query
+from master_data.embedding_backend import cache_name, load_model
+from master_data.embedding_cache import encode_cached
+from master_data.lexical_matcher import LexicalMatcher
+from master_data.vector_index import LocalVectorIndex, open_index
 
 logger = logging.getLogger(__name__)
 
-MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
 CONFIDENCE_THRESHOLD = 0.95
 TOP_K = 3
 BRAND_IGNORE_CSV = "transform/seeds/seed_brand_ignore.csv"
@@ -57,59 +75,170 @@ def get_unmatched_brands() -> list[str]:
     return brands
 
 
+def query_index(
+    index,
+    vector: list[float],
+    max_retries: int = PINECONE_MAX_RETRIES,
+    backoff_seconds: float = PINECONE_BACKOFF_SECONDS,
+):
+    """
+    Query the index for the TOP_K nearest brands, retrying when throttled.
+
+    Pinecone answers 429 when the index's read units are exhausted and 5xx when
+    overloaded; both are retried with jittered exponential backoff.
+    """
+    return call_with_retries(
+        lambda: index.query(vector=vector, top_k=TOP_K, include_metadata=True),
+        RetryPolicy(max_retries=max_retries, backoff_seconds=backoff_seconds),
+        "Index query",
+    )
+
+
+def query_all(index, embeddings: np.ndarray, workers: int = PINECONE_QUERY_WORKERS) -> list:
+    """
+    Query the index for every embedding row; responses are in input order.
+
+    A LocalVectorIndex answers the whole batch with one matrix multiply; a
+    Pinecone index takes one vector per request, so those run concurrently.
+    """
+    if isinstance(index, LocalVectorIndex):
+        return index.query_batch(embeddings, top_k=TOP_K, include_metadata=True)
+
+    vectors = embeddings.tolist()
+    if workers > 1 and len(vectors) > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="brand-query") as pool:
+            # map() yields results in input order
+            return list(pool.map(lambda vector: query_index(index, vector), vectors))
+    return [query_index(index, vector) for vector in vectors]
+
+
+def result_row(
+    brand_name: str, method: str, score: float, metadata: dict, confident: bool,
+) -> dict:
+    """One match result row (the match_brands columns) for a candidate's metadata."""
+    return {
+        "input_brand": brand_name,
+        "matched_brand": metadata.get("brand_name", ""),
+        "similarity": round(score, 4),
+        "is_confident": confident,
+        "is_private_label": metadata.get("is_private_label", False),
+        "retailer_owner": metadata.get("retailer_owner", ""),
+        "manufacturer": metadata.get("manufacturer", ""),
+        "match_method": method,
+    }
+
+
+def _match_row(brand_name: str, response) -> dict:
+    """Turn a query response into a match result row."""
+    if response.matches:
+        best = response.matches[0]
+        return result_row(
+            brand_name, "embedding", best.score, best.metadata,
+            best.score >= CONFIDENCE_THRESHOLD,
+        )
+    return result_row(brand_name, "none", 0.0, {}, False)
+
+
 def match_brands(
     unmatched: list[str],
-    model: SentenceTransformer,
+    model,
     index,
+    workers: int = PINECONE_QUERY_WORKERS,
 ) -> pd.DataFrame:
     """
-    Match each unmatched brand against Pinecone index.
+    Match each unmatched brand against the brand vector index.
+
+    ``model`` is a SentenceTransformer or OnnxEncoder (see
+    master_data.embedding_backend).
+
+    Brands missing from the embedding cache are encoded in one batch, then all
+    are queried with query_all (up to
+    ``workers`` concurrent queries against Pinecone).
 
-    Returns DataFrame with columns:
-        input_brand, matched_brand, similarity, is_confident
+    Returns DataFrame with columns (one row per input brand, in input order):
+        input_brand, matched_brand, similarity, is_confident, match_method
     """
     if not unmatched:
-        return pd.DataFrame(columns=["input_brand", "matched_brand", "similarity", "is_confident"])
+        return pd.DataFrame(
+            columns=["input_brand", "matched_brand", "similarity", "is_confident", "match_method"]
+        )
 
     logger.info("Generating embeddings for %d unmatched brands...", len(unmatched))
-    embeddings = model.encode(unmatched, normalize_embeddings=True)
-
-    results = []
-    for brand_name, embedding in zip(unmatched, embeddings):
-        response = index.query(
-            vector=embedding.tolist(),
-            top_k=TOP_K,
-            include_metadata=True,
-        )
+    start = time.perf_counter()
+    embeddings = encode_cached(model, unmatched, cache_name())
+    encoded = time.perf_counter()
 
-        if response.matches:
-            best = response.matches[0]
-            results.append({
-                "input_brand": brand_name,
-                "matched_brand": best.metadata.get("brand_name", ""),
-                "similarity": round(best.score, 4),
-                "is_confident": best.score >= CONFIDENCE_THRESHOLD,
-                "is_private_label": best.metadata.get("is_private_label", False),
-                "retailer_owner": best.metadata.get("retailer_owner", ""),
-                "manufacturer": best.metadata.get("manufacturer", ""),
-            })
-        else:
-            results.append({
-                "input_brand": brand_name,
-                "matched_brand": "",
-                "similarity": 0.0,
-                "is_confident": False,
-                "is_private_label": False,
-                "retailer_owner": "",
-                "manufacturer": "",
-            })
-
-    df = pd.DataFrame(results)
+    responses = query_all(index, embeddings, workers)
+    queried = time.perf_counter()
+
+    df = pd.DataFrame([_match_row(name, resp) for name, resp in zip(unmatched, responses)])
     confident = df["is_confident"].sum()
     logger.info(
         "Matched %d/%d brands above %.0f%% confidence",
         confident, len(df), CONFIDENCE_THRESHOLD * 100,
     )
+    logger.info(
+        "Matched %d brands in %.1fs (%.0f brands/sec; encode %.1fs, query %.1fs)",
+        len(df), queried - start, len(df) / max(queried - start, 1e-9),
+        encoded - start, queried - encoded,
+    )
+    return df
+
+
+def match_brands_cascade(
+    unmatched: list[str],
+    lexical: LexicalMatcher,
+    load_model: Callable[[], object],
+    load_index: Callable[[], object],
+) -> pd.DataFrame:
+    """
+    Match brands through the lexical tiers, then embedding search for the rest.
+
+    ``match_method`` says where each row came from, and with it what scale
+    ``similarity`` is on:
+
+      - exact: normalized key/alias lookup, similarity 1.0; always confident
+      - trigram: trigram Jaccard similarity (LEXICAL_TRIGRAM_THRESHOLD scale).
+        Jaccard and cosine scores aren't comparable, so a trigram hit alone is
+        never confident. The brand still goes through embedding search, and a
+        confident embedding match (>= CONFIDENCE_THRESHOLD) replaces it;
+        otherwise the trigram candidate is kept for manual review.
+      - embedding: cosine similarity; confident at >= CONFIDENCE_THRESHOLD
+      - none: no candidate at all
+
+    The model and index are loaded (via ``load_model``/``load_index``) only if
+    any brand needs embedding search.
+
+    Returns the match_brands columns in input order.
+    """
+    if not unmatched:
+        return match_brands([], None, None)
+
+    rows: dict[int, dict] = {}
+    remaining = []
+    for i, brand_name in enumerate(unmatched):
+        hit = lexical.match(brand_name)
+        if hit is not None:
+            rows[i] = result_row(
+                brand_name, hit.tier, hit.score, hit.metadata, hit.tier == "exact",
+            )
+        if hit is None or hit.tier != "exact":
+            remaining.append(i)
+
+    if remaining:
+        embedded = match_brands([unmatched[i] for i in remaining], load_model(), load_index())
+        for i, row in zip(remaining, embedded.to_dict("records")):
+            if i not in rows or row["is_confident"]:
+                rows[i] = row
+
+    df = pd.DataFrame([rows[i] for i in range(len(unmatched))])
+    methods = df["match_method"].value_counts()
+    logger.info(
+        "Match methods for %d brands: %d exact, %d trigram (for review), %d embedding, "
+        "%d no match",
+        len(df), methods.get("exact", 0), methods.get("trigram", 0),
+        methods.get("embedding", 0), methods.get("none", 0),
+    )
     return df
 
 
@@ -132,13 +261,14 @@ def run():
         logger.info("All unmatched brands are in the ignore list. Done.")
         return
 
-    # Load model and index
-    model = SentenceTransformer(MODEL_NAME)
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = pc.Index(PINECONE_INDEX_NAME)
-
-    # Match brands
-    matches_df = match_brands(unmatched, model, index)
+    # Match brands: lexical tiers first, then embeddings against the index
+    # (Pinecone or local, per VECTOR_INDEX_BACKEND) for the rest
+    matches_df = match_brands_cascade(
+        unmatched,
+        LexicalMatcher.from_seeds(),
+        load_model=load_model,
+        load_index=open_index,
+    )
 
     # Split into confident matches and review candidates
     confident = matches_df[matches_df["is_confident"]]
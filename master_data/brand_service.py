@@ -0,0 +1,379 @@
+"""
+Long-running brand matching service for on-the-fly matching from the receipt pipeline.
+
+brand_matcher.run() loads the embedding model and the brand index on every
+run. This service loads them once and keeps them warm, answering match
+requests over a small local HTTP API:
+
+    POST /match    {"brands": ["COTE D'OR", "boni bio"]}
+                   -> {"matches": [<match_brands row>, ...]}  (same order)
+    GET  /metrics  request latency percentiles, throughput and batch sizes
+    GET  /health   {"status": "ok"}
+
+A match request that gets no answer within BRAND_SERVICE_TIMEOUT_SECONDS is
+answered with 504 rather than holding its handler thread.
+
+Concurrent requests are coalesced into micro-batches: a single worker takes
+up to BRAND_SERVICE_MAX_BATCH pending brands, waiting at most
+BRAND_SERVICE_MAX_WAIT_MS for a batch to fill, and matches them with one
+match_brands_cascade call (one encode, one index search). Brands in
+seed_brand_ignore.csv are skipped, as brand_matcher.run() skips them; the
+service still answers them, with match_method "ignored" and is_confident
+false. Every other row is exactly what the offline pipeline produces for the
+same brand, including CONFIDENCE_THRESHOLD.
+
+Usage:
+    python -m master_data.brand_service [--host 127.0.0.1] [--port 8085]
+"""
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from ingestion.config import (
+    BRAND_SERVICE_HOST,
+    BRAND_SERVICE_MAX_BATCH,
+    BRAND_SERVICE_MAX_WAIT_MS,
+    BRAND_SERVICE_PORT,
+    BRAND_SERVICE_TIMEOUT_SECONDS,
+)
+from master_data.brand_matcher import load_ignored_brands, match_brands_cascade, result_row
+from master_data.embedding_backend import cache_name, load_model
+from master_data.lexical_matcher import LexicalMatcher
+from master_data.vector_index import open_index
+
+logger = logging.getLogger(__name__)
+
+# Request latencies kept for percentiles
+LATENCY_WINDOW = 10_000
+
+_STOP = object()
+
+
+class ServiceMetrics:
+    """Thread-safe request and batch counters for /metrics."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.brands = 0
+        self.batches = 0
+        self.batched_brands = 0
+        self.batch_seconds = 0.0
+        self.latencies: deque[float] = deque(maxlen=window)
+
+    def record_request(self, brands: int, seconds: float, error: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.errors += error
+            if not error:
+                self.brands += brands
+                self.latencies.append(seconds)
+
+    def record_batch(self, size: int, seconds: float):
+        with self._lock:
+            self.batches += 1
+            self.batched_brands += size
+            self.batch_seconds += seconds
+
+    def snapshot(self) -> dict:
+        """Current counters; latencies are over the last LATENCY_WINDOW requests."""
+        with self._lock:
+            uptime = time.monotonic() - self.started
+            latencies = np.array(self.latencies)
+            p50, p95, p99 = (
+                np.percentile(latencies, [50, 95, 99]).tolist() if len(latencies) else (0, 0, 0)
+            )
+            return {
+                "uptime_seconds": round(uptime, 1),
+                "requests": self.requests,
+                "errors": self.errors,
+                "brands": self.brands,
+                "brands_per_second": round(self.brands / max(uptime, 1e-9), 2),
+                "batches": self.batches,
+                "mean_batch_size": round(self.batched_brands / max(self.batches, 1), 2),
+                "mean_batch_seconds": round(self.batch_seconds / max(self.batches, 1), 4),
+                "latency_seconds": {
+                    "mean": round(float(latencies.mean()), 4) if len(latencies) else 0,
+                    "p50": round(p50, 4),
+                    "p95": round(p95, 4),
+                    "p99": round(p99, 4),
+                },
+            }
+
+    def log_summary(self):
+        snapshot = self.snapshot()
+        logger.info(
+            "Brand service: %d requests (%d errors), %d brands in %d batches "
+            "(mean %.1f), p50 %.1fms, p99 %.1fms",
+            snapshot["requests"], snapshot["errors"], snapshot["brands"], snapshot["batches"],
+            snapshot["mean_batch_size"], snapshot["latency_seconds"]["p50"] * 1000,
+            snapshot["latency_seconds"]["p99"] * 1000,
+        )
+
+
+class MicroBatcher:
+    """
+    Coalesces items submitted from many threads into batches for one worker.
+
+    The worker blocks for the first pending item, then keeps collecting until
+    the batch holds ``max_batch_size`` items or ``max_wait_seconds`` have passed
+    since that first item, and calls ``process`` on the batch.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[list], list],
+        max_batch_size: int = BRAND_SERVICE_MAX_BATCH,
+        max_wait_seconds: float = BRAND_SERVICE_MAX_WAIT_MS / 1000,
+        metrics: ServiceMetrics | None = None,
+    ):
+        """
+        Args:
+            process: Maps a list of items to a list of results, in the same order.
+            max_batch_size: Most items passed to one ``process`` call.
+            max_wait_seconds: Longest the first item of a batch waits for more.
+            metrics: Receives batch sizes and processing times.
+        """
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.metrics = metrics
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="brand-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, items: list) -> list[Future]:
+        """Queue items; each future resolves to that item's result."""
+        futures = []
+        for item in items:
+            future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return futures
+
+    def close(self):
+        """Finish pending batches and stop the worker."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._run(batch)
+
+    def _run(self, batch: list[tuple]):
+        start = time.perf_counter()
+        try:
+            results = self.process([item for item, _ in batch])
+        except Exception as exc:
+            logger.exception("Batch of %d items failed", len(batch))
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+        if self.metrics is not None:
+            self.metrics.record_batch(len(batch), time.perf_counter() - start)
+
+
+class BrandMatchService:
+    """A warm model, index and lexical matcher behind a MicroBatcher."""
+
+    def __init__(
+        self,
+        model,
+        index,
+        lexical: LexicalMatcher,
+        max_batch_size: int = BRAND_SERVICE_MAX_BATCH,
+        max_wait_ms: float = BRAND_SERVICE_MAX_WAIT_MS,
+        ignored: set[str] | None = None,
+    ):
+        """
+        Args:
+            ignored: Lowercased, stripped brand strings to skip (see load_ignored_brands).
+        """
+        self.model = model
+        self.index = index
+        self.lexical = lexical
+        self.ignored = ignored or set()
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(
+            self._match_batch, max_batch_size, max_wait_ms / 1000, self.metrics,
+        )
+
+    def _match_batch(self, brands: list[str]) -> list[dict]:
+        # Same filter as brand_matcher.run(); ignored brands keep their place in the output
+        wanted = [b for b in brands if b.lower().strip() not in self.ignored]
+        matches = iter(match_brands_cascade(
+            wanted, self.lexical, load_model=lambda: self.model, load_index=lambda: self.index,
+        ).to_dict("records"))
+        return [
+            result_row(b, "ignored", 0.0, {}, False) if b.lower().strip() in self.ignored
+            else next(matches)
+            for b in brands
+        ]
+
+    def match(self, brands: list[str], timeout: float | None = None) -> list[dict]:
+        """
+        Match brands (batched with concurrent callers); rows in input order.
+
+        Raises:
+            TimeoutError: Not every row was ready within ``timeout`` seconds.
+        """
+        start = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            rows = [
+                future.result(None if deadline is None else max(deadline - time.monotonic(), 0))
+                for future in self.batcher.submit(brands)
+            ]
+        except Exception:
+            self.metrics.record_request(len(brands), time.perf_counter() - start, error=True)
+            raise
+        self.metrics.record_request(len(brands), time.perf_counter() - start)
+        return rows
+
+    def warm_up(self):
+        """Run one encode and one index search so the first request is not slow."""
+        self._match_batch(["warm-up"])
+
+    def close(self):
+        self.batcher.close()
+
+
+def _json_default(value):
+    # numpy scalars (similarity scores, flags) from the index
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class BrandMatchHandler(BaseHTTPRequestHandler):
+    """HTTP endpoints of the brand matching service."""
+
+    server: "BrandServiceServer"
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "model": cache_name()})
+        elif self.path == "/metrics":
+            self._send(200, self.server.service.metrics.snapshot())
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/match":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            brands = json.loads(self.rfile.read(length))["brands"]
+            if not isinstance(brands, list) or not all(isinstance(b, str) for b in brands):
+                raise TypeError("brands must be a list of strings")
+        except (ValueError, KeyError, TypeError) as exc:
+            self._send(400, {"error": f"Expected {{\"brands\": [str, ...]}}: {exc}"})
+            return
+
+        try:
+            matches = self.server.service.match(brands, timeout=BRAND_SERVICE_TIMEOUT_SECONDS)
+        except TimeoutError:
+            self._send(504, {
+                "error": f"No matches within {BRAND_SERVICE_TIMEOUT_SECONDS:g}s",
+            })
+            return
+        except Exception as exc:
+            self._send(500, {"error": str(exc)})
+            return
+        self._send(200, {"matches": matches})
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - " + format, self.address_string(), *args)
+
+
+class BrandServiceServer(ThreadingHTTPServer):
+    """One thread per connection; all of them feed the service's MicroBatcher."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: BrandMatchService):
+        super().__init__(address, BrandMatchHandler)
+        self.service = service
+
+
+def serve(
+    host: str = BRAND_SERVICE_HOST,
+    port: int = BRAND_SERVICE_PORT,
+    max_batch_size: int = BRAND_SERVICE_MAX_BATCH,
+    max_wait_ms: float = BRAND_SERVICE_MAX_WAIT_MS,
+):
+    """Load the model, index, seeds and ignore list once, then serve until interrupted."""
+    service = BrandMatchService(
+        load_model(), open_index(), LexicalMatcher.from_seeds(), max_batch_size, max_wait_ms,
+        ignored=load_ignored_brands(),
+    )
+    service.warm_up()
+    server = BrandServiceServer((host, port), service)
+    logger.info(
+        "Brand matching service on http://%s:%d (batches of up to %d, max wait %.0fms)",
+        host, server.server_port, max_batch_size, max_wait_ms,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
+        service.close()
+        service.metrics.log_summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve brand matching over HTTP.")
+    parser.add_argument("--host", default=BRAND_SERVICE_HOST, help="Address to bind.")
+    parser.add_argument("--port", type=int, default=BRAND_SERVICE_PORT, help="Port to bind.")
+    parser.add_argument(
+        "--max-batch", type=int, default=BRAND_SERVICE_MAX_BATCH,
+        help="Most brands matched in one batch.",
+    )
+    parser.add_argument(
+        "--max-wait-ms", type=float, default=BRAND_SERVICE_MAX_WAIT_MS,
+        help="Longest a brand waits for its batch to fill.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port, args.max_batch, args.max_wait_ms)
@@ -0,0 +1,322 @@
+"""
+Embedding model backends for brand_embeddings and brand_matcher.
+
+The default backend loads paraphrase-multilingual-MiniLM-L12-v2 through
+SentenceTransformer, which imports torch; on CPU-only runners that import and
+the fp32 forward pass dominate the runtime. EMBEDDING_BACKEND=onnx runs an
+int8-quantized ONNX export of the same model with onnxruntime instead:
+
+  - the export (``export``) traces the transformer once with torch, then
+    dynamically quantizes its weights to int8; the tokenizer is saved as a
+    standalone tokenizer.json, so inference needs neither torch nor transformers
+  - texts are tokenized once, sorted by token length and batched, so each
+    batch is padded only to its own longest sequence
+  - pooling matches the SentenceTransformer model (mean over non-padding tokens)
+
+Quantization shifts the vectors slightly, so before switching run ``check``:
+it reports cosine agreement with the torch embeddings and the throughput of
+both backends, and exits non-zero if agreement is below MIN_MEAN_COSINE.
+
+Usage:
+    pip install -e ".[onnx]"
+    python -m master_data.embedding_backend export
+    python -m master_data.embedding_backend check
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingestion.config import (
+    EMBEDDING_BACKEND,
+    ONNX_BATCH_SIZE,
+    ONNX_MODEL_DIR,
+    ONNX_NUM_THREADS,
+)
+from master_data.lexical_matcher import BRAND_ALIASES_CSV, BRAND_MASTER_CSV
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+ONNX_OPSET = 17
+
+# Files in ONNX_MODEL_DIR
+MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+CONFIG_FILE = "encoder.json"
+
+# Agreement the int8 model must reach against torch before it is used
+MIN_MEAN_COSINE = 0.98
+
+
+def export_model(output_dir: str = ONNX_MODEL_DIR, model_name: str = MODEL_NAME) -> str:
+    """
+    Export a mean-pooling SentenceTransformer model to int8-quantized ONNX.
+
+    Args:
+        output_dir: Directory for the model, tokenizer.json and encoder.json.
+        model_name: Hub name or local path of the SentenceTransformer model.
+
+    Returns:
+        Path of the quantized model file.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    modules = list(st_model)
+    pooling = modules[1].get_config_dict() if len(modules) == 2 else {}
+    if not (pooling.get("pooling_mode") == "mean" or pooling.get("pooling_mode_mean_tokens")):
+        raise ValueError(f"{model_name} is not a Transformer + mean Pooling model")
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask):
+            return self.transformer(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    wrapper = LastHiddenState(modules[0].auto_model).eval()
+    dummy = st_model.tokenizer(["brand name"], return_tensors="pt")
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, MODEL_FILE)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp32_path = os.path.join(tmp, "model.onnx")
+        with torch.no_grad():
+            torch.onnx.export(
+                wrapper,
+                (dummy["input_ids"], dummy["attention_mask"]),
+                fp32_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=ONNX_OPSET,
+                dynamo=False,
+            )
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+
+    st_model.tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+    with open(os.path.join(output_dir, CONFIG_FILE), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_length": st_model.max_seq_length,
+            "pad_token_id": st_model.tokenizer.pad_token_id,
+            "dimension": modules[0].auto_model.config.hidden_size,
+        }, f, indent=2)
+
+    logger.info(
+        "Exported %s to %s (%.1f MB)", model_name, model_path, os.path.getsize(model_path) / 1e6,
+    )
+    return model_path
+
+
+class OnnxEncoder:
+    """SentenceTransformer-compatible ``encode`` over an exported int8 ONNX model."""
+
+    def __init__(
+        self,
+        model_dir: str = ONNX_MODEL_DIR,
+        batch_size: int = ONNX_BATCH_SIZE,
+        num_threads: int = ONNX_NUM_THREADS,
+    ):
+        """
+        Args:
+            model_dir: Output directory of ``export_model``.
+            batch_size: Texts per inference call.
+            num_threads: onnxruntime intra-op threads (0 = onnxruntime default).
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.no_padding()  # batches are padded to their own longest text
+        self.tokenizer.enable_truncation(self.config["max_length"])
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, MODEL_FILE), options, providers=["CPUExecutionProvider"],
+        )
+
+    def encode(
+        self,
+        texts: list[str],
+        batch_size: int | None = None,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        **kwargs,
+    ) -> np.ndarray:
+        """
+        Embed texts, batching them by token length.
+
+        Returns:
+            (len(texts), dim) float32 array, in input order.
+        """
+        batch_size = batch_size or self.batch_size
+        encodings = self.tokenizer.encode_batch(list(texts))
+        lengths = np.array([len(encoding.ids) for encoding in encodings])
+        order = np.argsort(lengths, kind="stable")
+
+        embeddings = np.empty((len(texts), self.config["dimension"]), dtype=np.float32)
+        for batch_number, start in enumerate(range(0, len(order), batch_size), 1):
+            rows = order[start:start + batch_size]
+            width = max(int(lengths[rows].max()), 1)
+            input_ids = np.full((len(rows), width), self.config["pad_token_id"], dtype=np.int64)
+            attention_mask = np.zeros((len(rows), width), dtype=np.int64)
+            for i, row in enumerate(rows):
+                ids = encodings[row].ids
+                input_ids[i, :len(ids)] = ids
+                attention_mask[i, :len(ids)] = 1
+
+            (hidden,) = self.session.run(
+                None, {"input_ids": input_ids, "attention_mask": attention_mask},
+            )
+            mask = attention_mask[:, :, None].astype(np.float32)
+            embeddings[rows] = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if show_progress_bar:
+                logger.info("Encoded batch %d (%d texts)", batch_number, start + len(rows))
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.clip(norms, 1e-12, None)
+        return embeddings
+
+
+def load_model(backend: str = EMBEDDING_BACKEND, model_name: str = MODEL_NAME):
+    """
+    Load the brand embedding model for the configured backend.
+
+    Returns:
+        A SentenceTransformer ("torch") or an OnnxEncoder ("onnx").
+    """
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name)
+    if backend == "onnx":
+        return OnnxEncoder()
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r} (expected 'torch' or 'onnx')")
+
+
+def cache_name(backend: str = EMBEDDING_BACKEND, model_name: str = MODEL_NAME) -> str:
+    """Embedding cache namespace; int8 vectors are cached apart from torch ones."""
+    return model_name if backend == "torch" else f"{model_name}-onnx-int8"
+
+
+def _throughput(model, texts: list[str], batch_size: int) -> tuple[np.ndarray, float]:
+    model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    embeddings = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    return np.asarray(embeddings, dtype=np.float32), len(texts) / (time.perf_counter() - start)
+
+
+def compare_backends(
+    texts: list[str], torch_model, onnx_model, batch_size: int = ONNX_BATCH_SIZE,
+) -> dict:
+    """
+    Embed ``texts`` with both backends and compare quality and speed.
+
+    Returns:
+        mean_cosine / min_cosine between matching rows, the share of texts whose
+        nearest neighbour among ``texts`` is the same under both backends, and
+        texts/sec for each backend.
+    """
+    reference, torch_per_sec = _throughput(torch_model, texts, batch_size)
+    quantized, onnx_per_sec = _throughput(onnx_model, texts, batch_size)
+
+    cosines = (reference * quantized).sum(axis=1)
+    neighbours = []
+    for vectors in (reference, quantized):
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, -np.inf)
+        neighbours.append(similarity.argmax(axis=1))
+
+    return {
+        "texts": len(texts),
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "neighbour_agreement": float((neighbours[0] == neighbours[1]).mean()),
+        "torch_per_sec": torch_per_sec,
+        "onnx_per_sec": onnx_per_sec,
+        "speedup": onnx_per_sec / torch_per_sec,
+    }
+
+
+def seed_texts(
+    master_csv: str = BRAND_MASTER_CSV, aliases_csv: str = BRAND_ALIASES_CSV,
+) -> list[str]:
+    """Brand names, embedding strings and aliases from the seeds, as a check corpus."""
+    master = pd.read_csv(master_csv, dtype=str)
+    aliases = pd.read_csv(aliases_csv, dtype=str)
+    texts = (
+        master["master_brand"].dropna().tolist()
+        + master["embedding_string"].dropna().tolist()
+        + aliases["alias_string"].dropna().tolist()
+    )
+    return list(dict.fromkeys(texts))
+
+
+def check(model_dir: str = ONNX_MODEL_DIR, model_name: str = MODEL_NAME) -> bool:
+    """Log the torch vs ONNX comparison on the seed brands; True if agreement is sufficient."""
+    from sentence_transformers import SentenceTransformer
+
+    texts = seed_texts()
+    if len(texts) < 2:
+        logger.error("Need brand seeds in %s to compare backends", BRAND_MASTER_CSV)
+        return False
+    report = compare_backends(
+        texts, SentenceTransformer(model_name, device="cpu"), OnnxEncoder(model_dir),
+    )
+    logger.info(
+        "ONNX int8 vs torch on %d texts: cosine mean %.4f / min %.4f, "
+        "nearest-neighbour agreement %.1f%%",
+        report["texts"], report["mean_cosine"], report["min_cosine"],
+        100 * report["neighbour_agreement"],
+    )
+    logger.info(
+        "Throughput: torch %.0f texts/s, onnx %.0f texts/s (%.1fx)",
+        report["torch_per_sec"], report["onnx_per_sec"], report["speedup"],
+    )
+    if report["mean_cosine"] < MIN_MEAN_COSINE:
+        logger.error(
+            "Mean cosine %.4f is below %.2f; keep EMBEDDING_BACKEND=torch",
+            report["mean_cosine"], MIN_MEAN_COSINE,
+        )
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and check the ONNX embedding backend.")
+    parser.add_argument(
+        "command",
+        choices=["export", "check"],
+        help="export: write the int8 ONNX model; check: compare it with torch.",
+    )
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR, help="ONNX model directory.")
+    parser.add_argument("--model-name", default=MODEL_NAME, help="SentenceTransformer model.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "export":
+        export_model(args.model_dir, args.model_name)
+    elif not check(args.model_dir, args.model_name):
+        sys.exit(1)
@@ -0,0 +1,177 @@
+"""
+Persistent embedding cache shared by brand_embeddings and brand_matcher.
+
+Brand strings are embedded on every run, but almost all of them were seen
+before. Embeddings are stored in SQLite, keyed by (model name, normalized
+text), so only strings the cache hasn't seen reach the model:
+
+  - text is normalized with Unicode NFKC and collapsed whitespace; the model
+    encodes the normalized text, so a cached vector is exactly what the model
+    would return for it
+  - vectors are stored as float32 blobs, L2-normalized
+  - the cache is bounded to EMBEDDING_CACHE_MAX_ENTRIES; the least recently
+    used entries are evicted first
+
+Set EMBEDDING_CACHE_PATH to an empty string to disable.
+
+Usage:
+    embeddings = encode_cached(model, brand_names, MODEL_NAME)
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from ingestion.config import EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Keys per SELECT ... IN (...) statement (well under SQLite's variable limit)
+LOOKUP_CHUNK = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Cache key text: NFKC-normalized, whitespace collapsed and trimmed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class EmbeddingCache:
+    """SQLite-backed (model, text) -> vector store with LRU eviction."""
+
+    def __init__(self, path: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model     TEXT NOT NULL,
+                text      TEXT NOT NULL,
+                vector    BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: list[str]) -> dict[str, np.ndarray]:
+        """Look up normalized texts; returns the ones found and marks them as used."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(texts), LOOKUP_CHUNK):
+                chunk = texts[start:start + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT text, vector FROM embeddings WHERE model = ? "
+                    f"AND text IN ({','.join('?' * len(chunk))})",
+                    [model, *chunk],
+                ).fetchall()
+                found.update((text, np.frombuffer(blob, dtype=np.float32)) for text, blob in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text = ?",
+                    [(now, model, text) for text in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, texts: list[str], vectors: np.ndarray):
+        """Store vectors for normalized texts, then evict down to max_entries."""
+        now = time.time()
+        rows = [
+            (model, text, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            excess = self._count() - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                logger.info("Evicted %d embeddings from %s", excess, self.path)
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+_cache: EmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache | None:
+    """Return the process-wide cache, or None when EMBEDDING_CACHE_PATH is empty."""
+    global _cache
+    if not EMBEDDING_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+        return _cache
+
+
+def encode_cached(model, texts: list[str], model_name: str, **encode_kwargs) -> np.ndarray:
+    """
+    Embed ``texts`` with ``model``, encoding only strings missing from the cache.
+
+    Args:
+        model: Anything with a SentenceTransformer-style ``encode``.
+        model_name: Cache namespace; vectors from different models never mix.
+        **encode_kwargs: Passed to ``model.encode`` (e.g. show_progress_bar).
+
+    Returns:
+        (len(texts), dim) float32 array of L2-normalized embeddings, in input order.
+    """
+    cache = get_cache()
+    if cache is None:
+        return np.asarray(
+            model.encode(texts, normalize_embeddings=True, **encode_kwargs), dtype=np.float32,
+        )
+
+    keys = [normalize_text(text) for text in texts]
+    unique = list(dict.fromkeys(keys))
+    vectors = cache.get_many(model_name, unique)
+    misses = [key for key in unique if key not in vectors]
+
+    if misses:
+        encoded = np.asarray(
+            model.encode(misses, normalize_embeddings=True, **encode_kwargs), dtype=np.float32,
+        )
+        cache.put_many(model_name, misses, encoded)
+        vectors.update(zip(misses, encoded))
+
+    logger.info(
+        "Embedding cache: %d/%d unique strings cached, encoded %d",
+        len(unique) - len(misses), len(unique), len(misses),
+    )
+    return np.stack([vectors[key] for key in keys]) if keys else np.empty((0, 0), np.float32)
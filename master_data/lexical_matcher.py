@@ -0,0 +1,159 @@
+"""
+Lexical brand matching tiers, run ahead of embedding search in brand_matcher.
+
+Most unmatched brand strings are trivial variants of a known brand: different
+case or accents ("COTE D'OR"), punctuation ("coca cola"), or strings already
+listed as aliases. Those are resolved without the model or the vector index:
+
+1. exact: the normalized key (accents stripped, casefolded, letters and digits
+   only) of a master brand, its embedding_string, or one of its aliases
+2. trigram: character-trigram Jaccard similarity against all keys, via an
+   inverted index; returned at or above LEXICAL_TRIGRAM_THRESHOLD. brand_matcher
+   treats these as review candidates, not confident matches (see
+   match_brands_cascade)
+
+Both tiers are deterministic, so rerunning the matcher gives the same result.
+
+Seeds:
+    transform/seeds/seed_brand_master.csv   (master_brand, manufacturer, ...)
+    transform/seeds/seed_brand_aliases.csv  (master_brand, alias_string)
+"""
+
+import logging
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+import pandas as pd
+
+from ingestion.config import LEXICAL_TRIGRAM_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+BRAND_MASTER_CSV = "transform/seeds/seed_brand_master.csv"
+BRAND_ALIASES_CSV = "transform/seeds/seed_brand_aliases.csv"
+
+
+def normalize_key(text: str) -> str:
+    """Lookup key: accents stripped, casefolded, letters and digits only."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(
+        ch for ch in decomposed.casefold() if ch.isalnum() and not unicodedata.combining(ch)
+    )
+
+
+def trigrams(key: str) -> set[str]:
+    """Character trigrams of a key, padded so short keys and word edges count."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class LexicalMatch:
+    """A brand resolved by a lexical tier."""
+
+    tier: str  # "exact" or "trigram"
+    score: float
+    metadata: dict
+
+
+class LexicalMatcher:
+    """Exact-key lookup plus a trigram inverted index over the brand seeds."""
+
+    def __init__(
+        self, entries: list[tuple[str, dict]], threshold: float = LEXICAL_TRIGRAM_THRESHOLD,
+    ):
+        """
+        Args:
+            entries: (brand string, metadata) pairs; metadata is what a match
+                returns (brand_name, manufacturer, ...).
+            threshold: Minimum trigram Jaccard similarity for a trigram match.
+        """
+        self.threshold = threshold
+        self._exact: dict[str, dict] = {}
+        for text, metadata in entries:
+            key = normalize_key(text)
+            if not key:
+                continue
+            existing = self._exact.setdefault(key, metadata)
+            if existing["brand_name"] != metadata["brand_name"]:
+                logger.warning(
+                    "Brand key %r maps to both %s and %s; keeping %s",
+                    key, existing["brand_name"], metadata["brand_name"], existing["brand_name"],
+                )
+
+        self._keys = list(self._exact)
+        self._sizes = []
+        self._postings: dict[str, list[int]] = defaultdict(list)
+        for i, key in enumerate(self._keys):
+            grams = trigrams(key)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(i)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @classmethod
+    def from_seeds(
+        cls,
+        master_csv: str = BRAND_MASTER_CSV,
+        aliases_csv: str = BRAND_ALIASES_CSV,
+        threshold: float = LEXICAL_TRIGRAM_THRESHOLD,
+    ) -> "LexicalMatcher":
+        """Build the matcher from the brand master and alias seed CSVs."""
+        master = pd.read_csv(master_csv, dtype=str, keep_default_na=False)
+        aliases = pd.read_csv(aliases_csv, dtype=str, keep_default_na=False)
+
+        metadata = {
+            row["master_brand"]: {
+                "brand_name": row["master_brand"],
+                "is_private_label": row["is_private_label"].strip().upper() == "TRUE",
+                "retailer_owner": row["retailer_owner"],
+                "manufacturer": row["manufacturer"],
+            }
+            for _, row in master.iterrows()
+        }
+        entries = []
+        for _, row in master.iterrows():
+            entries.append((row["master_brand"], metadata[row["master_brand"]]))
+            entries.append((row["embedding_string"], metadata[row["master_brand"]]))
+        for _, row in aliases.iterrows():
+            if row["master_brand"] not in metadata:
+                logger.warning(
+                    "Alias %r refers to unknown brand %r", row["alias_string"], row["master_brand"],
+                )
+                continue
+            entries.append((row["alias_string"], metadata[row["master_brand"]]))
+
+        matcher = cls(entries, threshold=threshold)
+        logger.info(
+            "Loaded %d brand keys (%d brands, %d aliases) for lexical matching",
+            len(matcher), len(master), len(aliases),
+        )
+        return matcher
+
+    def _best_trigram(self, key: str) -> tuple[int, float] | None:
+        grams = trigrams(key)
+        shared = Counter(i for gram in grams for i in self._postings.get(gram, ()))
+        best = None
+        for i, overlap in shared.items():
+            score = overlap / (len(grams) + self._sizes[i] - overlap)
+            # Ties go to the earliest seed entry, so results don't depend on dict order
+            if best is None or score > best[1] or (score == best[1] and i < best[0]):
+                best = (i, score)
+        return best
+
+    def match(self, text: str) -> LexicalMatch | None:
+        """Resolve one brand string, or None if it needs embedding search."""
+        key = normalize_key(text)
+        if not key:
+            return None
+        if key in self._exact:
+            return LexicalMatch("exact", 1.0, self._exact[key])
+
+        best = self._best_trigram(key)
+        if best is not None and best[1] >= self.threshold:
+            i, score = best
+            return LexicalMatch("trigram", round(score, 4), self._exact[self._keys[i]])
+        return None
@@ -161,7 +161,9 @@ def run():
     logger.info("Matched %d/%d store locations (%.0f%%)", matched, len(df), matched / max(len(df), 1) * 100)
 
     # Load enriched store data into Snowflake
-    rows = load_dataframe(df, table_name="store_locations_enriched", overwrite=True)
+    rows = load_dataframe(
+        df, table_name="store_locations_enriched", overwrite=True, swap=True,
+    )
     logger.info("Loaded %d enriched store locations into RAW.STORE_LOCATIONS_ENRICHED", rows)
 
 
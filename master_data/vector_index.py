@@ -0,0 +1,381 @@
+"""
+In-process brand vector index, a drop-in alternative to Pinecone.
+
+Stores L2-normalized embeddings as one matrix in VECTOR_INDEX_DIR and answers
+the subset of the Pinecone Index API the brand pipeline uses (upsert, delete,
+query, list, fetch), so brand_embeddings and brand_matcher work against either backend:
+
+  - ``vectors.npy``: (n, dim) float32, or int8 with per-row scales in
+    ``scales.npy`` (VECTOR_INDEX_DTYPE=int8, 4x smaller)
+  - ``index.json``: vector ids and metadata, in row order
+  - ``hnsw.bin``: optional HNSW graph (hnswlib), built on save() once the index
+    holds VECTOR_INDEX_HNSW_MIN_VECTORS vectors
+
+The matrix is memory-mapped on open. Exact search scores a whole batch of
+queries with one matrix multiply; scores are cosine similarities, as with a
+Pinecone index created with metric="cosine".
+
+Select it with VECTOR_INDEX_BACKEND=local.
+"""
+
+import json
+import logging
+import os
+import tempfile
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from ingestion.config import (
+    PINECONE_API_KEY,
+    PINECONE_INDEX_NAME,
+    VECTOR_INDEX_BACKEND,
+    VECTOR_INDEX_DIR,
+    VECTOR_INDEX_DTYPE,
+    VECTOR_INDEX_HNSW_MIN_VECTORS,
+)
+
+logger = logging.getLogger(__name__)
+
+# HNSW graph degree and build/search beam widths (higher: better recall, slower)
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Stored rows scored per matrix multiply in exact search; bounds the float32
+# temporaries (and the int8 -> float32 conversion) to this many rows
+EXACT_SEARCH_CHUNK_ROWS = 16_384
+
+
+@dataclass
+class Match:
+    """One query hit, shaped like a Pinecone ScoredVector."""
+
+    id: str
+    score: float
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass
+class QueryResponse:
+    """Query result, shaped like a Pinecone QueryResponse."""
+
+    matches: list[Match]
+
+
+@dataclass
+class Vector:
+    """A stored vector, shaped like a Pinecone Vector."""
+
+    id: str
+    values: list[float]
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass
+class FetchResponse:
+    """Fetch result, shaped like a Pinecone FetchResponse."""
+
+    vectors: dict[str, Vector]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: returns (int8 rows, float32 scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales
+
+
+class LocalVectorIndex:
+    """
+    Memory-mapped vector index in a local directory.
+
+    Mutations (upsert, delete) apply in memory; call save() to persist them.
+    """
+
+    def __init__(
+        self,
+        directory: str = VECTOR_INDEX_DIR,
+        dtype: str = VECTOR_INDEX_DTYPE,
+        hnsw_min_vectors: int = VECTOR_INDEX_HNSW_MIN_VECTORS,
+    ):
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported VECTOR_INDEX_DTYPE: {dtype!r}")
+        self.directory = directory
+        self.dtype = dtype
+        self.hnsw_min_vectors = hnsw_min_vectors
+        self.ids: list[str] = []
+        self.metadata: list[dict] = []
+        self._vectors: np.ndarray | None = None  # float32 or int8 rows
+        self._scales: np.ndarray | None = None  # int8 only
+        self._positions: dict[str, int] = {}
+        self._hnsw = None
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # -- persistence ---------------------------------------------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        if not os.path.exists(self._path("index.json")):
+            return
+        with open(self._path("index.json")) as f:
+            meta = json.load(f)
+        self.dtype = meta["dtype"]
+        self.ids = meta["ids"]
+        self.metadata = meta["metadata"]
+        if self.ids:
+            self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+            if self.dtype == "int8":
+                self._scales = np.load(self._path("scales.npy"))
+        self._positions = {vector_id: i for i, vector_id in enumerate(self.ids)}
+
+        if meta.get("hnsw") and os.path.exists(self._path("hnsw.bin")):
+            self._hnsw = self._load_hnsw(self._vectors.shape[1])
+        logger.info(
+            "Opened local vector index %s: %d %s vectors%s",
+            self.directory, len(self), self.dtype, " + HNSW" if self._hnsw else "",
+        )
+
+    def save(self):
+        """Write vectors, metadata and (for large indexes) the HNSW graph to disk."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._hnsw = None
+        if self._vectors is not None:
+            self._write_atomic("vectors.npy", lambda f: np.save(f, self._vectors))
+            if self._scales is not None:
+                self._write_atomic("scales.npy", lambda f: np.save(f, self._scales))
+            if self.hnsw_min_vectors and len(self) >= self.hnsw_min_vectors:
+                self._hnsw = self._build_hnsw()
+
+        meta = {
+            "dtype": self.dtype,
+            "ids": self.ids,
+            "metadata": self.metadata,
+            "hnsw": self._hnsw is not None,
+        }
+        # Metadata last: readers never see ids that don't match the matrix
+        self._write_atomic("index.json", lambda f: f.write(json.dumps(meta).encode()))
+        logger.info("Saved %d vectors to %s", len(self), self.directory)
+
+    def _write_atomic(self, name: str, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, self._path(name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    # -- HNSW ----------------------------------------------------------------
+
+    def _build_hnsw(self):
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning("hnswlib is not installed; the local index uses exact search only")
+            return None
+
+        logger.info("Building HNSW graph over %d vectors...", len(self))
+        vectors = self.dense_vectors()
+        graph = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        graph.init_index(max_elements=len(vectors), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        graph.add_items(vectors, np.arange(len(vectors)))
+        graph.save_index(self._path("hnsw.bin"))
+        graph.set_ef(HNSW_EF_SEARCH)
+        return graph
+
+    def _load_hnsw(self, dim: int):
+        try:
+            import hnswlib
+        except ImportError:
+            return None
+        graph = hnswlib.Index(space="ip", dim=dim)
+        graph.load_index(self._path("hnsw.bin"), max_elements=len(self))
+        graph.set_ef(HNSW_EF_SEARCH)
+        return graph
+
+    # -- mutation ------------------------------------------------------------
+
+    def dense_vectors(self) -> np.ndarray:
+        """All stored vectors as a float32 matrix (dequantized for int8)."""
+        if self._vectors is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self.dense_vectors_at(slice(None))
+
+    def dense_vectors_at(self, rows) -> np.ndarray:
+        """Stored vectors at ``rows`` as float32 (dequantized for int8)."""
+        if self.dtype == "int8":
+            return self._vectors[rows].astype(np.float32) * self._scales[rows, None]
+        return np.asarray(self._vectors[rows], dtype=np.float32)
+
+    def _encode(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+        if self.dtype == "int8":
+            return quantize(vectors)
+        return vectors.astype(np.float32), None
+
+    def upsert(self, vectors: list[dict]):
+        """
+        Insert or replace vectors, Pinecone-style: [{"id", "values", "metadata"}].
+
+        Values are L2-normalized on the way in.
+        """
+        if not vectors:
+            return
+        values = _normalize(np.asarray([v["values"] for v in vectors], dtype=np.float32))
+        rows, scales = self._encode(values)
+
+        if self._vectors is None:
+            self._vectors = np.empty((0, rows.shape[1]), dtype=rows.dtype)
+            self._scales = np.empty(0, dtype=np.float32) if scales is not None else None
+        elif rows.shape[1] != self._vectors.shape[1]:
+            raise ValueError(
+                f"Vector dimension {rows.shape[1]} does not match index ({self._vectors.shape[1]})"
+            )
+
+        # Copy on first write: the memory-mapped matrix is read-only
+        matrix = np.array(self._vectors)
+        scale_rows = np.array(self._scales) if self._scales is not None else None
+        new_rows = []
+        # The last occurrence of an id within the batch wins
+        latest = {vector["id"]: i for i, vector in enumerate(vectors)}
+        for i in latest.values():
+            vector = vectors[i]
+            position = self._positions.get(vector["id"])
+            if position is None:
+                self._positions[vector["id"]] = len(self.ids)
+                self.ids.append(vector["id"])
+                self.metadata.append(dict(vector.get("metadata") or {}))
+                new_rows.append(i)
+            else:
+                matrix[position] = rows[i]
+                if scale_rows is not None:
+                    scale_rows[position] = scales[i]
+                self.metadata[position] = dict(vector.get("metadata") or {})
+
+        self._vectors = np.concatenate([matrix, rows[new_rows]])
+        if scale_rows is not None:
+            self._scales = np.concatenate([scale_rows, scales[new_rows]])
+        self._hnsw = None  # stale until the next save()
+
+    def delete(self, ids: list[str]):
+        """Remove vectors by id (unknown ids are ignored)."""
+        drop = {self._positions[i] for i in ids if i in self._positions}
+        if not drop:
+            return
+        keep = [i for i in range(len(self.ids)) if i not in drop]
+        self.ids = [self.ids[i] for i in keep]
+        self.metadata = [self.metadata[i] for i in keep]
+        self._vectors = np.asarray(self._vectors)[keep]
+        if self._scales is not None:
+            self._scales = self._scales[keep]
+        self._positions = {vector_id: i for i, vector_id in enumerate(self.ids)}
+        self._hnsw = None
+
+    # -- search --------------------------------------------------------------
+
+    def query_batch(
+        self, vectors, top_k: int = 3, include_metadata: bool = True,
+    ) -> list[QueryResponse]:
+        """
+        Find the ``top_k`` nearest stored vectors for each query vector.
+
+        Exact search is one (batch x n) matrix multiply; with an HNSW graph the
+        search is approximate.
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        k = min(top_k, len(self))
+        if k == 0:
+            return [QueryResponse([]) for _ in queries]
+
+        if self._hnsw is not None:
+            self._hnsw.set_ef(max(HNSW_EF_SEARCH, k))
+            labels, distances = self._hnsw.knn_query(queries, k=k)
+            top, scores = labels, 1 - distances
+        else:
+            top, scores = self._exact_top_k(queries, k)
+
+        return [
+            QueryResponse([
+                Match(
+                    id=self.ids[row],
+                    score=float(score),
+                    metadata=self.metadata[row] if include_metadata else {},
+                )
+                for row, score in zip(rows, row_scores)
+            ])
+            for rows, row_scores in zip(top, scores)
+        ]
+
+    def _exact_top_k(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k by scoring the stored rows in chunks of EXACT_SEARCH_CHUNK_ROWS.
+
+        Each chunk keeps only its own top k candidates, so memory stays bounded
+        by the chunk size rather than the index size; int8 chunks are converted
+        to float32 one at a time and their per-row scales folded into the scores.
+        """
+        candidate_rows, candidate_scores = [], []
+        for start in range(0, len(self), EXACT_SEARCH_CHUNK_ROWS):
+            chunk = self._vectors[start:start + EXACT_SEARCH_CHUNK_ROWS]
+            scores = queries @ np.asarray(chunk, dtype=np.float32).T
+            if self.dtype == "int8":
+                scores *= self._scales[start:start + len(chunk)]
+            chunk_k = min(k, len(chunk))
+            rows = np.argpartition(-scores, chunk_k - 1, axis=1)[:, :chunk_k]
+            candidate_scores.append(np.take_along_axis(scores, rows, axis=1))
+            candidate_rows.append(rows + start)
+
+        rows = np.concatenate(candidate_rows, axis=1)
+        scores = np.concatenate(candidate_scores, axis=1)
+        order = np.argsort(-scores, axis=1)[:, :k]
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True) -> QueryResponse:
+        """Pinecone-compatible single query."""
+        return self.query_batch([vector], top_k=top_k, include_metadata=include_metadata)[0]
+
+    # -- listing -------------------------------------------------------------
+
+    def fetch(self, ids: list[str]) -> FetchResponse:
+        """Return stored vectors and metadata by id (unknown ids are skipped)."""
+        vectors = {}
+        for vector_id in ids:
+            position = self._positions.get(vector_id)
+            if position is not None:
+                values = self.dense_vectors_at([position])[0]
+                vectors[vector_id] = Vector(vector_id, values.tolist(), self.metadata[position])
+        return FetchResponse(vectors)
+
+    def list(self, prefix: str = "", limit: int = 100) -> Iterator[list[str]]:
+        """Yield pages of vector ids starting with ``prefix``, like Pinecone's list()."""
+        ids = [vector_id for vector_id in self.ids if vector_id.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+
+def open_index(backend: str = VECTOR_INDEX_BACKEND):
+    """
+    Open the configured brand vector index.
+
+    Returns:
+        A LocalVectorIndex, or a Pinecone Index handle.
+    """
+    if backend == "local":
+        return LocalVectorIndex()
+    if backend == "pinecone":
+        from pinecone import Pinecone
+
+        return Pinecone(api_key=PINECONE_API_KEY).Index(PINECONE_INDEX_NAME)
+    raise ValueError(f"Unknown VECTOR_INDEX_BACKEND: {backend!r}")
@@ -0,0 +1,117 @@
+"""Tests for incremental brand embedding sync (against the offline local index)."""
+
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from master_data.brand_embeddings import brand_id, sync_brand_vectors, upsert_to_pinecone
+from master_data.vector_index import LocalVectorIndex
+
+
+@pytest.fixture(autouse=True)
+def no_embedding_cache():
+    with patch("master_data.embedding_cache.EMBEDDING_CACHE_PATH", ""):
+        yield
+
+
+def _model():
+    """Mock encoder: a deterministic unit vector per string."""
+    model = MagicMock()
+
+    def encode(texts, normalize_embeddings=True, **kwargs):
+        rows = np.array([[len(t), sum(map(ord, t)) % 7 + 1, 1, 0] for t in texts], np.float32)
+        return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+    model.encode.side_effect = encode
+    return model
+
+
+def _meta(manufacturer: str = "") -> dict:
+    return {"is_private_label": False, "retailer_owner": "", "manufacturer": manufacturer}
+
+
+@pytest.fixture
+def index(tmp_path) -> LocalVectorIndex:
+    return LocalVectorIndex(str(tmp_path / "index"), hnsw_min_vectors=0)
+
+
+class TestBrandId:
+    def test_stable_and_prefixed(self):
+        assert brand_id("Boni") == brand_id("Boni")
+        assert brand_id("Boni") != brand_id("Alpro")
+        assert brand_id("Côte d'Or").startswith("brand_")
+
+
+class TestSyncBrandVectors:
+    def test_first_sync_upserts_everything(self, index):
+        counts = sync_brand_vectors(index, ["Boni", "Alpro"], [_meta(), _meta()], _model)
+
+        assert counts == {"unchanged": 0, "upserted": 2, "deleted": 0}
+        assert set(index.ids) == {brand_id("Boni"), brand_id("Alpro")}
+        assert index.fetch([brand_id("Boni")]).vectors[brand_id("Boni")].metadata["brand_name"] \
+            == "Boni"
+
+    def test_resync_only_touches_changes(self, index):
+        sync_brand_vectors(index, ["Boni", "Alpro", "Lotus"], [_meta()] * 3, _model)
+
+        model = _model()
+        counts = sync_brand_vectors(
+            index, ["Lotus", "Delhaize", "Boni"], [_meta("Lotus Bakeries"), _meta(), _meta()],
+            lambda: model,
+        )
+
+        # Reordered rows are unchanged; Lotus' metadata changed; Alpro is gone
+        assert counts == {"unchanged": 1, "upserted": 2, "deleted": 1}
+        assert model.encode.call_args.args[0] == ["Lotus", "Delhaize"]
+        assert set(index.ids) == {brand_id(b) for b in ["Boni", "Lotus", "Delhaize"]}
+        lotus = index.fetch([brand_id("Lotus")]).vectors[brand_id("Lotus")]
+        assert lotus.metadata["manufacturer"] == "Lotus Bakeries"
+
+    def test_unchanged_catalog_does_not_load_the_model(self, index):
+        sync_brand_vectors(index, ["Boni"], [_meta()], _model)
+
+        load_model = MagicMock(side_effect=_model)
+        counts = sync_brand_vectors(index, ["Boni"], [_meta()], load_model)
+
+        load_model.assert_not_called()
+        assert counts["unchanged"] == 1
+
+    def test_positional_ids_are_replaced(self, index):
+        index.upsert([
+            {"id": "brand_0", "values": [1, 0, 0, 0], "metadata": {"brand_name": "Boni"}},
+        ])
+
+        counts = sync_brand_vectors(index, ["Boni"], [_meta()], _model)
+
+        assert counts["deleted"] == 1
+        assert index.ids == [brand_id("Boni")]
+
+
+class TestUpsertToPinecone:
+    def test_batches_run_concurrently_with_stable_ids(self):
+        index = MagicMock()
+        names = [f"Brand {i}" for i in range(250)]
+        metadata = [_meta() for _ in names]
+
+        with patch("master_data.brand_embeddings.BATCH_SIZE", 100):
+            upsert_to_pinecone(index, names, [[0.1] * 4] * 250, metadata, workers=3)
+
+        batches = [call.kwargs["vectors"] for call in index.upsert.call_args_list]
+        assert sorted(len(batch) for batch in batches) == [50, 100, 100]
+        ids = {vector["id"] for batch in batches for vector in batch}
+        assert ids == {brand_id(name) for name in names}
+        assert "brand_name" not in metadata[0]  # caller's dicts are left alone
+
+    def test_throttled_batch_is_retried(self):
+        class ThrottledError(Exception):
+            status = 429
+
+        index = MagicMock()
+        index.upsert.side_effect = [ThrottledError(), None]
+
+        with patch("ingestion.http_client.time.sleep") as sleep:
+            upsert_to_pinecone(index, ["Boni"], [[0.1] * 4], [_meta()])
+
+        assert index.upsert.call_count == 2
+        sleep.assert_called_once()
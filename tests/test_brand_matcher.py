@@ -8,6 +8,13 @@ import pytest
 from master_data.brand_matcher import CONFIDENCE_THRESHOLD, match_brands
 
 
+@pytest.fixture(autouse=True)
+def no_embedding_cache():
+    """Encode with the mock model directly, not through the on-disk cache."""
+    with patch("master_data.embedding_cache.EMBEDDING_CACHE_PATH", ""):
+        yield
+
+
 class TestMatchBrands:
     """Test brand matching logic."""
 
@@ -98,3 +105,57 @@ class TestConfidenceThreshold:
 
     def test_threshold_is_85_percent(self):
         assert CONFIDENCE_THRESHOLD == 0.85
+
+
+def _response(brand: str, score: float):
+    match = MagicMock()
+    match.score = score
+    match.metadata = {"brand_name": brand}
+    response = MagicMock()
+    response.matches = [match]
+    return response
+
+
+class ThrottledError(Exception):
+    status = 429
+
+
+class TestConcurrentQueries:
+    """Test concurrent index querying."""
+
+    def test_results_keep_input_order(self):
+        import numpy as np
+
+        brands = [f"brand {i}" for i in range(20)]
+        model = MagicMock()
+        model.encode.return_value = np.arange(20, dtype=np.float32).reshape(20, 1)
+
+        index = MagicMock()
+        index.query.side_effect = lambda vector, **kw: _response(f"match {int(vector[0])}", 0.99)
+
+        result = match_brands(brands, model, index, workers=8)
+
+        assert result["input_brand"].tolist() == brands
+        assert result["matched_brand"].tolist() == [f"match {i}" for i in range(20)]
+
+    @patch("ingestion.http_client.time.sleep")
+    def test_throttled_queries_are_retried(self, mock_sleep):
+        from master_data.brand_matcher import query_index
+
+        index = MagicMock()
+        index.query.side_effect = [ThrottledError(), ThrottledError(), _response("Jupiler", 0.9)]
+
+        response = query_index(index, [0.1], max_retries=3, backoff_seconds=0)
+
+        assert response.matches[0].metadata["brand_name"] == "Jupiler"
+        assert index.query.call_count == 3
+
+    def test_other_errors_are_not_retried(self):
+        from master_data.brand_matcher import query_index
+
+        index = MagicMock()
+        index.query.side_effect = ValueError("bad vector")
+
+        with pytest.raises(ValueError):
+            query_index(index, [0.1], max_retries=3, backoff_seconds=0)
+        assert index.query.call_count == 1
@@ -0,0 +1,205 @@
+"""Tests for the brand matching service: micro-batching and the HTTP endpoints."""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from master_data.brand_matcher import CONFIDENCE_THRESHOLD, match_brands_cascade
+from master_data.brand_service import BrandMatchService, BrandServiceServer, MicroBatcher
+from master_data.lexical_matcher import LexicalMatcher
+from master_data.vector_index import LocalVectorIndex
+
+
+@pytest.fixture(autouse=True)
+def no_embedding_cache():
+    with patch("master_data.embedding_cache.EMBEDDING_CACHE_PATH", ""):
+        yield
+
+
+def _record(batches: list):
+    def process(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+    return process
+
+
+class TestMicroBatcher:
+    def test_concurrent_submits_are_coalesced(self):
+        batches = []
+        batcher = MicroBatcher(_record(batches), max_batch_size=100, max_wait_seconds=0.2)
+        results = {}
+
+        def submit(i):
+            results[i] = batcher.submit([i])[0].result(timeout=5)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        assert results == {i: i * 10 for i in range(20)}
+        assert len(batches) < 20
+
+    def test_batches_are_capped(self):
+        batches = []
+        batcher = MicroBatcher(_record(batches), max_batch_size=4, max_wait_seconds=0.05)
+
+        futures = batcher.submit(list(range(10)))
+        assert [f.result(timeout=5) for f in futures] == [i * 10 for i in range(10)]
+        batcher.close()
+
+        assert max(len(batch) for batch in batches) <= 4
+        assert sum(batches, []) == list(range(10))
+
+    def test_lone_item_waits_at_most_max_wait(self):
+        batcher = MicroBatcher(_record([]), max_batch_size=100, max_wait_seconds=0.05)
+
+        start = time.monotonic()
+        batcher.submit([1])[0].result(timeout=5)
+        batcher.close()
+
+        assert time.monotonic() - start < 1
+
+    def test_failures_reach_every_caller_in_the_batch(self):
+        batcher = MicroBatcher(MagicMock(side_effect=RuntimeError("index down")),
+                               max_batch_size=10, max_wait_seconds=0.05)
+
+        futures = batcher.submit(["a", "b"])
+        for future in futures:
+            with pytest.raises(RuntimeError, match="index down"):
+                future.result(timeout=5)
+        batcher.close()
+
+
+def _vectors(n: int = 4, dim: int = 8) -> np.ndarray:
+    vectors = np.random.default_rng(0).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def service(tmp_path):
+    vectors = _vectors()
+    index = LocalVectorIndex(str(tmp_path / "index"))
+    index.upsert([
+        {"id": f"brand_{i}", "values": v, "metadata": {"brand_name": f"Brand {i}"}}
+        for i, v in enumerate(vectors)
+    ])
+    # "near brand N" embeds as brand N's vector; anything else as a uniform vector
+    model = MagicMock()
+    model.encode.side_effect = lambda texts, **kwargs: np.stack([
+        vectors[int(t[-1])] if t.startswith("near brand") else np.full(8, 8 ** -0.5, np.float32)
+        for t in texts
+    ])
+    lexical = LexicalMatcher([("Boni", {"brand_name": "Boni"})])
+    service = BrandMatchService(
+        model, index, lexical, max_batch_size=16, max_wait_ms=100, ignored={"n/a"},
+    )
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def base_url(service):
+    server = BrandServiceServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def _request(url: str, payload: dict | None = None) -> tuple[int, dict]:
+    data = json.dumps(payload).encode() if payload is not None else None
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+class TestBrandService:
+    def test_match_agrees_with_offline_cascade(self, service, base_url):
+        brands = ["BONI", "near brand 2", "something else"]
+
+        status, body = _request(f"{base_url}/match", {"brands": brands})
+
+        offline = match_brands_cascade(
+            brands, service.lexical, lambda: service.model, lambda: service.index,
+        ).to_dict("records")
+        assert status == 200
+        assert [row["input_brand"] for row in body["matches"]] == brands
+        assert [row["match_method"] for row in body["matches"]] \
+            == ["exact", "embedding", "embedding"]
+        for online, expected in zip(body["matches"], offline):
+            assert online["matched_brand"] == expected["matched_brand"]
+            assert online["similarity"] == pytest.approx(expected["similarity"])
+            assert online["is_confident"] == bool(expected["is_confident"])
+        assert body["matches"][1]["matched_brand"] == "Brand 2"
+        assert body["matches"][1]["similarity"] >= CONFIDENCE_THRESHOLD
+        assert not body["matches"][2]["is_confident"]
+
+    def test_ignored_brands_are_not_matched(self, service, base_url):
+        brands = ["near brand 1", " N/A ", "BONI"]
+
+        status, body = _request(f"{base_url}/match", {"brands": brands})
+
+        assert status == 200
+        assert [row["input_brand"] for row in body["matches"]] == brands
+        assert [row["match_method"] for row in body["matches"]] == ["embedding", "ignored", "exact"]
+        assert body["matches"][1]["matched_brand"] == ""
+        assert not body["matches"][1]["is_confident"]
+        # The ignored brand never reaches the model (and the exact hit needs no embedding)
+        assert service.model.encode.call_args.args[0] == ["near brand 1"]
+
+    def test_concurrent_requests_share_batches(self, service, base_url):
+        results = []
+
+        def call(i):
+            results.append(_request(f"{base_url}/match", {"brands": [f"near brand {i % 4}"]}))
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all(status == 200 for status, _ in results)
+        _, metrics = _request(f"{base_url}/metrics")
+        assert metrics["requests"] == 12
+        assert metrics["brands"] == 12
+        assert metrics["batches"] < 12
+        assert metrics["latency_seconds"]["p99"] > 0
+
+    def test_stalled_batch_times_out_with_504(self, service, base_url):
+        release = threading.Event()
+        encode = service.model.encode.side_effect
+
+        def stalled_encode(*args, **kwargs):
+            release.wait(5)
+            return encode(*args, **kwargs)
+
+        service.model.encode.side_effect = stalled_encode
+
+        with patch("master_data.brand_service.BRAND_SERVICE_TIMEOUT_SECONDS", 0.2):
+            status, body = _request(f"{base_url}/match", {"brands": ["near brand 1"]})
+        release.set()
+
+        assert status == 504
+        assert "0.2s" in body["error"]
+        _, metrics = _request(f"{base_url}/metrics")
+        assert metrics["errors"] == 1
+
+    def test_health_and_bad_requests(self, base_url):
+        status, body = _request(f"{base_url}/health")
+        assert (status, body["status"]) == (200, "ok")
+        assert _request(f"{base_url}/match", {"brand": "Boni"})[0] == 400
+        assert _request(f"{base_url}/match", {"brands": [1, 2]})[0] == 400
+        assert _request(f"{base_url}/nope")[0] == 404
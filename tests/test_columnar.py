@@ -0,0 +1,49 @@
+"""Tests for the columnar parsing helpers."""
+
+import pandas as pd
+
+from ingestion.columnar import first_item, first_token, loads, records_to_columns
+
+
+class TestLoads:
+    def test_decodes_bytes_and_str(self):
+        assert loads(b'{"elements": [1, 2]}') == {"elements": [1, 2]}
+        assert loads('{"remark": "ok"}') == {"remark": "ok"}
+
+
+class TestRecordsToColumns:
+    def test_default_fields_match_dataframe_inference(self):
+        records = [{"code": "1", "brands": "Boni"}, {"code": "2", "quantity": "1 kg"}]
+
+        df = pd.DataFrame(records_to_columns(records))
+
+        pd.testing.assert_frame_equal(df, pd.DataFrame(records))
+
+    def test_explicit_fields_fill_missing_with_none(self):
+        columns = records_to_columns([{"code": "1"}], fields=["code", "brands"])
+        assert columns == {"code": ["1"], "brands": [None]}
+
+
+class TestFirstToken:
+    def test_matches_pandas_string_path(self):
+        brands = pd.Series(["Boni, Colruyt", None, "  Lotus ", ""], index=[5, 6, 7, 8])
+
+        expected = brands.fillna("").str.split(",").str[0].str.strip()
+        pd.testing.assert_series_equal(first_token(brands, ","), expected, check_dtype=False)
+
+    def test_non_string_values_fall_back(self):
+        assert first_token(pd.Series([42, "a,b"]), ",").tolist() == ["42", "a"]
+
+
+class TestFirstItem:
+    def test_first_list_item_with_prefix_removed(self):
+        tags = pd.Series([["en:snacks", "en:chips"], [], None, float("nan")], index=[3, 2, 1, 0])
+
+        result = first_item(tags, strip="en:")
+
+        assert result.tolist() == ["snacks", "", "", ""]
+        assert list(result.index) == [3, 2, 1, 0]
+
+    def test_mixed_values_fall_back(self):
+        tags = pd.Series([["en:breads"], {"not": "a list"}])
+        assert first_item(tags, strip="en:").tolist() == ["breads", ""]
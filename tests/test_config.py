@@ -0,0 +1,41 @@
+"""Tests for environment-based configuration."""
+
+import importlib
+import os
+from unittest.mock import patch
+
+import pytest
+
+from ingestion import config
+
+REQUIRED = ["SNOWFLAKE_ACCOUNT", "SNOWFLAKE_USER", "SNOWFLAKE_PASSWORD", "RAILWAY_DATABASE_URL"]
+
+
+@pytest.fixture
+def reload_config():
+    """Reload ingestion.config under a patched environment, then restore it."""
+    yield lambda: importlib.reload(config)
+    importlib.reload(config)
+
+
+def _env_without(*names, **values) -> dict:
+    env = {k: v for k, v in os.environ.items() if k not in names}
+    env.update(values)
+    return env
+
+
+class TestRequiredCredentials:
+    def test_snowflake_backend_requires_credentials(self, reload_config):
+        env = _env_without(*REQUIRED, WAREHOUSE_BACKEND="snowflake")
+        with patch.dict(os.environ, env, clear=True), \
+                patch("dotenv.load_dotenv"), \
+                pytest.raises(RuntimeError, match="SNOWFLAKE_ACCOUNT, SNOWFLAKE_USER"):
+            reload_config()
+
+    def test_duckdb_backend_runs_without_credentials(self, reload_config):
+        env = _env_without(*REQUIRED, WAREHOUSE_BACKEND="duckdb")
+        with patch.dict(os.environ, env, clear=True), patch("dotenv.load_dotenv"):
+            reloaded = reload_config()
+
+        assert reloaded.SNOWFLAKE_CONFIG["account"] == ""
+        assert reloaded.RAILWAY_DB_URL == ""
@@ -0,0 +1,43 @@
+"""Tests for the CSV exporter."""
+
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from exports.csv_exporter import write_query_to_csv
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    """Each test starts with an empty connection pool."""
+    from ingestion.snowflake_loader import close_pool
+
+    close_pool()
+    yield
+    close_pool()
+
+
+class TestWriteQueryToCsv:
+    @patch("exports.csv_exporter.iter_query_batches")
+    def test_streams_batches_under_one_header(self, mock_batches, tmp_path):
+        mock_batches.return_value = iter([
+            pd.DataFrame({"BRAND": ["Boni", "Lotus"], "SALES": [1, 2]}),
+            pd.DataFrame({"BRAND": ["Alpro"], "SALES": [3]}),
+        ])
+        path = tmp_path / "out.csv"
+
+        assert write_query_to_csv("SELECT 1", str(path)) == 3
+        assert path.read_text().splitlines() == [
+            "BRAND,SALES", "Boni,1", "Lotus,2", "Alpro,3",
+        ]
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    def test_empty_result_still_has_a_header(self, mock_conn, tmp_path):
+        cursor = mock_conn.return_value.cursor.return_value
+        cursor.fetch_pandas_batches.return_value = iter([])
+        cursor.description = [("BRAND",), ("SALES",)]
+        path = tmp_path / "out.csv"
+
+        assert write_query_to_csv("SELECT BRAND, SALES FROM T WHERE FALSE", str(path)) == 0
+        assert path.read_text().splitlines() == ["BRAND,SALES"]
@@ -0,0 +1,147 @@
+"""Tests for the DuckDB warehouse backend (runs against a real temporary file)."""
+
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+
+@pytest.fixture(autouse=True)
+def duckdb_backend(tmp_path):
+    """Route snowflake_loader to a fresh DuckDB file for each test."""
+    from ingestion import duckdb_warehouse
+
+    duckdb_warehouse.close_database()
+    path = str(tmp_path / "scandalicious_dw.duckdb")
+    with patch("ingestion.snowflake_loader.WAREHOUSE_BACKEND", "duckdb"), \
+            patch("ingestion.duckdb_warehouse.DUCKDB_PATH", path):
+        yield
+    duckdb_warehouse.close_database()
+
+
+def _users(ids, names):
+    return pd.DataFrame({"id": ids, "name": names})
+
+
+class TestLoadAndQuery:
+    """load_dataframe / execute_query through the snowflake_loader API."""
+
+    def test_creates_then_appends(self):
+        from ingestion.snowflake_loader import execute_query, load_dataframe
+
+        assert load_dataframe(_users([1, 2], ["a", "b"]), "users") == 2
+        load_dataframe(_users([3], ["c"]), "users")
+
+        result = execute_query("SELECT * FROM RAW.USERS ORDER BY id")
+        assert list(result.columns) == ["ID", "NAME"]
+        assert result["ID"].tolist() == [1, 2, 3]
+
+    def test_overwrite_replaces_rows(self):
+        from ingestion.snowflake_loader import execute_query, load_dataframe
+
+        load_dataframe(_users([1, 2], ["a", "b"]), "users")
+        load_dataframe(_users([9], ["z"]), "users", overwrite=True, swap=True)
+
+        assert execute_query("SELECT id FROM RAW.USERS")["ID"].tolist() == [9]
+
+    def test_fully_qualified_name_and_params(self):
+        from ingestion.snowflake_loader import execute_query, load_dataframe
+
+        load_dataframe(_users([1, 2], ["a", "b"]), "users")
+        result = execute_query(
+            "SELECT name FROM SCANDALICIOUS_DW.RAW.USERS WHERE id = %(id)s", {"id": 2}
+        )
+        assert result["NAME"].tolist() == ["b"]
+
+    def test_iter_query_batches(self):
+        from ingestion.snowflake_loader import iter_query_batches, load_dataframe
+
+        load_dataframe(_users(list(range(10)), ["x"] * 10), "users")
+        batches = list(iter_query_batches("SELECT * FROM RAW.USERS", as_arrow=True))
+        assert sum(b.num_rows for b in batches) == 10
+        assert batches[0].column_names == ["ID", "NAME"]
+
+    def test_iter_query_batches_empty_result_keeps_columns(self):
+        from ingestion.snowflake_loader import iter_query_batches, load_dataframe
+
+        load_dataframe(_users([1], ["a"]), "users")
+        batches = list(iter_query_batches("SELECT * FROM RAW.USERS WHERE id < 0"))
+        assert len(batches) == 1
+        assert batches[0].empty
+        assert list(batches[0].columns) == ["ID", "NAME"]
+
+
+class TestMergeAndDelete:
+    def test_merge_updates_and_inserts(self):
+        from ingestion.snowflake_loader import execute_query, load_dataframe, merge_dataframe
+
+        load_dataframe(_users([1, 2], ["a", "b"]), "users")
+        assert merge_dataframe(_users([2, 3], ["B", "c"]), "users") == 2
+
+        result = execute_query("SELECT * FROM RAW.USERS ORDER BY id")
+        assert result["NAME"].tolist() == ["a", "B", "c"]
+
+    def test_delete_rows(self):
+        from ingestion.snowflake_loader import delete_rows, execute_query, load_dataframe
+
+        load_dataframe(_users([1, 2, 3], ["a", "b", "c"]), "users")
+        assert delete_rows("users", [1, 3]) == 2
+        assert execute_query("SELECT id FROM RAW.USERS")["ID"].tolist() == [2]
+
+
+class TestSwapTable:
+    def test_swaps_in_loaded_shadow(self):
+        from ingestion.snowflake_loader import execute_query, load_dataframe, swap_table
+
+        load_dataframe(_users([1], ["old"]), "users")
+        with swap_table("users") as shadow:
+            load_dataframe(_users([2], ["new"]), shadow)
+
+        assert execute_query("SELECT name FROM RAW.USERS")["NAME"].tolist() == ["new"]
+        tables = execute_query("SELECT table_name FROM information_schema.tables")
+        assert "USERS__SHADOW" not in tables["TABLE_NAME"].tolist()
+
+    def test_failed_load_keeps_live_table(self):
+        from ingestion.snowflake_loader import execute_query, load_dataframe, swap_table
+
+        load_dataframe(_users([1], ["old"]), "users")
+        with pytest.raises(RuntimeError):
+            with swap_table("users") as shadow:
+                load_dataframe(_users([2], ["new"]), shadow)
+                raise RuntimeError("extract failed")
+
+        assert execute_query("SELECT name FROM RAW.USERS")["NAME"].tolist() == ["old"]
+
+
+class TestStageAndWatermarks:
+    def test_stage_and_copy_loads_all_chunks(self):
+        from ingestion.snowflake_loader import execute_query, stage_and_copy
+
+        chunks = (_users([i], [str(i)]) for i in range(5))
+        assert stage_and_copy(chunks, "users") == 5
+        assert execute_query("SELECT COUNT(*) AS n FROM RAW.USERS")["N"][0] == 5
+
+    def test_watermark_round_trip(self):
+        from ingestion.snowflake_loader import get_watermark, save_watermark
+
+        assert get_watermark("railway.users") is None
+        save_watermark("railway.users", "2025-01-01T00:00:00")
+        save_watermark("railway.users", "2025-02-01T00:00:00")
+        assert get_watermark("railway.users") == "2025-02-01T00:00:00"
+
+
+class TestRegisterParquet:
+    def test_files_and_folders_become_raw_views(self, tmp_path):
+        from ingestion.duckdb_warehouse import register_parquet
+        from ingestion.snowflake_loader import execute_query
+
+        raw_dir = tmp_path / "raw"
+        (raw_dir / "receipts").mkdir(parents=True)
+        _users([1, 2], ["a", "b"]).to_parquet(raw_dir / "users.parquet")
+        _users([7], ["r"]).to_parquet(raw_dir / "receipts" / "part_0.parquet")
+
+        assert register_parquet(str(raw_dir)) == ["RECEIPTS", "USERS"]
+        assert execute_query("SELECT COUNT(*) AS n FROM RAW.USERS")["N"][0] == 2
+        assert execute_query("SELECT id FROM RAW.RECEIPTS")["ID"].tolist() == [7]
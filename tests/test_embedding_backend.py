@@ -0,0 +1,102 @@
+"""Tests for the ONNX embedding backend, against a tiny locally built model."""
+
+import numpy as np
+import pytest
+
+from master_data.embedding_backend import (
+    MIN_MEAN_COSINE,
+    MODEL_NAME,
+    OnnxEncoder,
+    cache_name,
+    compare_backends,
+    export_model,
+    load_model,
+)
+
+WORDS = (
+    "<pad> <unk> boni alpro lotus cote d or coca cola delhaize 365 bio "
+    "vandemoortele jupiler everyday zero light"
+).split()
+
+TEXTS = [
+    "boni",
+    "alpro bio",
+    "coca cola zero light",
+    "delhaize 365 bio everyday",
+    "vandemoortele",
+    "cote d or lotus jupiler boni alpro bio coca cola",
+    "jupiler",
+]
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A 2-layer BERT + mean pooling SentenceTransformer saved to disk."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers import models as st_models
+    from tokenizers import Tokenizer, normalizers, pre_tokenizers
+    from tokenizers.models import WordLevel
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+
+    root = tmp_path_factory.mktemp("tiny")
+    tokenizer = Tokenizer(WordLevel({w: i for i, w in enumerate(WORDS)}, unk_token="<unk>"))
+    tokenizer.normalizer = normalizers.Lowercase()
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, pad_token="<pad>", unk_token="<unk>",
+    ).save_pretrained(root / "hf")
+
+    torch.manual_seed(0)
+    BertModel(BertConfig(
+        vocab_size=len(WORDS), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=64,
+    )).save_pretrained(root / "hf")
+
+    transformer = st_models.Transformer(str(root / "hf"), max_seq_length=16)
+    SentenceTransformer(modules=[transformer, st_models.Pooling(32, "mean")]).save(
+        str(root / "st")
+    )
+    export_model(str(root / "onnx"), str(root / "st"))
+    return str(root / "st"), str(root / "onnx")
+
+
+class TestOnnxEncoder:
+    def test_agrees_with_torch(self, tiny_model):
+        from sentence_transformers import SentenceTransformer
+
+        st_path, onnx_dir = tiny_model
+        report = compare_backends(
+            TEXTS, SentenceTransformer(st_path, device="cpu"), OnnxEncoder(onnx_dir), batch_size=3,
+        )
+
+        assert report["texts"] == len(TEXTS)
+        assert report["mean_cosine"] >= MIN_MEAN_COSINE
+        assert report["torch_per_sec"] > 0 and report["onnx_per_sec"] > 0
+
+    def test_length_batching_keeps_input_order(self, tiny_model):
+        encoder = OnnxEncoder(tiny_model[1], batch_size=2)
+
+        batched = encoder.encode(TEXTS, normalize_embeddings=True)
+        one_by_one = np.vstack([encoder.encode([t], normalize_embeddings=True) for t in TEXTS])
+
+        assert batched.shape == (len(TEXTS), 32)
+        assert batched.dtype == np.float32
+        np.testing.assert_allclose(batched, one_by_one, atol=0.02)
+        np.testing.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, rtol=1e-5)
+
+    def test_long_texts_are_truncated(self, tiny_model):
+        encoder = OnnxEncoder(tiny_model[1])
+        assert encoder.encode(["boni " * 100]).shape == (1, 32)
+
+
+class TestLoadModel:
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError, match="EMBEDDING_BACKEND"):
+            load_model("tensorflow")
+
+    def test_backends_do_not_share_cache_entries(self):
+        assert cache_name("torch") == MODEL_NAME
+        assert cache_name("onnx") != MODEL_NAME
@@ -0,0 +1,91 @@
+"""Tests for the persistent embedding cache."""
+
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from master_data.embedding_cache import EmbeddingCache, encode_cached, normalize_text
+
+
+def _model(dim: int = 4):
+    """Mock encoder: a deterministic vector per string."""
+    model = MagicMock()
+
+    def encode(texts, normalize_embeddings=True, **kwargs):
+        return np.array([[len(t), sum(map(ord, t)) % 7, 1, 0][:dim] for t in texts], np.float32)
+
+    model.encode.side_effect = encode
+    return model
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    with patch("master_data.embedding_cache.EMBEDDING_CACHE_PATH", path), \
+            patch("master_data.embedding_cache._cache", None):
+        yield path
+
+
+class TestNormalizeText:
+    def test_nfkc_and_whitespace(self):
+        assert normalize_text("  Côte d'Or \t ") == "Côte d'Or"
+        assert normalize_text("ＡＬＰＲＯ") == "ALPRO"
+
+    def test_case_is_preserved(self):
+        assert normalize_text("Boni") != normalize_text("BONI")
+
+
+class TestEncodeCached:
+    def test_only_misses_are_encoded(self, cache_path):
+        model = _model()
+
+        first = encode_cached(model, ["Boni", "Alpro"], "m")
+        second = encode_cached(model, ["Alpro", " Boni ", "Lotus"], "m")
+
+        assert model.encode.call_args_list[0].args[0] == ["Boni", "Alpro"]
+        assert model.encode.call_args_list[1].args[0] == ["Lotus"]
+        np.testing.assert_array_equal(second[:2], first[::-1])
+
+    def test_duplicates_are_encoded_once_and_kept_in_order(self, cache_path):
+        model = _model()
+
+        result = encode_cached(model, ["Boni", "Lotus", "Boni"], "m")
+
+        assert model.encode.call_args.args[0] == ["Boni", "Lotus"]
+        np.testing.assert_array_equal(result[0], result[2])
+
+    def test_models_do_not_share_entries(self, cache_path):
+        model = _model()
+        encode_cached(model, ["Boni"], "model-a")
+        encode_cached(model, ["Boni"], "model-b")
+        assert model.encode.call_count == 2
+
+    def test_persists_across_processes(self, cache_path):
+        encode_cached(_model(), ["Boni"], "m")
+
+        with patch("master_data.embedding_cache._cache", None):
+            model = _model()
+            encode_cached(model, ["Boni"], "m")
+
+        model.encode.assert_not_called()
+
+    def test_disabled_cache_encodes_everything(self):
+        with patch("master_data.embedding_cache.EMBEDDING_CACHE_PATH", ""):
+            model = _model()
+            encode_cached(model, ["Boni", "Boni"], "m")
+        assert model.encode.call_args.args[0] == ["Boni", "Boni"]
+
+
+class TestEviction:
+    def test_least_recently_used_are_evicted(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "e.sqlite"), max_entries=2)
+        vector = np.ones((1, 4), np.float32)
+
+        cache.put_many("m", ["a"], vector)
+        cache.put_many("m", ["b"], vector)
+        cache.get_many("m", ["a"])  # "a" is now more recently used than "b"
+        cache.put_many("m", ["c"], vector)
+
+        assert len(cache) == 2
+        assert set(cache.get_many("m", ["a", "b", "c"])) == {"a", "c"}
@@ -0,0 +1,162 @@
+"""Tests for the on-disk HTTP response cache."""
+
+import asyncio
+import gzip
+import os
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from ingestion.http_cache import AsyncCachingTransport, CachingTransport, HttpCache
+
+
+class FakeServer:
+    """Mock transport serving a versioned body with an ETag."""
+
+    def __init__(self, etag: str | None = '"v1"'):
+        self.etag = etag
+        self.body = b'{"elements": [1, 2, 3]}'
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        if self.etag and request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304, headers={"ETag": self.etag})
+        headers = {"ETag": self.etag} if self.etag else {}
+        return httpx.Response(200, headers=headers, content=self.body)
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def _client(cache: HttpCache, server: FakeServer) -> httpx.Client:
+    return httpx.Client(transport=CachingTransport(cache, httpx.MockTransport(server)))
+
+
+class TestCachingTransport:
+    def test_fresh_entry_is_served_without_request(self, tmp_path, server):
+        cache = HttpCache(str(tmp_path), ttl_seconds=60)
+        with _client(cache, server) as client:
+            first = client.get("https://api.test/search", params={"page": 1})
+            second = client.get("https://api.test/search", params={"page": 1})
+
+        assert first.json() == second.json() == {"elements": [1, 2, 3]}
+        assert len(server.requests) == 1
+        assert second.extensions["from_cache"] is True
+        assert cache.stats["hit"] == 1 and cache.stats["miss"] == 1
+
+    def test_key_includes_params_and_body(self, tmp_path, server):
+        cache = HttpCache(str(tmp_path), ttl_seconds=60)
+        with _client(cache, server) as client:
+            client.get("https://api.test/search", params={"page": 1})
+            client.get("https://api.test/search", params={"page": 2})
+            client.post("https://api.test/interpreter", data={"data": "node(1);"})
+            client.post("https://api.test/interpreter", data={"data": "node(2);"})
+
+        assert len(server.requests) == 4
+
+    def test_stale_entry_is_revalidated_with_etag(self, tmp_path, server):
+        cache = HttpCache(str(tmp_path), ttl_seconds=0)
+        with _client(cache, server) as client:
+            client.get("https://api.test/search")
+            response = client.get("https://api.test/search")
+
+        assert server.requests[1].headers["If-None-Match"] == '"v1"'
+        assert response.status_code == 200
+        assert response.json() == {"elements": [1, 2, 3]}
+        assert cache.stats["revalidated"] == 1
+
+    def test_changed_resource_replaces_entry(self, tmp_path, server):
+        cache = HttpCache(str(tmp_path), ttl_seconds=0)
+        with _client(cache, server) as client:
+            client.get("https://api.test/search")
+            server.etag, server.body = '"v2"', b'{"elements": []}'
+            assert client.get("https://api.test/search").json() == {"elements": []}
+
+    def test_errors_are_not_stored(self, tmp_path, server):
+        cache = HttpCache(str(tmp_path), ttl_seconds=60)
+        with _client(cache, server) as client:
+            assert client.get("https://api.test/missing").status_code == 404
+            assert client.get("https://api.test/missing").status_code == 404
+
+        assert len(server.requests) == 2
+
+    def test_compressed_responses_are_stored_decoded(self, tmp_path):
+        def handler(request):
+            return httpx.Response(
+                200, headers={"Content-Encoding": "gzip"}, content=gzip.compress(b"hello")
+            )
+
+        cache = HttpCache(str(tmp_path), ttl_seconds=60)
+        transport = CachingTransport(cache, httpx.MockTransport(handler))
+        with httpx.Client(transport=transport) as client:
+            client.get("https://api.test/")
+            assert client.get("https://api.test/").text == "hello"
+
+
+class TestEviction:
+    def test_evicts_least_recently_used(self, tmp_path, server):
+        server.body = b"x" * 1000
+        cache = HttpCache(str(tmp_path), ttl_seconds=60, max_bytes=2500)
+
+        with _client(cache, server) as client:
+            client.get("https://api.test/a")
+            client.get("https://api.test/b")
+            # Make "a" the most recently used entry
+            a_meta = os.path.join(str(tmp_path), f"{cache.key(server.requests[0])}.json")
+            os.utime(a_meta, (time.time() + 10, time.time() + 10))
+            client.get("https://api.test/c")
+
+            client.get("https://api.test/a")
+            client.get("https://api.test/b")
+
+        assert cache.stats["evicted"] >= 1
+        assert [r.url.path for r in server.requests] == ["/a", "/b", "/c", "/b"]
+
+
+class TestAsyncCachingTransport:
+    def test_serves_repeated_requests_from_cache(self, tmp_path, server):
+        cache = HttpCache(str(tmp_path), ttl_seconds=60)
+
+        async def main():
+            transport = AsyncCachingTransport(cache, httpx.MockTransport(server))
+            async with httpx.AsyncClient(transport=transport) as client:
+                return [
+                    (await client.get("https://api.test/search", params={"page": 1})).json()
+                    for _ in range(3)
+                ]
+
+        assert asyncio.run(main()) == [{"elements": [1, 2, 3]}] * 3
+        assert len(server.requests) == 1
+
+
+class TestNoCache:
+    def test_no_cache_request_bypasses_fresh_entry(self, tmp_path, server):
+        cache = HttpCache(str(tmp_path), ttl_seconds=60)
+        with _client(cache, server) as client:
+            client.get("https://api.test/search")
+            server.etag, server.body = '"v2"', b'{"elements": []}'
+            refreshed = client.get("https://api.test/search", headers={"Cache-Control": "no-cache"})
+            cached = client.get("https://api.test/search")
+
+        assert len(server.requests) == 2
+        assert refreshed.json() == cached.json() == {"elements": []}
+
+
+class TestLogCacheStats:
+    def test_does_not_create_the_cache(self, tmp_path):
+        from ingestion import http_cache
+
+        cache_dir = tmp_path / "http"
+        with patch("ingestion.http_cache.HTTP_CACHE_DIR", str(cache_dir)), \
+                patch("ingestion.http_cache._cache", None):
+            http_cache.log_cache_stats()
+            assert http_cache._cache is None
+
+        assert not cache_dir.exists()
@@ -0,0 +1,245 @@
+"""Tests for the shared HTTP client layer."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from ingestion.http_client import (
+    AsyncInstrumentedTransport,
+    InstrumentedTransport,
+    RequestMetrics,
+    RetryableResponseError,
+    RetryPolicy,
+    asend,
+    build_client,
+    call_with_retries,
+    parse_host_limits,
+    send,
+)
+
+NO_WAIT = RetryPolicy(max_retries=2, backoff_seconds=0)
+
+
+def _responses(*responses):
+    """Mock transport answering successive requests from a list of responses."""
+    queue = list(responses)
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        item = queue.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    return httpx.MockTransport(handler), calls
+
+
+class TestSend:
+    def test_retries_retryable_status_then_succeeds(self):
+        transport, calls = _responses(httpx.Response(503), httpx.Response(200, text="ok"))
+        with httpx.Client(transport=transport) as client:
+            resp = send(client, "GET", "https://api.test/", policy=NO_WAIT)
+
+        assert resp.text == "ok"
+        assert "Cache-Control" not in calls[0].headers
+        assert calls[1].headers["Cache-Control"] == "no-cache"
+
+    def test_retries_transport_errors(self):
+        transport, calls = _responses(httpx.ConnectError("boom"), httpx.Response(200))
+        with httpx.Client(transport=transport) as client:
+            assert send(client, "GET", "https://api.test/", policy=NO_WAIT).status_code == 200
+        assert len(calls) == 2
+
+    def test_raises_status_error_when_retries_run_out(self):
+        transport, calls = _responses(*[httpx.Response(429)] * 3)
+        with httpx.Client(transport=transport) as client, pytest.raises(httpx.HTTPStatusError):
+            send(client, "GET", "https://api.test/", policy=NO_WAIT)
+        assert len(calls) == 3
+
+    def test_does_not_retry_client_errors(self):
+        transport, calls = _responses(httpx.Response(404))
+        with httpx.Client(transport=transport) as client:
+            assert send(client, "GET", "https://api.test/", policy=NO_WAIT).status_code == 404
+        assert len(calls) == 1
+
+    def test_check_rejects_unusable_responses(self):
+        def check(resp):
+            if resp.json().get("partial"):
+                raise RetryableResponseError("partial result")
+
+        transport, calls = _responses(*[httpx.Response(200, json={"partial": True})] * 3)
+        with httpx.Client(transport=transport) as client, \
+                pytest.raises(RetryableResponseError, match="partial"):
+            send(client, "GET", "https://api.test/", policy=NO_WAIT, check=check)
+        assert len(calls) == 3
+
+    def test_async_send_retries(self):
+        transport, calls = _responses(httpx.Response(502), httpx.Response(200, text="ok"))
+
+        async def main():
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await asend(client, "GET", "https://api.test/", policy=NO_WAIT)
+
+        assert asyncio.run(main()).text == "ok"
+        assert len(calls) == 2
+
+
+class TestRetryPolicy:
+    def test_delay_honours_retry_after(self):
+        assert RetryPolicy(backoff_seconds=0).delay(0, retry_after="7") == 7
+
+    def test_delay_grows_exponentially(self):
+        policy = RetryPolicy(backoff_seconds=1)
+        assert all(policy.delay(3) <= 8 for _ in range(50))
+
+
+class SdkError(Exception):
+    def __init__(self, status):
+        self.status = status
+
+
+class TestCallWithRetries:
+    def test_retries_retryable_status_then_succeeds(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            if len(calls) < 3:
+                raise SdkError(503)
+            return "ok"
+
+        assert call_with_retries(fn, NO_WAIT) == "ok"
+        assert len(calls) == 3
+
+    def test_raises_when_retries_run_out(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            raise SdkError(429)
+
+        with pytest.raises(SdkError):
+            call_with_retries(fn, NO_WAIT)
+        assert len(calls) == NO_WAIT.max_retries + 1
+
+    def test_does_not_retry_other_errors(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            raise SdkError(400)
+
+        with pytest.raises(SdkError):
+            call_with_retries(fn, NO_WAIT)
+        assert len(calls) == 1
+
+
+class TestMetrics:
+    def test_records_status_bytes_and_latency(self):
+        metrics = RequestMetrics()
+        transport = InstrumentedTransport(
+            httpx.MockTransport(lambda request: httpx.Response(200, content=b"x" * 100)),
+            metrics=metrics,
+        )
+        with httpx.Client(transport=transport) as client:
+            client.post("https://api.test/", content=b"query")
+            client.get("https://api.test/")
+
+        assert metrics.requests["api.test"] == 2
+        assert metrics.statuses["api.test"][200] == 2
+        assert metrics.bytes_received["api.test"] == 200
+        assert metrics.bytes_sent["api.test"] == 5
+        assert sum(metrics.latency_buckets["api.test"]) == 2
+
+    def test_records_failed_requests(self):
+        def handler(request):
+            raise httpx.ConnectError("down")
+
+        metrics = RequestMetrics()
+        transport = InstrumentedTransport(httpx.MockTransport(handler), metrics=metrics)
+        with httpx.Client(transport=transport) as client, pytest.raises(httpx.ConnectError):
+            client.get("https://api.test/")
+
+        assert metrics.errors["api.test"] == 1
+
+    def test_log_summary(self, caplog):
+        metrics = RequestMetrics()
+        metrics.record("api.test", 200, 0.3, 10, 2_000_000)
+        metrics.record("api.test", 504, 75, 10, 0)
+
+        with caplog.at_level("INFO", logger="ingestion.http_client"):
+            metrics.log_summary()
+
+        assert "2 requests (200x1, 504x1)" in caplog.text
+        assert "<=0.5s:1 >60s:1" in caplog.text
+
+
+class TestHostLimits:
+    def test_parse_host_limits(self):
+        assert parse_host_limits("overpass-api.de=2, example.org=5,") == {
+            "overpass-api.de": 2, "example.org": 5,
+        }
+        assert parse_host_limits("") == {}
+
+    def test_limits_concurrent_requests_per_host(self):
+        active = {"limited.test": 0, "free.test": 0}
+        peak = dict(active)
+        lock = threading.Lock()
+
+        def handler(request):
+            host = request.url.host
+            with lock:
+                active[host] += 1
+                peak[host] = max(peak[host], active[host])
+            time.sleep(0.02)
+            with lock:
+                active[host] -= 1
+            return httpx.Response(200)
+
+        transport = InstrumentedTransport(
+            httpx.MockTransport(handler), {"limited.test": 2}, metrics=RequestMetrics(),
+        )
+        with httpx.Client(transport=transport) as client, ThreadPoolExecutor(8) as pool:
+            urls = ["https://limited.test/", "https://free.test/"] * 8
+            list(pool.map(client.get, urls))
+
+        assert peak["limited.test"] <= 2
+        assert peak["free.test"] > 2
+
+    def test_async_limits_concurrent_requests_per_host(self):
+        active = peak = 0
+
+        async def handler(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return httpx.Response(200)
+
+        async def main():
+            transport = AsyncInstrumentedTransport(
+                httpx.MockTransport(handler), {"limited.test": 3}, metrics=RequestMetrics(),
+            )
+            async with httpx.AsyncClient(transport=transport) as client:
+                await asyncio.gather(*(client.get("https://limited.test/") for _ in range(10)))
+
+        asyncio.run(main())
+        assert peak == 3
+
+
+class TestBuildClient:
+    @patch("ingestion.http_cache.HTTP_CACHE_DIR", "")
+    @patch("ingestion.http_client.HTTP2_ENABLED", True)
+    def test_http2_falls_back_without_h2(self):
+        with patch.dict("sys.modules", {"h2": None}), \
+                patch("ingestion.http_client.httpx.HTTPTransport") as mock_transport:
+            build_client().close()
+
+        assert mock_transport.call_args.kwargs["http2"] is False
@@ -0,0 +1,133 @@
+"""Tests for the lexical brand matching tiers."""
+
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from master_data.lexical_matcher import LexicalMatcher, normalize_key
+
+MASTER_CSV = """master_brand,manufacturer,retailer_owner,is_private_label,embedding_string
+Côte d'Or,Mondelez,,FALSE,côte d'or
+Coca-Cola,The Coca-Cola Company,,FALSE,coca-cola
+Boni,,Colruyt Group,TRUE,boni
+Vandemoortele,Vandemoortele,,FALSE,vandemoortele
+"""
+
+ALIASES_CSV = """master_brand,alias_string
+Vandemoortele,vdm
+Coca-Cola,coca cola
+"""
+
+
+@pytest.fixture
+def lexical(tmp_path) -> LexicalMatcher:
+    master = tmp_path / "seed_brand_master.csv"
+    aliases = tmp_path / "seed_brand_aliases.csv"
+    master.write_text(MASTER_CSV)
+    aliases.write_text(ALIASES_CSV)
+    return LexicalMatcher.from_seeds(str(master), str(aliases), threshold=0.7)
+
+
+@pytest.fixture(autouse=True)
+def no_embedding_cache():
+    with patch("master_data.embedding_cache.EMBEDDING_CACHE_PATH", ""):
+        yield
+
+
+class TestNormalizeKey:
+    def test_case_accents_and_punctuation(self):
+        assert normalize_key("CÔTE D'OR") == normalize_key("cote dor") == "cotedor"
+        assert normalize_key("Coca-Cola") == "cocacola"
+        assert normalize_key(" -- ") == ""
+
+
+class TestLexicalMatcher:
+    def test_exact_key_match_returns_master_metadata(self, lexical):
+        hit = lexical.match("COTE D'OR")
+
+        assert (hit.tier, hit.score) == ("exact", 1.0)
+        assert hit.metadata["brand_name"] == "Côte d'Or"
+        assert hit.metadata["manufacturer"] == "Mondelez"
+
+    def test_alias_match(self, lexical):
+        hit = lexical.match("VDM")
+        assert hit.tier == "exact"
+        assert hit.metadata["brand_name"] == "Vandemoortele"
+
+    def test_private_label_flag_is_parsed(self, lexical):
+        metadata = lexical.match("boni").metadata
+        assert metadata["is_private_label"] is True
+        assert metadata["retailer_owner"] == "Colruyt Group"
+
+    def test_trigram_match_for_typos(self, lexical):
+        hit = lexical.match("vandemortele")
+        assert hit.tier == "trigram"
+        assert hit.metadata["brand_name"] == "Vandemoortele"
+        assert 0.7 <= hit.score < 1
+
+    def test_dissimilar_strings_fall_through(self, lexical):
+        assert lexical.match("Bonne Maman") is None
+        assert lexical.match("Coca-Cola Zero Sugar") is None
+        assert lexical.match("!!") is None
+
+
+class TestMatchBrandsCascade:
+    @staticmethod
+    def _embedding(scores: dict[str, tuple[str, float]]):
+        """Model + index where each brand string's best match is given by ``scores``."""
+        texts = list(scores)
+        model = MagicMock()
+        model.encode.side_effect = lambda batch, **kwargs: np.array(
+            [[texts.index(t)] for t in batch], dtype=np.float32,
+        )
+        index = MagicMock()
+
+        def query(vector, **kwargs):
+            brand, score = scores[texts[int(vector[0])]]
+            return MagicMock(matches=[MagicMock(score=score, metadata={"brand_name": brand})])
+
+        index.query.side_effect = query
+        return model, index
+
+    def test_exact_hits_skip_embeddings(self, lexical):
+        from master_data.brand_matcher import match_brands_cascade
+
+        model, index = self._embedding({
+            "Bonne Maman": ("Bonne Maman", 0.97),
+            "vandemortele": ("Vandemoortele", 0.5),
+        })
+
+        result = match_brands_cascade(
+            ["cote dor", "Bonne Maman", "vandemortele"], lexical,
+            load_model=lambda: model, load_index=lambda: index,
+        )
+
+        assert model.encode.call_args.args[0] == ["Bonne Maman", "vandemortele"]
+        assert result["input_brand"].tolist() == ["cote dor", "Bonne Maman", "vandemortele"]
+        assert result["match_method"].tolist() == ["exact", "embedding", "trigram"]
+        assert result["matched_brand"].tolist() == ["Côte d'Or", "Bonne Maman", "Vandemoortele"]
+        assert result["is_confident"].tolist() == [True, True, False]
+
+    def test_trigram_hit_is_replaced_by_confident_embedding_match(self, lexical):
+        from master_data.brand_matcher import match_brands_cascade
+
+        model, index = self._embedding({"vandemortele": ("Vandemoortele", 0.96)})
+
+        result = match_brands_cascade(
+            ["vandemortele"], lexical, load_model=lambda: model, load_index=lambda: index,
+        )
+
+        row = result.iloc[0]
+        assert (row["match_method"], row["similarity"], bool(row["is_confident"])) == (
+            "embedding", 0.96, True,
+        )
+
+    def test_model_is_not_loaded_when_all_match_exactly(self, lexical):
+        from master_data.brand_matcher import match_brands_cascade
+
+        load_model = MagicMock()
+        result = match_brands_cascade(["Boni", "coca cola"], lexical, load_model, MagicMock())
+
+        load_model.assert_not_called()
+        assert result["match_method"].tolist() == ["exact", "exact"]
@@ -0,0 +1,178 @@
+"""
+Benchmark the two Snowflake bulk-load paths against a local stand-in.
+
+The stand-in connection accepts the statements both paths issue (PUT/_upload,
+INFER_SCHEMA, COPY INTO) and keeps staged files on local disk, so we can compare
+upload bytes and client-side time without a Snowflake account.
+"""
+
+import glob
+import os
+import re
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+NUM_ROWS = 200_000
+
+
+class LocalStage:
+    """Records every file uploaded to the stand-in stage."""
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix="stand_in_stage_")
+        self.files: list[str] = []
+
+    @property
+    def uploaded_bytes(self) -> int:
+        return sum(os.path.getsize(f) for f in self.files)
+
+    def put(self, local_pattern: str):
+        for path in sorted(glob.glob(local_pattern)):
+            target = os.path.join(self.directory, f"{len(self.files):05d}_{os.path.basename(path)}")
+            shutil.copyfile(path, target)
+            self.files.append(target)
+
+    def copy_results(self) -> list[tuple]:
+        return [
+            (f, "LOADED", n, n) for f in self.files
+            for n in [pq.ParquetFile(f).metadata.num_rows]
+        ]
+
+    def column_types(self) -> list[tuple]:
+        schema = pq.ParquetFile(self.files[0]).schema_arrow
+        return [(name, "VARCHAR") for name in schema.names]
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class StandInCursor:
+    def __init__(self, stage: LocalStage):
+        self.stage = stage
+        self._results: list[tuple] = []
+
+    def execute(self, sql, *args, **kwargs):
+        put = re.match(r"\s*PUT 'file://(.+?)'", sql)
+        if put:
+            self.stage.put(put.group(1))
+        elif "infer_schema" in sql.lower() and "COLUMN_NAME" in sql:
+            self._results = self.stage.column_types()
+        elif "COPY INTO" in sql:
+            self._results = self.stage.copy_results()
+        else:
+            self._results = []
+        return self
+
+    def _upload(self, local_file_name, stage_location, options):
+        self.stage.put(local_file_name.strip("'").removeprefix("file://"))
+
+    def fetchall(self):
+        return self._results
+
+    def _log_telemetry_job_data(self, *args):
+        pass
+
+    def close(self):
+        pass
+
+
+class StandInConnection:
+    _session_parameters: dict = {}
+
+    def __init__(self, stage: LocalStage):
+        self.stage = stage
+
+    def cursor(self):
+        return StandInCursor(self.stage)
+
+    def is_closed(self):
+        return False
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope="module")
+def transactions_df() -> pd.DataFrame:
+    """Synthetic data shaped like RAW.TRANSACTIONS (22 columns)."""
+    rng = np.random.default_rng(42)
+    stores = np.array(["Colruyt", "Delhaize", "Lidl", "Aldi", "Carrefour", "Spar"])
+    brands = np.array([f"Brand {i}" for i in range(500)])
+    categories = np.array([f"Category {i}" for i in range(120)])
+    dates = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, NUM_ROWS), unit="D")
+
+    return pd.DataFrame({
+        "id": np.arange(NUM_ROWS),
+        "user_id": rng.integers(1, 5_000, NUM_ROWS),
+        "receipt_id": rng.integers(1, 80_000, NUM_ROWS),
+        "store_name": rng.choice(stores, NUM_ROWS),
+        "item_name": rng.choice(brands, NUM_ROWS),
+        "item_price": rng.uniform(0.5, 40, NUM_ROWS).round(2),
+        "quantity": rng.integers(1, 6, NUM_ROWS),
+        "unit_price": rng.uniform(0.5, 20, NUM_ROWS).round(2),
+        "normalized_name": rng.choice(brands, NUM_ROWS),
+        "normalized_brand": rng.choice(brands, NUM_ROWS),
+        "is_premium": rng.random(NUM_ROWS) < 0.1,
+        "is_discount": rng.random(NUM_ROWS) < 0.2,
+        "is_deposit": rng.random(NUM_ROWS) < 0.05,
+        "granular_category": rng.choice(categories, NUM_ROWS),
+        "category": rng.choice(categories[:20], NUM_ROWS),
+        "health_score": rng.integers(0, 6, NUM_ROWS),
+        "unit_of_measure": rng.choice(np.array(["kg", "l", "piece"]), NUM_ROWS),
+        "weight_or_volume": rng.uniform(0.1, 2, NUM_ROWS).round(3),
+        "price_per_unit_measure": rng.uniform(0.5, 50, NUM_ROWS).round(2),
+        "date": dates,
+        "created_at": dates,
+        "updated_at": dates,
+    })
+
+
+def _timed_load(df: pd.DataFrame, method: str) -> tuple[int, int, float]:
+    from ingestion.snowflake_loader import ConnectionPool, load_dataframe
+
+    stage = LocalStage()
+    try:
+        pool = ConnectionPool(max_size=1)
+        with patch("ingestion.snowflake_loader.get_pool", return_value=pool), \
+                patch("ingestion.snowflake_loader.get_connection",
+                      return_value=StandInConnection(stage)):
+            start = time.perf_counter()
+            rows = load_dataframe(df.copy(), "transactions", method=method)
+            elapsed = time.perf_counter() - start
+        return rows, stage.uploaded_bytes, elapsed
+    finally:
+        stage.cleanup()
+
+
+class TestLoadPathBenchmark:
+    """Compare write_pandas against the compressed Parquet stage path."""
+
+    def test_parquet_stage_uploads_fewer_bytes(self, transactions_df):
+        old_rows, old_bytes, old_seconds = _timed_load(transactions_df, "write_pandas")
+        new_rows, new_bytes, new_seconds = _timed_load(transactions_df, "parquet_stage")
+
+        print(
+            f"\nwrite_pandas:  {old_rows} rows, {old_bytes / 1e6:.2f} MB, {old_seconds:.2f}s"
+            f"\nparquet_stage: {new_rows} rows, {new_bytes / 1e6:.2f} MB, {new_seconds:.2f}s"
+        )
+
+        assert old_rows == new_rows == NUM_ROWS
+        assert new_bytes < old_bytes
+
+    def test_parquet_stage_splits_large_loads(self, transactions_df):
+        from ingestion.snowflake_loader import write_parquet_files
+
+        chunks = [transactions_df.iloc[i:i + 20_000].copy() for i in range(0, NUM_ROWS, 20_000)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files, rows = write_parquet_files(chunks, tmp_dir, target_bytes=256 * 1024)
+
+            assert rows == NUM_ROWS
+            assert len(files) > 1
+            assert sum(pq.ParquetFile(f).metadata.num_rows for f in files) == NUM_ROWS
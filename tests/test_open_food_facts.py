@@ -0,0 +1,384 @@
+"""Tests for the Open Food Facts ingestion module."""
+
+import asyncio
+import gzip
+import json
+from unittest.mock import call, patch
+
+import httpx
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_http_cache():
+    """Talk to the mock transport directly, not through the on-disk cache."""
+    with patch("ingestion.http_cache.HTTP_CACHE_DIR", ""):
+        yield
+
+
+def _product(page: int, i: int) -> dict:
+    return {
+        "code": f"54{page:03d}{i:05d}",
+        "product_name": f"Product {page}-{i}",
+        "brands": "Boni, Colruyt" if i % 2 else "Delhaize",
+        "categories_tags": ["en:snacks", "en:chips"] if i % 3 else [],
+    }
+
+
+def _off_transport(num_pages: int, page_size: int = 3, failures: dict | None = None):
+    """Mock OFF search API: ``num_pages`` full pages, then empty pages."""
+    failures = dict(failures or {})
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params["page"])
+        requested.append(page)
+        if failures.get(page):
+            failures[page] -= 1
+            return httpx.Response(429)
+        products = [_product(page, i) for i in range(page_size)] if page <= num_pages else []
+        return httpx.Response(200, json={"products": products})
+
+    return httpx.MockTransport(handler), requested
+
+
+def _fetch(transport, max_pages=10, concurrency=4, **kwargs) -> list[dict]:
+    from ingestion.open_food_facts import fetch_products_async
+
+    return asyncio.run(fetch_products_async(
+        max_pages, concurrency=concurrency, rate_per_minute=60_000,
+        transport=transport, backoff_seconds=0, **kwargs,
+    ))
+
+
+class TestFetchProductsAsync:
+    def test_returns_products_in_page_order(self):
+        transport, _ = _off_transport(num_pages=5)
+        products = _fetch(transport)
+
+        expected = [_product(p, i) for p in range(1, 6) for i in range(3)]
+        assert products == expected
+
+    def test_stops_requesting_after_empty_page(self):
+        transport, requested = _off_transport(num_pages=2)
+        products = _fetch(transport, max_pages=50, concurrency=3)
+
+        assert len(products) == 6
+        # Only pages already in flight when page 3 came back empty are requested
+        assert max(requested) <= 3 + 3
+
+    def test_respects_max_pages(self):
+        transport, requested = _off_transport(num_pages=20)
+        products = _fetch(transport, max_pages=4)
+
+        assert len(products) == 12
+        assert sorted(requested) == [1, 2, 3, 4]
+
+    def test_retries_rate_limited_pages(self):
+        transport, requested = _off_transport(num_pages=2, failures={1: 2})
+        products = _fetch(transport)
+
+        assert len(products) == 6
+        assert requested.count(1) == 3
+
+    def test_gives_up_after_max_retries(self):
+        from ingestion.open_food_facts import fetch_page
+
+        transport, requested = _off_transport(num_pages=1, failures={1: 10})
+
+        async def main():
+            async with httpx.AsyncClient(transport=transport) as client:
+                await fetch_page(client, 1, max_retries=2, backoff_seconds=0)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(main())
+        assert requested == [1, 1, 1]
+
+
+class TestTokenBucket:
+    def test_limits_request_rate(self):
+        from ingestion.open_food_facts import TokenBucket
+
+        async def main():
+            bucket = TokenBucket(rate=50, capacity=1)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            for _ in range(6):
+                await bucket.acquire()
+            return loop.time() - start
+
+        # First token is free, the next five arrive at 50/s
+        assert asyncio.run(main()) >= 0.09
+
+    def test_first_minute_stays_within_off_search_limit(self):
+        from ingestion.open_food_facts import fetch_products_async
+
+        clock = [0.0]
+        sent = []
+        real_sleep = asyncio.sleep
+
+        async def fake_sleep(seconds):
+            clock[0] += seconds
+            await real_sleep(0)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            sent.append(clock[0])
+            return httpx.Response(200, json={"products": [_product(1, 0)]})
+
+        with patch("ingestion.http_client.time.monotonic", lambda: clock[0]), \
+                patch("ingestion.http_client.asyncio.sleep", fake_sleep):
+            asyncio.run(fetch_products_async(
+                30, concurrency=4, rate_per_minute=10,
+                transport=httpx.MockTransport(handler), backoff_seconds=0,
+            ))
+
+        assert len(sent) == 30
+        assert sum(t < 60 for t in sent) == 10
+
+
+class TestFetchBelgianProducts:
+    def test_matches_sequential_dataframe(self):
+        from ingestion import open_food_facts
+
+        transport, _ = _off_transport(num_pages=4)
+        real_bucket = open_food_facts.TokenBucket
+
+        with patch("ingestion.open_food_facts.httpx.AsyncHTTPTransport", return_value=transport), \
+                patch("ingestion.open_food_facts.TokenBucket",
+                      side_effect=lambda rate, capacity: real_bucket(1000, capacity)):
+            df = open_food_facts.fetch_belgian_products(max_pages=10)
+
+        expected = pd.DataFrame([_product(p, i) for p in range(1, 5) for i in range(3)])
+        expected["primary_brand"] = expected["brands"].str.split(",").str[0].str.strip()
+        expected["primary_category"] = expected["categories_tags"].apply(
+            lambda x: x[0].replace("en:", "") if x else ""
+        )
+        pd.testing.assert_frame_equal(df, expected)
+
+
+DUMP_PRODUCTS = [
+    {"code": "5410000000001", "product_name": "Frites", "brands": "Boni,Colruyt",
+     "categories_tags": ["en:snacks"], "countries_tags": ["en:belgium", "en:france"],
+     "nova_group": 3, "ingredients_text": "potatoes"},
+    {"code": "3000000000002", "product_name": "Baguette", "brands": "Carrefour",
+     "categories_tags": ["en:breads"], "countries_tags": ["en:france"]},
+    {"code": "5410000000003", "product_name": "Speculoos", "brands": None,
+     "categories_tags": [], "countries_tags": ["en:belgium"]},
+    # Mentions Belgium, but isn't sold there
+    {"code": "8000000000004", "product_name": "Belgian-style waffles (en:belgium recipe)",
+     "brands": "Lotus", "categories_tags": [], "countries_tags": ["en:italy"]},
+]
+
+
+@pytest.fixture
+def jsonl_dump(tmp_path):
+    path = tmp_path / "openfoodfacts-products.jsonl.gz"
+    with gzip.open(path, "wt") as f:
+        for product in DUMP_PRODUCTS:
+            f.write(json.dumps(product) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def csv_dump(tmp_path):
+    columns = ["code", "product_name", "brands", "categories_tags", "countries_tags",
+               "nova_group", "ingredients_text"]
+    path = tmp_path / "en.openfoodfacts.org.products.csv.gz"
+    with gzip.open(path, "wt") as f:
+        f.write("\t".join(columns) + "\n")
+        for product in DUMP_PRODUCTS:
+            values = [
+                ",".join(v) if isinstance(v, list) else "" if v is None else str(v)
+                for v in (product.get(c) for c in columns)
+            ]
+            f.write("\t".join(values) + "\n")
+    return str(path)
+
+
+class TestDumpStreaming:
+    @pytest.mark.parametrize("dump", ["jsonl_dump", "csv_dump"])
+    def test_keeps_belgian_products_projected_to_off_fields(self, dump, request):
+        from ingestion.open_food_facts import OFF_FIELDS, iter_dump_products
+
+        products = list(iter_dump_products(request.getfixturevalue(dump)))
+
+        assert [p["code"] for p in products] == ["5410000000001", "5410000000003"]
+        assert all(list(p) == OFF_FIELDS for p in products)
+        assert products[0]["categories_tags"] == ["en:snacks"]
+
+    @pytest.mark.parametrize("dump", ["jsonl_dump", "csv_dump"])
+    def test_chunks_share_raw_columns(self, dump, request):
+        from ingestion.open_food_facts import RAW_COLUMNS, iter_dump_chunks
+
+        chunks = list(iter_dump_chunks(request.getfixturevalue(dump), chunk_size=1))
+
+        assert len(chunks) == 2
+        assert list(chunks[0].columns) == list(RAW_COLUMNS.values())
+        assert (chunks[0].dtypes == chunks[1].dtypes).all()
+        assert chunks[0]["primary_brand"][0] == "Boni"
+        assert chunks[0]["off_category"][0] == "snacks"
+        assert chunks[0]["nova_group"][0] == 3
+
+    @patch("ingestion.open_food_facts.save_watermark")
+    @patch("ingestion.open_food_facts.SNOWFLAKE_LOAD_METHOD", "write_pandas")
+    @patch("ingestion.open_food_facts.load_dataframe")
+    @patch("ingestion.open_food_facts.swap_table")
+    def test_load_dump_swaps_in_all_chunks(self, mock_swap, mock_load, mock_save, jsonl_dump):
+        from ingestion.open_food_facts import load_dump
+
+        mock_swap.return_value.__enter__.return_value = "OFF_PRODUCTS__SHADOW"
+        mock_load.side_effect = lambda df, table_name: len(df)
+
+        assert load_dump(jsonl_dump, chunk_size=1) == 2
+        mock_swap.assert_called_once_with("off_products")
+        assert {c.kwargs["table_name"] for c in mock_load.call_args_list} \
+            == {"OFF_PRODUCTS__SHADOW"}
+        mock_save.assert_any_call("off.products.load_method", "dump")
+
+
+def _modified_transport(timestamps: list[int], page_size: int = 3):
+    """Mock search API returning products sorted newest first by last_modified_t."""
+    requested = []
+    ordered = sorted(timestamps, reverse=True)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["sort_by"] == "last_modified_t"
+        page = int(request.url.params["page"])
+        requested.append(page)
+        batch = ordered[(page - 1) * page_size:page * page_size]
+        products = [
+            {"code": f"code-{t}", "brands": "Boni", "last_modified_t": t} for t in batch
+        ]
+        return httpx.Response(200, json={"products": products})
+
+    return httpx.MockTransport(handler), requested
+
+
+class TestIncrementalSync:
+    def test_fetches_only_products_modified_since(self):
+        from ingestion import open_food_facts
+
+        transport, requested = _modified_transport(list(range(100, 130)))
+        real_bucket = open_food_facts.TokenBucket
+
+        with patch("ingestion.open_food_facts.httpx.AsyncHTTPTransport", return_value=transport), \
+                patch("ingestion.open_food_facts.TokenBucket",
+                      side_effect=lambda rate, capacity: real_bucket(1000, capacity)):
+            df = open_food_facts.fetch_changed_products(since=124, max_pages=10)
+
+        assert df["last_modified_t"].tolist() == [129, 128, 127, 126, 125]
+        # Page 2 (126..124) reaches synced products; only pages already in flight follow it
+        assert sorted(requested)[:2] == [1, 2]
+        assert max(requested) < 10
+
+    def test_page_cap_before_reaching_since_is_incomplete(self):
+        from ingestion import open_food_facts
+
+        transport, _ = _modified_transport(list(range(100, 130)))
+        real_bucket = open_food_facts.TokenBucket
+
+        with patch("ingestion.open_food_facts.httpx.AsyncHTTPTransport", return_value=transport), \
+                patch("ingestion.open_food_facts.TokenBucket",
+                      side_effect=lambda rate, capacity: real_bucket(1000, capacity)), \
+                patch("ingestion.open_food_facts.OFF_PAGE_SIZE", 3), \
+                pytest.raises(open_food_facts.IncompleteSyncError) as excinfo:
+            # 2 pages reach back to 124; changes down to 111 would be skipped
+            open_food_facts.fetch_changed_products(since=110, max_pages=2)
+
+        assert excinfo.value.products["last_modified_t"].tolist() == list(range(129, 123, -1))
+
+    @patch("ingestion.open_food_facts.save_watermark")
+    @patch("ingestion.open_food_facts.load_dataframe", return_value=1)
+    @patch("ingestion.open_food_facts.merge_dataframe")
+    @patch("ingestion.open_food_facts.fetch_belgian_products")
+    @patch("ingestion.open_food_facts.fetch_changed_products")
+    @patch("ingestion.open_food_facts.get_watermark")
+    def test_run_falls_back_to_full_load_when_page_cap_is_hit(
+        self, mock_get, mock_changed, mock_full, mock_merge, mock_load, mock_save,
+    ):
+        from ingestion.open_food_facts import (
+            LOAD_METHOD_SOURCE,
+            SYNC_SOURCE,
+            IncompleteSyncError,
+            run,
+        )
+
+        mock_get.side_effect = {SYNC_SOURCE: "1700000000", LOAD_METHOD_SOURCE: "api"}.get
+        mock_changed.side_effect = IncompleteSyncError("too many changes", pd.DataFrame())
+        mock_full.return_value = pd.DataFrame({"code": ["1"], "last_modified_t": [1700009999]})
+
+        run(incremental=True)
+
+        mock_merge.assert_not_called()
+        assert mock_load.call_args.kwargs["overwrite"] is True
+        assert mock_save.call_args_list == [
+            call(SYNC_SOURCE, "1700009999"), call(LOAD_METHOD_SOURCE, "api"),
+        ]
+
+    @pytest.mark.parametrize("load_method", ["dump", None])
+    @patch("ingestion.open_food_facts.save_watermark")
+    @patch("ingestion.open_food_facts.load_dataframe")
+    @patch("ingestion.open_food_facts.merge_dataframe", return_value=1)
+    @patch("ingestion.open_food_facts.fetch_belgian_products")
+    @patch("ingestion.open_food_facts.fetch_changed_products")
+    @patch("ingestion.open_food_facts.get_watermark")
+    def test_page_cap_after_dump_load_merges_and_raises(
+        self, mock_get, mock_changed, mock_full, mock_merge, mock_load, mock_save, load_method,
+    ):
+        from ingestion.open_food_facts import (
+            LOAD_METHOD_SOURCE,
+            SYNC_SOURCE,
+            IncompleteSyncError,
+            run,
+        )
+
+        mock_get.side_effect = {SYNC_SOURCE: "1700000000", LOAD_METHOD_SOURCE: load_method}.get
+        fetched = pd.DataFrame({"code": ["1"], "brands": ["Boni"], "last_modified_t": [1700009999]})
+        mock_changed.side_effect = IncompleteSyncError("too many changes", fetched)
+
+        with pytest.raises(IncompleteSyncError):
+            run(incremental=True)
+
+        # The dump-loaded catalog is not swapped for a capped API load
+        mock_full.assert_not_called()
+        mock_load.assert_not_called()
+        assert list(mock_merge.call_args.args[0]["barcode"]) == ["1"]
+        mock_save.assert_not_called()
+
+    @patch("ingestion.open_food_facts.save_watermark")
+    @patch("ingestion.open_food_facts.merge_dataframe", return_value=2)
+    @patch("ingestion.open_food_facts.fetch_changed_products")
+    @patch("ingestion.open_food_facts.get_watermark", return_value="1700000000")
+    def test_run_merges_on_barcode_and_saves_state(
+        self, mock_get, mock_fetch, mock_merge, mock_save,
+    ):
+        from ingestion.open_food_facts import SYNC_SOURCE, run
+
+        mock_fetch.return_value = pd.DataFrame({
+            "code": ["1", "2"],
+            "brands": ["Boni", "Lotus"],
+            "last_modified_t": [1700000500, 1700000100],
+        })
+
+        run(incremental=True)
+
+        assert mock_fetch.call_args.args[0] == 1700000000
+        merged = mock_merge.call_args
+        assert merged.kwargs["key_column"] == "barcode"
+        assert list(merged.args[0]["barcode"]) == ["1", "2"]
+        mock_save.assert_called_once_with(SYNC_SOURCE, "1700000500")
+
+    @patch("ingestion.open_food_facts.save_watermark")
+    @patch("ingestion.open_food_facts.load_dataframe", return_value=1)
+    @patch("ingestion.open_food_facts.fetch_belgian_products")
+    @patch("ingestion.open_food_facts.get_watermark", return_value=None)
+    def test_run_without_state_does_full_load(self, mock_get, mock_fetch, mock_load, mock_save):
+        from ingestion.open_food_facts import SYNC_SOURCE, run
+
+        mock_fetch.return_value = pd.DataFrame({"code": ["1"], "last_modified_t": [42]})
+
+        run(incremental=True)
+
+        assert mock_load.call_args.kwargs["overwrite"] is True
+        mock_save.assert_any_call(SYNC_SOURCE, "42")
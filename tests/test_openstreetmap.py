@@ -0,0 +1,111 @@
+"""Tests for the OpenStreetMap store extraction."""
+
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_http_cache():
+    """Talk to the mock transport directly, not through the on-disk cache."""
+    with patch("ingestion.http_cache.HTTP_CACHE_DIR", ""):
+        yield
+
+
+def _node(osm_id, name="Colruyt"):
+    return {"type": "node", "id": osm_id, "lat": 50.8, "lon": 4.3, "tags": {"name": name}}
+
+
+def _way(osm_id, name="Lidl"):
+    return {"type": "way", "id": osm_id, "center": {"lat": 51.0, "lon": 3.7}, "tags": {"name": name}}
+
+
+def _overpass(responses):
+    """Mock transport answering successive POSTs from a list of responses."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return responses.pop(0)
+
+    return httpx.MockTransport(handler), calls
+
+
+class TestSharding:
+    def test_split_bbox_covers_original(self):
+        from ingestion.openstreetmap import split_bbox
+
+        cells = split_bbox("49.5,2.5,51.5,6.5", 2, 2)
+
+        assert cells == [
+            "49.5,2.5,50.5,4.5",
+            "49.5,4.5,50.5,6.5",
+            "50.5,2.5,51.5,4.5",
+            "50.5,4.5,51.5,6.5",
+        ]
+
+    def test_shards_cover_every_chain_in_every_cell(self):
+        from ingestion.openstreetmap import build_shards
+
+        chains = [f"Chain {i}" for i in range(5)]
+        shards = build_shards(chains, "49.5,2.5,51.5,6.5", grid="2x3", chains_per_shard=2)
+
+        assert len(shards) == 6 * 3
+        for chain in chains:
+            assert sum(f'"name"="{chain}"' in query for _, query in shards) == 6
+
+
+class TestFetchShard:
+    @patch("ingestion.openstreetmap.time.sleep")
+    def test_retries_timed_out_query(self, mock_sleep):
+        from ingestion.openstreetmap import fetch_shard
+
+        transport, calls = _overpass([
+            httpx.Response(200, json={"elements": [_node(1)], "remark": "runtime error: Query timed out"}),
+            httpx.Response(429),
+            httpx.Response(200, json={"elements": [_node(1), _node(2)]}),
+        ])
+        with httpx.Client(transport=transport) as client:
+            elements = fetch_shard(client, "cell 1", "[out:json];")
+
+        assert [el["id"] for el in elements] == [1, 2]
+        assert len(calls) == 3
+        assert calls[1].headers["Cache-Control"] == "no-cache"
+
+    @patch("ingestion.openstreetmap.time.sleep")
+    def test_raises_after_max_retries(self, mock_sleep):
+        from ingestion.openstreetmap import OverpassError, fetch_shard
+
+        transport, _ = _overpass([httpx.Response(504)] * 3)
+        with httpx.Client(transport=transport) as client, pytest.raises(OverpassError):
+            fetch_shard(client, "cell 1", "[out:json];", max_retries=2)
+
+
+class TestFetchElements:
+    def test_dedupes_elements_across_shards(self):
+        from ingestion.openstreetmap import fetch_elements, parse_elements
+
+        transport, _ = _overpass([
+            httpx.Response(200, json={"elements": [_node(1), _way(7)]}),
+            httpx.Response(200, json={"elements": [_way(7), _node(2)]}),
+        ])
+        client = httpx.Client(transport=transport)
+        with patch("ingestion.openstreetmap.get_client", return_value=client):
+            elements = fetch_elements([("a", "q1"), ("b", "q2")], workers=1)
+
+        df = parse_elements(elements)
+        assert list(zip(df["osm_type"], df["osm_id"])) == [("node", 1), ("node", 2), ("way", 7)]
+        assert df.loc[df["osm_type"] == "way", "lat"].item() == 51.0
+
+    @patch("ingestion.openstreetmap.time.sleep")
+    def test_failed_shard_fails_the_refresh(self, mock_sleep):
+        from ingestion.openstreetmap import OverpassError, fetch_elements
+
+        transport, _ = _overpass(
+            [httpx.Response(200, json={"elements": [_node(1)]})] + [httpx.Response(504)] * 10
+        )
+        client = httpx.Client(transport=transport)
+        with patch("ingestion.openstreetmap.get_client", return_value=client), \
+                pytest.raises(OverpassError):
+            fetch_elements([("a", "q1"), ("b", "q2")], workers=1)
@@ -0,0 +1,75 @@
+"""Tests for the offline .osm.pbf store extraction."""
+
+import pytest
+
+osmium = pytest.importorskip("osmium")
+
+
+def _write_extract(path):
+    """A tiny extract: two matching stores, plus objects that must be skipped."""
+    writer = osmium.SimpleWriter(str(path))
+    try:
+        # Way corners (untagged) for a Lidl building
+        for node_id, lat, lon in [(1, 51.00, 3.70), (2, 51.00, 3.72), (3, 51.02, 3.72), (4, 51.02, 3.70)]:
+            writer.add_node(osmium.osm.mutable.Node(id=node_id, location=(lon, lat)))
+        writer.add_node(osmium.osm.mutable.Node(
+            id=10, location=(4.35, 50.85),
+            tags={"shop": "supermarket", "name": "Colruyt", "addr:city": "Brussel"},
+        ))
+        # Not one of our chains
+        writer.add_node(osmium.osm.mutable.Node(
+            id=11, location=(4.36, 50.86), tags={"shop": "supermarket", "name": "Unknown"},
+        ))
+        # Right chain, not a grocery shop
+        writer.add_node(osmium.osm.mutable.Node(
+            id=12, location=(4.37, 50.87), tags={"shop": "bakery", "name": "Colruyt"},
+        ))
+        # Outside the Belgian bbox
+        writer.add_node(osmium.osm.mutable.Node(
+            id=13, location=(7.0, 50.9), tags={"shop": "supermarket", "name": "Aldi"},
+        ))
+        writer.add_way(osmium.osm.mutable.Way(
+            id=100, nodes=[1, 2, 3, 4, 1],
+            tags={"shop": "supermarket;convenience", "name": "Lidl", "branch": "Gent"},
+        ))
+    finally:
+        writer.close()
+
+
+@pytest.fixture
+def extract(tmp_path):
+    path = tmp_path / "belgium-test.osm.pbf"
+    _write_extract(path)
+    return str(path)
+
+
+class TestIterStoreElements:
+    def test_keeps_matching_nodes_and_ways(self, extract):
+        from ingestion.osm_pbf import iter_store_elements
+
+        elements = list(iter_store_elements(extract))
+
+        assert [(el["type"], el["id"]) for el in elements] == [("node", 10), ("way", 100)]
+
+    def test_way_center_is_bbox_center(self, extract):
+        from ingestion.osm_pbf import iter_store_elements
+
+        way = list(iter_store_elements(extract))[1]
+
+        assert way["center"]["lat"] == pytest.approx(51.01)
+        assert way["center"]["lon"] == pytest.approx(3.71)
+
+
+class TestFetchStoresFromPbf:
+    def test_same_columns_as_overpass_backend(self, extract):
+        from ingestion.openstreetmap import fetch_stores, parse_elements
+
+        df = fetch_stores(pbf_path=extract)
+        overpass_df = parse_elements([
+            {"type": "node", "id": 1, "lat": 0, "lon": 0, "tags": {}},
+        ])
+
+        assert list(df.columns) == list(overpass_df.columns)
+        assert df["store_name"].tolist() == ["Colruyt", "Lidl"]
+        assert df["city"].tolist() == ["Brussel", ""]
+        assert df["branch"].tolist() == ["", "Gent"]
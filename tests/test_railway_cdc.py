@@ -0,0 +1,233 @@
+"""Tests for the Railway change data capture module."""
+
+import json
+import os
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ingestion.railway_cdc import (
+    TABLE_COLUMNS,
+    ChangeBatch,
+    consume,
+    lsn_to_str,
+    parse_change,
+)
+
+
+def wal2json(action: str, table: str, identity: dict | None = None, **values) -> str:
+    """Build a wal2json format-version 2 payload (``identity``: an update's old row)."""
+    message = {"action": action, "schema": "public", "table": table}
+    columns = [{"name": k, "type": "text", "value": v} for k, v in values.items()]
+    if action == "D":
+        message["identity"] = columns
+    else:
+        message["columns"] = columns
+    if identity is not None:
+        message["identity"] = [
+            {"name": k, "type": "text", "value": v} for k, v in identity.items()
+        ]
+    return json.dumps(message)
+
+
+def old_row(table: str, **values) -> dict:
+    """A full old row, as wal2json sends it under REPLICA IDENTITY FULL."""
+    return {**dict.fromkeys(TABLE_COLUMNS[table]), **values}
+
+
+class TestTableColumns:
+    """Test the column projection taken from TABLES."""
+
+    def test_covers_every_table(self):
+        assert set(TABLE_COLUMNS) == {"transactions", "receipts", "users", "user_profiles"}
+
+    def test_users_columns(self):
+        assert TABLE_COLUMNS["users"] == ["id", "firebase_uid", "email", "created_at", "updated_at"]
+
+    def test_transactions_has_22_columns(self):
+        assert len(TABLE_COLUMNS["transactions"]) == 22
+
+
+class TestParseChange:
+    """Test decoding of wal2json messages."""
+
+    def test_insert(self):
+        change = parse_change(wal2json("I", "users", id=1, email="a@b.be"))
+        assert change.action == "I"
+        assert change.key == 1
+        assert change.row["email"] == "a@b.be"
+
+    def test_delete_uses_identity(self):
+        change = parse_change(wal2json("D", "users", id=7))
+        assert change.action == "D"
+        assert change.key == 7
+        assert change.row is None
+
+    def test_transaction_boundaries_are_skipped(self):
+        assert parse_change(json.dumps({"action": "B"})) is None
+        assert parse_change(json.dumps({"action": "C"})) is None
+
+    def test_other_tables_are_skipped(self):
+        assert parse_change(wal2json("I", "audit_log", id=1)) is None
+
+    def test_update_takes_unchanged_toast_values_from_old_row(self):
+        old = old_row("users", id=1, firebase_uid="u1", email="old@b.be")
+        # firebase_uid left out of the new row, as wal2json does for unchanged TOAST values
+        change = parse_change(wal2json("U", "users", identity=old, id=1, email="new@b.be"))
+
+        assert change.row["firebase_uid"] == "u1"
+        assert change.row["email"] == "new@b.be"
+
+    def test_update_without_full_replica_identity_is_rejected(self):
+        payload = wal2json("U", "users", identity={"id": 1}, id=1, email="new@b.be")
+
+        with pytest.raises(ValueError, match="REPLICA IDENTITY FULL"):
+            parse_change(payload)
+
+
+class TestChangeBatch:
+    """Test netting of changes within a micro-batch."""
+
+    def test_latest_change_wins(self):
+        batch = ChangeBatch()
+        batch.add(parse_change(wal2json("I", "users", id=1, email="old@b.be")), lsn=10)
+        batch.add(parse_change(wal2json(
+            "U", "users", identity=old_row("users", id=1), id=1, email="new@b.be",
+        )), lsn=11)
+
+        assert batch.upserts["users"][1]["email"] == "new@b.be"
+        assert batch.size == 2
+        assert batch.last_lsn == 11
+
+    def test_insert_then_delete_is_a_delete(self):
+        batch = ChangeBatch()
+        batch.add(parse_change(wal2json("I", "users", id=1)), lsn=10)
+        batch.add(parse_change(wal2json("D", "users", id=1)), lsn=11)
+
+        assert batch.upsert_frame("users").empty
+        assert batch.deletes["users"] == {1}
+
+    def test_receipt_leaving_completed_is_deleted(self):
+        batch = ChangeBatch()
+        update = wal2json(
+            "U", "receipts", identity=old_row("receipts", id=5), id=5, status="REFUNDED",
+        )
+        batch.add(parse_change(update), lsn=10)
+
+        assert batch.deletes["receipts"] == {5}
+        assert 5 not in batch.upserts["receipts"]
+
+    def test_frame_is_projected_to_extract_columns(self):
+        batch = ChangeBatch()
+        batch.add(parse_change(wal2json("I", "users", id=1, email="a@b.be", secret="x")), lsn=10)
+
+        df = batch.upsert_frame("users")
+        assert list(df.columns) == TABLE_COLUMNS["users"]
+
+    def test_is_due_on_size(self):
+        batch = ChangeBatch()
+        assert not batch.is_due(batch_size=2, flush_seconds=60)
+        batch.add(parse_change(wal2json("I", "users", id=1)), lsn=10)
+        batch.add(parse_change(wal2json("I", "users", id=2)), lsn=11)
+        assert batch.is_due(batch_size=2, flush_seconds=60)
+
+
+class TestConsume:
+    """Test the micro-batching read loop against a fake replication cursor."""
+
+    @patch("ingestion.railway_cdc.apply_batch")
+    def test_flushes_in_batches_and_confirms_lsn(self, mock_apply):
+        messages = [
+            MagicMock(payload=wal2json("I", "users", id=i), data_start=100 + i)
+            for i in range(5)
+        ]
+        cursor = MagicMock()
+        cursor.read_message.side_effect = lambda: messages.pop(0) if messages else None
+
+        with patch("ingestion.railway_cdc.select.select"):
+            total = consume(cursor, max_seconds=0.2, batch_size=2, flush_seconds=60)
+
+        assert total == 5
+        assert [c[0][0].size for c in mock_apply.call_args_list] == [2, 2, 1]
+        cursor.send_feedback.assert_any_call(flush_lsn=104)
+
+    @patch("ingestion.railway_cdc.apply_batch")
+    def test_confirms_messages_that_need_no_applying(self, mock_apply):
+        payloads = [
+            json.dumps({"action": "B"}),
+            wal2json("I", "audit_log", id=1),
+            json.dumps({"action": "C"}),
+        ]
+        messages = [MagicMock(payload=p, data_start=200 + i) for i, p in enumerate(payloads)]
+        cursor = MagicMock()
+        cursor.read_message.side_effect = lambda: messages.pop(0) if messages else None
+
+        with patch("ingestion.railway_cdc.select.select"):
+            total = consume(cursor, max_seconds=0.2, batch_size=2, flush_seconds=60)
+
+        assert total == 0
+        mock_apply.assert_not_called()
+        cursor.send_feedback.assert_any_call(flush_lsn=202)
+
+
+def test_lsn_to_str():
+    assert lsn_to_str(0x16B374D848) == "16/B374D848"
+
+
+@pytest.mark.skipif(
+    not os.environ.get("CDC_TEST_DATABASE_URL"),
+    reason="set CDC_TEST_DATABASE_URL to a local Postgres with wal_level=logical and wal2json",
+)
+class TestLocalPostgres:
+    """End-to-end read of real replication messages from a local Postgres."""
+
+    def test_reads_insert_update_delete(self):
+        import psycopg2
+        from psycopg2.extras import LogicalReplicationConnection
+
+        from ingestion.railway_cdc import ensure_slot
+
+        url = os.environ["CDC_TEST_DATABASE_URL"]
+        slot = f"milo_test_{uuid.uuid4().hex[:8]}"
+
+        setup = psycopg2.connect(url)
+        setup.autocommit = True
+        setup.cursor().execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id serial PRIMARY KEY, firebase_uid text, email text,
+                created_at timestamp DEFAULT now(), updated_at timestamp DEFAULT now()
+            );
+            ALTER TABLE users REPLICA IDENTITY FULL;
+        """)
+
+        repl = psycopg2.connect(url, connection_factory=LogicalReplicationConnection)
+        try:
+            cursor = repl.cursor()
+            ensure_slot(cursor, slot)
+            cursor.start_replication(slot_name=slot, decode=True, options={"format-version": "2"})
+
+            sql = setup.cursor()
+            sql.execute(
+                "INSERT INTO users (firebase_uid, email) VALUES ('u1', 'a@b.be') RETURNING id"
+            )
+            user_id = sql.fetchone()[0]
+            sql.execute("UPDATE users SET email = 'c@d.be' WHERE id = %s", (user_id,))
+            sql.execute(
+                "INSERT INTO users (firebase_uid, email) VALUES ('u2', 'x@y.be') RETURNING id"
+            )
+            deleted_id = sql.fetchone()[0]
+            sql.execute("DELETE FROM users WHERE id = %s", (deleted_id,))
+
+            batches = []
+            with patch("ingestion.railway_cdc.apply_batch", side_effect=batches.append):
+                consume(cursor, max_seconds=3, batch_size=100, flush_seconds=60)
+
+            assert batches
+            batch = batches[-1]
+            assert batch.upserts["users"][user_id]["email"] == "c@d.be"
+            assert deleted_id in batch.deletes["users"]
+        finally:
+            repl.close()
+            setup.cursor().execute("SELECT pg_drop_replication_slot(%s)", (slot,))
+            setup.close()
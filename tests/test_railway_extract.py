@@ -1,11 +1,19 @@
 """Tests for the Railway PostgreSQL extraction module."""
 
+from decimal import Decimal
 from unittest.mock import MagicMock, patch
 
 import pandas as pd
 import pytest
 
-from ingestion.railway_extract import TABLES, extract_table
+from ingestion.railway_extract import (
+    TABLES,
+    extract_and_load,
+    extract_table,
+    high_water_mark,
+    iter_table_chunks,
+    run,
+)
 
 
 class TestTableConfig:
@@ -28,6 +36,103 @@ class TestTableConfig:
         assert "COMPLETED" in receipts["query"]
 
 
+class TestCopyExtraction:
+    """Test the COPY ... TO STDOUT backend against a fake psycopg2 cursor."""
+
+    COPY_OUTPUT = (
+        b"id,store_name,is_premium,item_price,date,updated_at\n"
+        b"1,Colruyt,t,2.49,2025-01-02,2025-01-02 10:00:00.5+00\n"
+        b'2,"",f,,2025-01-03,\n'
+        b"3,,t,1.00,2025-01-04,2025-01-04 08:00:00+00\n"
+    )
+
+    @pytest.fixture
+    def engine(self):
+        def column(name, type_code):
+            col = MagicMock()
+            col.name = name
+            col.type_code = type_code
+            return col
+
+        cursor = MagicMock()
+        cursor.description = [
+            column("id", 23),
+            column("store_name", 1043),
+            column("is_premium", 16),
+            column("item_price", 1700),
+            column("date", 1082),
+            column("updated_at", 1184),
+        ]
+        cursor.copy_expert.side_effect = lambda sql, sink: sink.write(self.COPY_OUTPUT)
+
+        engine = MagicMock()
+        engine.raw_connection.return_value.cursor.return_value = cursor
+        return engine
+
+    def test_transactions_use_copy(self):
+        transactions = next(t for t in TABLES if t["name"] == "transactions")
+        assert transactions["extract_method"] == "copy"
+
+    def test_parses_typed_columns(self, engine):
+        config = {"name": "test", "query": "SELECT 1", "extract_method": "copy"}
+
+        chunks = list(iter_table_chunks(engine, config))
+
+        df = pd.concat(chunks)
+        assert list(df["id"]) == [1, 2, 3]
+        assert df["is_premium"].tolist() == [True, False, True]
+        assert df["store_name"].iloc[1] == ""  # quoted empty string stays a string
+        assert pd.isna(df["store_name"].iloc[2])  # unquoted empty is NULL
+        assert df["item_price"].tolist()[::2] == [Decimal("2.49"), Decimal("1.00")]
+        assert pd.isna(df["item_price"].iloc[1])
+        assert str(df["updated_at"].dtype) == "datetime64[us, UTC]"
+        engine.raw_connection.return_value.close.assert_called_once()
+
+    def test_numeric_keeps_full_precision(self, engine):
+        cursor = engine.raw_connection.return_value.cursor.return_value
+        cursor.copy_expert.side_effect = lambda sql, sink: sink.write(
+            b"id,store_name,is_premium,item_price,date,updated_at\n"
+            b"1,Colruyt,t,12345678901234567.89,2025-01-02,\n"
+        )
+        config = {"name": "test", "query": "SELECT 1", "extract_method": "copy"}
+
+        df = pd.concat(iter_table_chunks(engine, config))
+
+        assert df["item_price"].iloc[0] == Decimal("12345678901234567.89")
+
+    def test_quoted_newlines_across_blocks(self, engine):
+        cursor = engine.raw_connection.return_value.cursor.return_value
+        note = "Colruyt\nGent Zuid\n" + "x" * 200
+        rows = b"".join(
+            f'{i},"{note}",t,1.00,2025-01-02,\n'.encode() for i in range(20)
+        )
+        cursor.copy_expert.side_effect = lambda sql, sink: sink.write(
+            b"id,store_name,is_premium,item_price,date,updated_at\n" + rows
+        )
+        config = {"name": "test", "query": "SELECT 1", "extract_method": "copy"}
+
+        with patch("ingestion.railway_extract.COPY_BLOCK_SIZE", 256):
+            df = pd.concat(iter_table_chunks(engine, config, chunk_size=5))
+
+        assert list(df["id"]) == list(range(20))
+        assert (df["store_name"] == note).all()
+
+    @pytest.mark.parametrize("written", [b"", COPY_OUTPUT[:70]], ids=["empty", "truncated"])
+    def test_copy_failure_is_raised_instead_of_the_parse_error(self, engine, written):
+        cursor = engine.raw_connection.return_value.cursor.return_value
+
+        def copy_expert(sql, sink):
+            sink.write(written)
+            raise RuntimeError("canceling statement due to statement timeout")
+
+        cursor.copy_expert.side_effect = copy_expert
+        config = {"name": "test", "query": "SELECT 1", "extract_method": "copy"}
+
+        with pytest.raises(RuntimeError, match="statement timeout"):
+            list(iter_table_chunks(engine, config))
+        engine.raw_connection.return_value.close.assert_called_once()
+
+
 class TestExtractTable:
     """Test the extract_table function."""
 
@@ -50,3 +155,145 @@ class TestExtractTable:
 
         assert isinstance(result, pd.DataFrame)
         assert len(result) == 0
+
+    def test_since_filters_on_watermark(self):
+        mock_engine = MagicMock()
+        mock_df = pd.DataFrame({"id": [1]})
+
+        with patch("ingestion.railway_extract.pd.read_sql", return_value=mock_df) as mock_read:
+            extract_table(
+                mock_engine,
+                {"name": "test", "query": "SELECT id FROM test"},
+                since="2025-01-01T00:00:00",
+            )
+
+        query = str(mock_read.call_args[0][0])
+        assert "SELECT id FROM test" in query
+        assert "COALESCE(src.updated_at, src.created_at) >= :since" in query
+        assert mock_read.call_args[1]["params"] == {"since": "2025-01-01T00:00:00"}
+
+
+class TestHighWaterMark:
+    """Test the watermark derived from an extracted batch."""
+
+    def test_empty_batch_has_no_watermark(self):
+        assert high_water_mark(pd.DataFrame()) is None
+
+    def test_uses_latest_updated_at(self):
+        df = pd.DataFrame({
+            "updated_at": pd.to_datetime(["2025-01-01 10:00", "2025-01-03 09:30"]),
+            "created_at": pd.to_datetime(["2025-01-01 10:00", "2025-01-02 08:00"]),
+        })
+        assert high_water_mark(df) == "2025-01-03T09:30:00"
+
+    def test_falls_back_to_created_at(self):
+        df = pd.DataFrame({
+            "updated_at": pd.to_datetime([None, "2025-01-02 08:00"]),
+            "created_at": pd.to_datetime(["2025-01-05 12:00", "2025-01-01 08:00"]),
+        })
+        assert high_water_mark(df) == "2025-01-05T12:00:00"
+
+    def test_batch_without_timestamps_has_no_watermark(self):
+        df = pd.DataFrame({
+            "updated_at": pd.to_datetime([None, None]),
+            "created_at": pd.to_datetime([None, None]),
+        })
+        assert high_water_mark(df) is None
+
+
+class TestExtractAndLoad:
+    """Test chunked loading and watermark handling."""
+
+    @pytest.fixture
+    def chunks(self):
+        return [
+            pd.DataFrame({
+                "id": [1, 2],
+                "updated_at": pd.to_datetime(["2025-01-02", "2025-01-04"]),
+                "created_at": pd.to_datetime(["2025-01-01", "2025-01-01"]),
+            }),
+            pd.DataFrame({
+                "id": [3],
+                "updated_at": pd.to_datetime(["2025-01-03"]),
+                "created_at": pd.to_datetime(["2025-01-01"]),
+            }),
+        ]
+
+    @patch("ingestion.railway_extract.save_watermark")
+    @patch("ingestion.railway_extract.swap_table")
+    @patch("ingestion.railway_extract.load_dataframe", side_effect=lambda df, **kw: len(df))
+    @patch("ingestion.railway_extract.iter_table_chunks")
+    def test_full_refresh_loads_shadow_and_swaps(
+        self, mock_iter, mock_load, mock_swap, mock_save, chunks
+    ):
+        mock_iter.return_value = iter(chunks)
+        mock_swap.return_value.__enter__.return_value = "TEST__SHADOW"
+
+        rows = extract_and_load(
+            MagicMock(), {"name": "test", "query": "SELECT 1"}, full_refresh=True,
+        )
+
+        assert rows == 3
+        mock_swap.assert_called_once_with("test")
+        assert [c[1]["table_name"] for c in mock_load.call_args_list] == ["TEST__SHADOW"] * 2
+        mock_save.assert_called_once_with("railway.test", "2025-01-04T00:00:00")
+
+    @patch("ingestion.railway_extract.save_watermark")
+    @patch("ingestion.railway_extract.merge_dataframe", side_effect=lambda df, **kw: len(df))
+    @patch("ingestion.railway_extract.get_watermark", return_value="2025-01-01T00:00:00")
+    @patch("ingestion.railway_extract.iter_table_chunks")
+    def test_incremental_merges_every_chunk(
+        self, mock_iter, mock_get, mock_merge, mock_save, chunks
+    ):
+        mock_iter.return_value = iter(chunks)
+
+        rows = extract_and_load(MagicMock(), {"name": "test", "query": "SELECT 1"})
+
+        assert rows == 3
+        assert mock_merge.call_count == 2
+        assert mock_iter.call_args[1]["since"] == "2025-01-01T00:00:00"
+        mock_save.assert_called_once_with("railway.test", "2025-01-04T00:00:00")
+
+
+    @patch("ingestion.railway_extract.save_watermark")
+    @patch("ingestion.railway_extract.merge_dataframe", side_effect=lambda df, **kw: len(df))
+    @patch("ingestion.railway_extract.get_watermark", return_value="2025-01-01T00:00:00")
+    @patch("ingestion.railway_extract.iter_table_chunks")
+    def test_chunk_without_timestamps_keeps_watermark(
+        self, mock_iter, mock_get, mock_merge, mock_save
+    ):
+        mock_iter.return_value = iter([pd.DataFrame({
+            "id": [1],
+            "updated_at": pd.to_datetime([None]),
+            "created_at": pd.to_datetime([None]),
+        })])
+
+        assert extract_and_load(MagicMock(), {"name": "test", "query": "SELECT 1"}) == 1
+        mock_save.assert_not_called()
+
+
+class TestRun:
+    """Test the concurrent run over all tables."""
+
+    @patch("ingestion.railway_extract.create_engine")
+    @patch("ingestion.railway_extract.extract_and_load", return_value=10)
+    def test_processes_every_table(self, mock_extract, mock_engine):
+        run(workers=4)
+
+        names = {c[0][1]["name"] for c in mock_extract.call_args_list}
+        assert names == {t["name"] for t in TABLES}
+        mock_engine.return_value.dispose.assert_called_once()
+
+    @patch("ingestion.railway_extract.create_engine")
+    @patch("ingestion.railway_extract.extract_and_load")
+    def test_failure_aborts_run(self, mock_extract, mock_engine):
+        def fail_on_receipts(engine, table_config, full_refresh=False):
+            if table_config["name"] == "receipts":
+                raise RuntimeError("boom")
+            return 1
+
+        mock_extract.side_effect = fail_on_receipts
+
+        with pytest.raises(RuntimeError):
+            run(workers=2)
+        mock_engine.return_value.dispose.assert_called_once()
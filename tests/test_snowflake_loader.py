@@ -6,6 +6,16 @@ import pandas as pd
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    """Each test starts with an empty connection pool."""
+    from ingestion.snowflake_loader import close_pool
+
+    close_pool()
+    yield
+    close_pool()
+
+
 class TestLoadDataframe:
     """Test the load_dataframe function."""
 
@@ -78,3 +88,187 @@ class TestLoadDataframe:
         calls = [str(c) for c in mock_cursor.execute.call_args_list]
         truncate_called = any("TRUNCATE" in c for c in calls)
         assert truncate_called
+
+
+class TestMergeDataframe:
+    """Test the merge_dataframe function."""
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    @patch("ingestion.snowflake_loader.write_pandas")
+    def test_empty_df_skips_merge(self, mock_write, mock_conn):
+        from ingestion.snowflake_loader import merge_dataframe
+
+        result = merge_dataframe(pd.DataFrame(), "test_table")
+        assert result == 0
+        mock_write.assert_not_called()
+        mock_conn.assert_not_called()
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    @patch("ingestion.snowflake_loader.write_pandas")
+    def test_merges_on_key_column(self, mock_write, mock_conn):
+        from ingestion.snowflake_loader import merge_dataframe
+
+        mock_cursor = MagicMock()
+        mock_cursor.fetchone.return_value = (1, 2)
+        mock_connection = MagicMock()
+        mock_connection.cursor.return_value = mock_cursor
+        mock_conn.return_value = mock_connection
+        mock_write.return_value = (True, 1, 3, None)
+
+        df = pd.DataFrame({"id": [1, 2, 3], "name": ["a", "b", "c"]})
+        result = merge_dataframe(df, "test", key_column="id")
+
+        assert result == 3
+        assert mock_write.call_args[0][2] == "TEST_MERGE_STAGE"
+        merge_sql = next(
+            c[0][0] for c in mock_cursor.execute.call_args_list if "MERGE INTO" in c[0][0]
+        )
+        assert 't."ID" = s."ID"' in merge_sql
+        assert 't."NAME" = s."NAME"' in merge_sql
+
+
+class TestConnectionPool:
+    """Test connection reuse in the process-wide pool."""
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    def test_reuses_connection_across_calls(self, mock_conn):
+        from ingestion.snowflake_loader import execute_query
+
+        mock_conn.return_value.cursor.return_value.description = [("A",)]
+        mock_conn.return_value.cursor.return_value.fetchall.return_value = [(1,)]
+
+        execute_query("SELECT 1 AS A")
+        execute_query("SELECT 1 AS A")
+
+        assert mock_conn.call_count == 1
+        mock_conn.return_value.close.assert_not_called()
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    def test_stale_connection_is_replaced(self, mock_conn):
+        from ingestion.snowflake_loader import ConnectionPool
+
+        stale, fresh = MagicMock(), MagicMock()
+        stale.is_closed.return_value = True
+        mock_conn.side_effect = [stale, fresh]
+
+        pool = ConnectionPool(max_size=1, health_check_interval=0)
+        with pool.connection() as conn:
+            assert conn is stale
+        with pool.connection() as conn:
+            assert conn is fresh
+
+        stale.close.assert_called_once()
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    def test_failed_connection_is_not_reused(self, mock_conn):
+        from ingestion.snowflake_loader import ConnectionPool
+
+        first, second = MagicMock(), MagicMock()
+        mock_conn.side_effect = [first, second]
+
+        pool = ConnectionPool(max_size=1)
+        with pytest.raises(RuntimeError):
+            with pool.connection():
+                raise RuntimeError("query failed")
+        with pool.connection() as conn:
+            assert conn is second
+
+        first.close.assert_called_once()
+
+
+class TestExecuteQuery:
+    """Test result fetching in execute_query and iter_query_batches."""
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    def test_uses_arrow_result_path(self, mock_conn):
+        from ingestion.snowflake_loader import execute_query
+
+        cursor = mock_conn.return_value.cursor.return_value
+        cursor.fetch_pandas_all.return_value = pd.DataFrame({"A": [1, 2]})
+
+        result = execute_query("SELECT A FROM T")
+
+        assert list(result["A"]) == [1, 2]
+        cursor.fetchall.assert_not_called()
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    def test_falls_back_to_rows_without_arrow_result(self, mock_conn):
+        from snowflake.connector.errors import NotSupportedError
+
+        from ingestion.snowflake_loader import execute_query
+
+        cursor = mock_conn.return_value.cursor.return_value
+        cursor.fetch_pandas_all.side_effect = NotSupportedError("not arrow")
+        cursor.description = [("status",)]
+        cursor.fetchall.return_value = [("Table created.",)]
+
+        result = execute_query("CREATE TABLE T (A INT)")
+
+        assert result.iloc[0]["status"] == "Table created."
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    def test_iter_query_batches_yields_each_batch(self, mock_conn):
+        from ingestion.snowflake_loader import iter_query_batches
+
+        cursor = mock_conn.return_value.cursor.return_value
+        cursor.fetch_pandas_batches.return_value = iter([
+            pd.DataFrame({"A": [1, 2]}),
+            pd.DataFrame({"A": [3]}),
+        ])
+
+        batches = list(iter_query_batches("SELECT A FROM T"))
+
+        assert [len(b) for b in batches] == [2, 1]
+        cursor.fetch_arrow_batches.assert_not_called()
+
+
+class TestSwapTable:
+    """Test the atomic shadow-table overwrite."""
+
+    @staticmethod
+    def _executed(cursor) -> list[str]:
+        return [c[0][0] for c in cursor.execute.call_args_list]
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    @patch("ingestion.snowflake_loader.write_pandas")
+    def test_swap_overwrite_never_truncates(self, mock_write, mock_conn):
+        from ingestion.snowflake_loader import load_dataframe
+
+        cursor = mock_conn.return_value.cursor.return_value
+        cursor.fetchall.return_value = [("TEST__SHADOW",)]
+        mock_write.return_value = (True, 1, 3, None)
+
+        df = pd.DataFrame({"a": [1, 2, 3]})
+        rows = load_dataframe(df, "test", overwrite=True, swap=True)
+
+        executed = self._executed(cursor)
+        assert rows == 3
+        assert mock_write.call_args[0][2] == "TEST__SHADOW"
+        assert not any("TRUNCATE" in sql for sql in executed)
+        assert any("SWAP WITH" in sql and sql.endswith(".TEST") for sql in executed)
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    def test_failed_load_keeps_live_table(self, mock_conn):
+        from ingestion.snowflake_loader import swap_table
+
+        cursor = mock_conn.return_value.cursor.return_value
+
+        with pytest.raises(RuntimeError):
+            with swap_table("test"):
+                raise RuntimeError("load failed")
+
+        executed = self._executed(cursor)
+        assert not any("SWAP WITH" in sql for sql in executed)
+        assert executed[-1].startswith("DROP TABLE IF EXISTS")
+
+    @patch("ingestion.snowflake_loader.get_connection")
+    def test_empty_load_keeps_live_table(self, mock_conn):
+        from ingestion.snowflake_loader import swap_table
+
+        cursor = mock_conn.return_value.cursor.return_value
+        cursor.fetchall.return_value = []
+
+        with swap_table("test"):
+            pass
+
+        assert not any("SWAP WITH" in sql for sql in self._executed(cursor))
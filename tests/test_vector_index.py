@@ -0,0 +1,133 @@
+"""Tests for the in-process brand vector index (fully offline)."""
+
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from master_data.vector_index import LocalVectorIndex, quantize
+
+
+@pytest.fixture(autouse=True)
+def no_embedding_cache():
+    """Encode with the mock model directly, not through the on-disk cache."""
+    with patch("master_data.embedding_cache.EMBEDDING_CACHE_PATH", ""):
+        yield
+
+
+def _vectors(n: int = 200, dim: int = 32, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _index(tmp_path, vectors: np.ndarray, **kwargs) -> LocalVectorIndex:
+    index = LocalVectorIndex(str(tmp_path / "index"), hnsw_min_vectors=0, **kwargs)
+    index.upsert([
+        {"id": f"brand_{i}", "values": v.tolist(), "metadata": {"brand_name": f"Brand {i}"}}
+        for i, v in enumerate(vectors)
+    ])
+    return index
+
+
+class TestExactSearch:
+    @pytest.mark.parametrize("chunk_rows", [16_384, 7])
+    @pytest.mark.parametrize("dtype", ["float32", "int8"])
+    def test_matches_brute_force_top_k(self, tmp_path, dtype, chunk_rows):
+        vectors = _vectors()
+        queries = _vectors(n=10, seed=1)
+        index = _index(tmp_path, vectors, dtype=dtype)
+        index.save()
+        index = LocalVectorIndex(str(tmp_path / "index"))  # memory-mapped
+
+        with patch("master_data.vector_index.EXACT_SEARCH_CHUNK_ROWS", chunk_rows):
+            responses = index.query_batch(queries, top_k=3)
+
+        expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :3]
+        for response, rows, query in zip(responses, expected, queries):
+            assert response.matches[0].id == f"brand_{rows[0]}"
+            assert response.matches[0].score == pytest.approx(query @ vectors[rows[0]], abs=0.02)
+            scores = [m.score for m in response.matches]
+            assert scores == sorted(scores, reverse=True)
+
+    def test_pinecone_shaped_response(self, tmp_path):
+        vectors = _vectors()
+        index = _index(tmp_path, vectors)
+
+        response = index.query(vector=vectors[5].tolist(), top_k=2, include_metadata=True)
+
+        assert len(response.matches) == 2
+        best = response.matches[0]
+        assert best.id == "brand_5"
+        assert best.score == pytest.approx(1.0, abs=1e-5)
+        assert best.metadata.get("brand_name") == "Brand 5"
+
+    def test_empty_index_returns_no_matches(self, tmp_path):
+        index = LocalVectorIndex(str(tmp_path / "empty"))
+        assert index.query([0.1, 0.2], top_k=3).matches == []
+
+    def test_quantization_error_is_small(self):
+        vectors = _vectors()
+        rows, scales = quantize(vectors)
+        assert np.abs(rows * scales[:, None] - vectors).max() < 0.01
+
+
+class TestPersistence:
+    @pytest.mark.parametrize("dtype", ["float32", "int8"])
+    def test_saved_index_is_memory_mapped(self, tmp_path, dtype):
+        vectors = _vectors()
+        _index(tmp_path, vectors, dtype=dtype).save()
+
+        reopened = LocalVectorIndex(str(tmp_path / "index"))
+
+        assert isinstance(reopened._vectors, np.memmap)
+        assert reopened.dtype == dtype
+        assert len(reopened) == 200
+        assert reopened.query(vectors[42]).matches[0].id == "brand_42"
+
+    def test_upsert_replaces_and_delete_removes(self, tmp_path):
+        vectors = _vectors()
+        index = _index(tmp_path, vectors)
+        index.save()
+        index = LocalVectorIndex(str(tmp_path / "index"))
+
+        index.upsert([{"id": "brand_1", "values": vectors[2], "metadata": {"brand_name": "New"}}])
+        index.delete(["brand_2", "unknown"])
+
+        assert len(index) == 199
+        best = index.query(vectors[2]).matches[0]
+        assert (best.id, best.metadata["brand_name"]) == ("brand_1", "New")
+
+    def test_rejects_wrong_dimension(self, tmp_path):
+        index = _index(tmp_path, _vectors())
+        with pytest.raises(ValueError, match="dimension"):
+            index.upsert([{"id": "x", "values": [0.1] * 8}])
+
+
+class TestHnsw:
+    def test_hnsw_graph_is_built_and_used(self, tmp_path):
+        pytest.importorskip("hnswlib")
+        vectors = _vectors(n=500)
+        index = LocalVectorIndex(str(tmp_path / "index"), hnsw_min_vectors=100)
+        index.upsert([{"id": f"brand_{i}", "values": v} for i, v in enumerate(vectors)])
+        index.save()
+
+        reopened = LocalVectorIndex(str(tmp_path / "index"))
+
+        assert reopened._hnsw is not None
+        hits = [reopened.query(vectors[i]).matches[0].id == f"brand_{i}" for i in range(50)]
+        assert sum(hits) >= 48
+
+
+class TestMatchBrandsWithLocalIndex:
+    def test_whole_batch_is_matched_in_process(self, tmp_path):
+        from master_data.brand_matcher import CONFIDENCE_THRESHOLD, match_brands
+
+        vectors = _vectors()
+        index = _index(tmp_path, vectors)
+        model = MagicMock()
+        model.encode.return_value = vectors[[3, 7]]
+
+        result = match_brands(["brand three", "brand seven"], model, index)
+
+        assert result["matched_brand"].tolist() == ["Brand 3", "Brand 7"]
+        assert (result["similarity"] >= CONFIDENCE_THRESHOLD).all()
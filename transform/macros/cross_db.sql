@@ -0,0 +1,31 @@
+{#
+    Warehouse-specific SQL, dispatched on the target adapter so the models run
+    on Snowflake (dev/prod) and on DuckDB (the `local` target).
+    The default__ implementations are the Snowflake SQL.
+#}
+
+{% macro to_timestamp_ntz(expression) %}
+    {{ return(adapter.dispatch('to_timestamp_ntz')(expression)) }}
+{% endmacro %}
+
+{% macro default__to_timestamp_ntz(expression) -%}
+    {{ expression }}::timestamp_ntz
+{%- endmacro %}
+
+{% macro duckdb__to_timestamp_ntz(expression) -%}
+    {#- TIMESTAMP (without time zone) is DuckDB's wall-clock type -#}
+    {{ expression }}::timestamp
+{%- endmacro %}
+
+
+{% macro year_month(date_expression) %}
+    {{ return(adapter.dispatch('year_month')(date_expression)) }}
+{% endmacro %}
+
+{% macro default__year_month(date_expression) -%}
+    to_char({{ date_expression }}, 'YYYY-MM')
+{%- endmacro %}
+
+{% macro duckdb__year_month(date_expression) -%}
+    strftime({{ date_expression }}, '%Y-%m')
+{%- endmacro %}
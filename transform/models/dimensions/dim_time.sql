@@ -51,11 +51,11 @@ final as (
         -- Derived fields
         date_trunc('week', d.date_day)::date        as week_start,
         date_trunc('month', d.date_day)::date       as month_start,
-        last_day(d.date_day, 'month')               as month_end,
+        {{ dbt.last_day('d.date_day', 'month') }}   as month_end,
         date_trunc('quarter', d.date_day)::date     as quarter_start,
 
         -- Year-month key for aggregations
-        to_char(d.date_day, 'YYYY-MM')              as year_month,
+        {{ year_month('d.date_day') }}          as year_month,
 
         -- Flags
         case when d.day_of_week in (6, 7)
@@ -56,7 +56,7 @@ final as (
 
         -- Is this user active? (at least 1 receipt in last 60 days)
         case
-            when a.last_transaction_date >= dateadd('day', -60, current_date())
+            when a.last_transaction_date >= {{ dbt.dateadd('day', -60, 'current_date()') }}
             then true else false
         end                                 as is_active
 
@@ -26,7 +26,7 @@ with recent_prices as (
     where brand_name is not null
       and brand_name != ''
       and unit_price > 0
-      and date_key >= dateadd('day', -90, current_date())
+      and date_key >= {{ dbt.dateadd('day', -90, 'current_date()') }}
 
 )
 
@@ -1,6 +1,7 @@
 {{
     config(
-        materialized='view'
+        materialized='incremental',
+        unique_key='brand_name'
     )
 }}
 
@@ -9,6 +10,12 @@
 
     Deduplicates to one row per distinct primary brand.
     Includes nutriscore and nova group where available.
+
+    Incremental: RAW.OFF_PRODUCTS is synced weekly by MERGE on barcode, so only
+    brands with a product modified since the last build are re-aggregated (over
+    all of their products) and merged on brand_name. A product that moves to
+    another brand only refreshes its new brand; run with --full-refresh to
+    rebuild every brand.
 */
 
 with source as (
@@ -17,6 +24,16 @@ with source as (
 
 ),
 
+{% if is_incremental() %}
+changed_brands as (
+
+    select distinct trim(primary_brand) as brand_name
+    from source
+    where last_modified_t > (select max(last_modified_t) from {{ this }})
+
+),
+{% endif %}
+
 deduplicated as (
 
     select
@@ -24,11 +41,15 @@ deduplicated as (
         count(*)                            as product_count,
         mode(nutriscore)                    as typical_nutriscore,
         mode(nova_group)                    as typical_nova_group,
-        mode(off_category)                  as typical_category
+        mode(off_category)                  as typical_category,
+        max(last_modified_t)                as last_modified_t
 
     from source
     where primary_brand is not null
       and trim(primary_brand) != ''
+    {% if is_incremental() %}
+      and trim(primary_brand) in (select brand_name from changed_brands)
+    {% endif %}
     group by trim(primary_brand)
 
 )
@@ -32,7 +32,7 @@ cleaned as (
         trim(store_branch)                  as store_branch,
         upper(status)                       as status,
         trim(source)                        as source,
-        created_at::timestamp_ntz           as created_at
+        {{ to_timestamp_ntz('created_at') }}  as created_at
 
     from source
     where upper(status) = 'COMPLETED'
@@ -61,7 +61,7 @@ cleaned as (
         s.weight_or_volume::float           as weight_or_volume,
         s.price_per_unit_measure::float     as price_per_unit_measure,
         s.date::date                        as transaction_date,
-        s.created_at::timestamp_ntz         as created_at
+        {{ to_timestamp_ntz('s.created_at') }} as created_at
 
     from source s
     inner join completed_receipts r
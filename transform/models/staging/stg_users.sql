@@ -30,8 +30,8 @@ joined as (
         u.firebase_uid,
         u.email,
         trim(upper(p.gender))              as gender,
-        u.created_at::timestamp_ntz        as user_created_at,
-        p.created_at::timestamp_ntz        as profile_created_at
+        {{ to_timestamp_ntz('u.created_at') }} as user_created_at,
+        {{ to_timestamp_ntz('p.created_at') }} as profile_created_at
 
     from users u
     left join profiles p